@@ -2,31 +2,38 @@ from fastapi import FastAPI, Path
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, PlainTextResponse
+from prometheus_client import generate_latest
 import logging
 import os
 
 # Use try/except to handle both local and Docker imports
 try:
     # Try relative imports first (for Docker)
-    from .routers import whatsapp, sms, health_api
-    from .db.database import engine, wait_for_db
+    from .routers import whatsapp, sms, health_api, campaigns
+    from .db.database import async_engine, wait_for_db
+    from .db.migrations import upgrade_database
     from .db import models
     from .config import settings
+    from .services import background, reminder_scheduler  # registers the reminder loop
 except ImportError:
     # Fall back to absolute imports (for local development)
     try:
-        from backend.routers import whatsapp, sms, health_api
-        from backend.db.database import engine, wait_for_db
+        from backend.routers import whatsapp, sms, health_api, campaigns
+        from backend.db.database import async_engine, wait_for_db
+        from backend.db.migrations import upgrade_database
         from backend.db import models
         from backend.config import settings
+        from backend.services import background, reminder_scheduler
     except ImportError:
         # Last resort - direct imports
         import sys
         sys.path.append(os.path.join(os.path.dirname(__file__)))
-        from routers import whatsapp, sms, health_api
-        from db.database import engine, wait_for_db
+        from routers import whatsapp, sms, health_api, campaigns
+        from db.database import async_engine, wait_for_db
+        from db.migrations import upgrade_database
         from db import models
         from config import settings
+        from services import background, reminder_scheduler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -36,10 +43,10 @@ logger = logging.getLogger(__name__)
 logger.info("Waiting for database connection...")
 wait_for_db()
 
-# Create database tables
-logger.info("Creating database tables...")
-models.Base.metadata.create_all(bind=engine)
-logger.info("Database tables created successfully")
+# Apply schema migrations
+logger.info("Applying database migrations...")
+upgrade_database()
+logger.info("Database schema is up to date")
 
 app = FastAPI(
     title="Health Chatbot API",
@@ -195,8 +202,22 @@ async def get_metrics():
         "# TYPE health_chatbot_up gauge",
         "health_chatbot_up 1"
     ]
+    # Append collectors registered by the services (upstream latency, timeouts, ...)
+    metrics.append(generate_latest().decode("utf-8"))
     return PlainTextResponse("\n".join(metrics), media_type="text/plain")
 
+@app.on_event("startup")
+async def start_background_services():
+    """Start background pollers and workers"""
+    await background.start_all()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    """Stop background work and release outbound connections"""
+    await background.stop_all()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -207,3 +228,4 @@ async def health_check():
 app.include_router(whatsapp.router, prefix="/api/whatsapp", tags=["whatsapp"])
 app.include_router(sms.router, prefix="/api/sms", tags=["sms"])
 app.include_router(health_api.router, prefix="/api/health", tags=["health"])
+app.include_router(campaigns.router, prefix="/api/campaigns", tags=["campaigns"])
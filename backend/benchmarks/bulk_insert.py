@@ -0,0 +1,88 @@
+"""
+Benchmark: rows per second for single-row vs bulk crud inserts
+
+Inserts synthetic alerts, vaccination reminders and users with the per-row
+crud functions (add, commit, refresh for every row) and with the bulk
+variants, with and without returned IDs. On PostgreSQL with psycopg2 the
+bulk path without IDs uses COPY.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/bench.db python -m backend.benchmarks.bulk_insert --rows 20000 --single-rows 1000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from itertools import count
+
+from ..db import crud, models
+from ..db.database import SessionLocal, engine
+
+_phones = count(int(time.time() * 1000) % 10 ** 9)
+
+
+def alert_rows(n: int):
+    return ({"user_id": i % 5000, "type": "campaign", "message": f"Health tip {i}"} for i in range(n))
+
+
+def reminder_rows(n: int):
+    due = datetime.utcnow()
+    return (
+        {"user_id": i % 5000, "child_age": (i % 24) / 2, "vaccine_name": "MMR", "due_date": due + timedelta(days=i % 90)}
+        for i in range(n)
+    )
+
+
+def user_rows(n: int):
+    return ({"phone": f"+91{next(_phones):010d}", "language": "en", "location": "Delhi"} for _ in range(n))
+
+
+def single(table: str, rows) -> None:
+    db = SessionLocal()
+    try:
+        for row in rows:
+            if table == "alerts":
+                crud.create_alert(db, row["user_id"], row["type"], row["message"])
+            elif table == "reminders":
+                crud.create_vaccination_reminder(db, row["user_id"], row["child_age"], row["vaccine_name"], row["due_date"])
+            else:
+                crud.create_user(db, row["phone"], row["language"], row["location"])
+    finally:
+        db.close()
+
+
+def bulk(table: str, rows, return_ids: bool) -> None:
+    create = {"alerts": crud.create_alerts, "reminders": crud.create_vaccination_reminders, "users": crud.create_users}[table]
+    db = SessionLocal()
+    try:
+        create(db, rows, return_ids=return_ids)
+    finally:
+        db.close()
+
+
+def measure(label: str, rows: int, fn) -> None:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {rows:>8} rows  {elapsed:8.3f} s  {rows / elapsed:>12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=20000, help="rows per bulk run")
+    parser.add_argument("--single-rows", type=int, default=1000, help="rows per single-row run")
+    parser.add_argument("--tables", nargs="+", choices=("alerts", "reminders", "users"), default=["alerts", "reminders", "users"])
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    generators = {"alerts": alert_rows, "reminders": reminder_rows, "users": user_rows}
+    print(f"database: {engine.dialect.name} ({engine.dialect.driver})")
+    for table in args.tables:
+        rows = generators[table]
+        measure(f"{table} single-row", args.single_rows, lambda: single(table, rows(args.single_rows)))
+        measure(f"{table} bulk with ids", args.rows, lambda: bulk(table, rows(args.rows), return_ids=True))
+        measure(f"{table} bulk", args.rows, lambda: bulk(table, rows(args.rows), return_ids=False))
+
+
+if __name__ == "__main__":
+    main()
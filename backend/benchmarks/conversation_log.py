@@ -0,0 +1,75 @@
+"""
+Benchmark: cost of conversation logging on the request path, write-behind vs inline insert
+
+Records N conversation events two ways: an INSERT and commit per event (what
+logging inline in a handler would cost, run in a thread as the handlers would
+have to), and services/conversation_log.py's ring buffer. For the buffer it
+reports the per-event recording cost, which is all the request path pays,
+and the time the background flushes take to write everything.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/conversations.db python -m backend.benchmarks.conversation_log --events 20000
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from ..db import models
+from ..db.database import SessionLocal
+from ..db.migrations import upgrade_database
+from ..services.conversation_log import ConversationLog
+
+
+def event(n: int) -> dict:
+    return {"channel": "whatsapp", "session_id": f"+91{9000000000 + n % 1000}", "message": "any dengue outbreak?",
+            "intent": "ask_outbreak_info", "confidence": 0.5, "source": "patterns", "latency": 0.004}
+
+
+def insert_one(row: dict):
+    db = SessionLocal()
+    try:
+        latency = row.pop("latency")
+        db.add(models.ConversationEvent(**row, latency_ms=latency * 1000, created_at=datetime.now(timezone.utc)))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def inline(events: int):
+    started = time.perf_counter()
+    for n in range(events):
+        await asyncio.to_thread(insert_one, event(n))
+    elapsed = time.perf_counter() - started
+    print(f"inline insert   {elapsed / events * 1e6:10.1f} us/event on the request path")
+
+
+async def write_behind(events: int, flush_size: int):
+    log = ConversationLog(capacity=max(events, 1), flush_size=flush_size, flush_interval=1.0)
+    log.start()
+    started = time.perf_counter()
+    for n in range(events):
+        log.record(**event(n))
+        if n % flush_size == 0:
+            await asyncio.sleep(0)  # let the flusher run, as handlers awaiting I/O would
+    recorded = time.perf_counter() - started
+    await log.stop()
+    drained = time.perf_counter() - started
+    print(f"write-behind    {recorded / events * 1e6:10.1f} us/event on the request path, "
+          f"all {events} written after {drained:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--flush-size", type=int, default=500)
+    args = parser.parse_args()
+
+    upgrade_database()
+    asyncio.run(inline(args.events))
+    asyncio.run(write_behind(args.events, args.flush_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: resolving the opted-in users affected by a state-wide outbreak alert
+
+Seeds users whose free-text locations are drawn from the outbreak area data in
+the ways people actually type them (district names, aliases, "Area, City
+PIN", state names), so crud.create_users resolves each to its canonical
+area. Then collects every opted-in user in a state two ways: the old approach
+of matching location strings (LIKE over every district and alias in the
+state, i.e. a full-table scan) and the keyset walk over the
+ix_users_opted_in_state index, reporting the time and user count for each.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/geo.db python -m backend.benchmarks.geo_targeting --users 500000 --state Karnataka
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import func, or_, select
+
+from ..db import crud, models
+from ..db.database import SessionLocal
+from ..db.migrations import upgrade_database
+from ..services.geo import ALIASES, parse_area, resolver
+
+
+def location_variants(index):
+    """Ways of writing each pincode's location, with the state each should resolve to"""
+    aliases = {}
+    for alias, name in ALIASES.items():
+        aliases.setdefault(name, []).append(alias)
+    variants = []
+    for pincode in index.pincodes:
+        located = index.locate(pincode)
+        district, state = located["district"], located["state"]
+        names = [district] + [alias.title() for alias in aliases.get(district.lower(), [])]
+        variants += [(name, state) for name in names]
+        variants += [(f"Ward {pincode[-2:]}, {district} {pincode}", state), (f"{district}, {state}", state)]
+    variants += [(state, state) for state in index.states.values()]
+    return variants
+
+
+def seed(users: int):
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count()).select_from(models.User)) >= users:
+            return
+        rng = random.Random(42)
+        variants = location_variants(resolver().index)
+        print(f"seeding {users} users...")
+        started = time.perf_counter()
+        crud.create_users(db, (
+            {"phone": f"+91{9000000000 + n}", "language": "en",
+             "location": rng.choice(variants)[0], "opt_in": rng.random() < 0.9}
+            for n in range(users)
+        ))
+        print(f"  {users / (time.perf_counter() - started):,.0f} users/s including location resolution")
+    finally:
+        db.close()
+
+
+def by_string_match(db, state: str, page_size: int):
+    """Every opted-in user whose location mentions a district, alias or the name of the state"""
+    index = resolver().index
+    names = {state} | {district for district, district_state in index.districts.values() if district_state == state}
+    names |= {alias for alias, name in ALIASES.items() if name in {n.lower() for n in names}}
+    user = models.User
+    ids, after_id = [], 0
+    while True:
+        page = db.execute(
+            select(user.id).where(user.opt_in.is_(True), user.id > after_id,
+                                  or_(*(user.location.ilike(f"%{name}%") for name in names)))
+            .order_by(user.id).limit(page_size)
+        ).scalars().all()
+        if not page:
+            return ids
+        ids += page
+        after_id = page[-1]
+
+
+def by_area_index(db, state: str, page_size: int):
+    """Every opted-in user in the state, via the canonical area columns"""
+    areas = [parse_area(f"state:{state}")]
+    ids, after_id = [], 0
+    while True:
+        page = crud.get_opted_in_users(db, after_id=after_id, limit=page_size, areas=areas)
+        if not page:
+            return ids
+        ids += [row.id for row in page]
+        after_id = page[-1].id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=500000)
+    parser.add_argument("--state", default="Karnataka")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    upgrade_database()
+    seed(args.users)
+    db = SessionLocal()
+    try:
+        for label, resolve in (("string match", by_string_match), ("area index", by_area_index)):
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                ids = resolve(db, args.state, args.page_size)
+                timings.append(time.perf_counter() - started)
+            print(f"{label:<14} {len(ids):8d} users in {min(timings) * 1000:9.1f} ms")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
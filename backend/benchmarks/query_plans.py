@@ -0,0 +1,119 @@
+"""
+Benchmark: query plans and latency of the hot query paths, with and without the indexes from migration 0002
+
+Seeds a synthetic dataset (users, alerts, vaccination reminders) with the bulk
+crud helpers, then for each hot query prints the plan (EXPLAIN QUERY PLAN on
+SQLite, EXPLAIN ANALYZE on PostgreSQL) and the median latency. The schema is
+then downgraded to the baseline revision (no hot-path indexes) and measured
+again, and finally upgraded back to head.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/plans.db python -m backend.benchmarks.query_plans --users 200000 --alerts 1000000 --reminders 500000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from ..db import crud, models
+from ..db.database import SessionLocal, engine
+from ..db.migrations import BASELINE_REVISION, downgrade_database, upgrade_database
+
+LANGUAGES = ["en", "hi", "ta", "te", "bn", "mr"]
+LOCATIONS = [f"District {n}" for n in range(200)]
+STATUSES = ["sent"] * 6 + ["delivered"] * 10 + ["read"] * 3 + ["failed", "pending"]
+
+
+def seed(args):
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count()).select_from(models.User)) >= args.users:
+            return
+        rng = random.Random(42)
+        now = datetime.utcnow()
+        print(f"seeding {args.users} users, {args.alerts} alerts, {args.reminders} reminders...")
+        crud.create_users(db, (
+            {"phone": f"+91{9000000000 + n}", "language": rng.choice(LANGUAGES),
+             "location": rng.choice(LOCATIONS), "opt_in": rng.random() < 0.9}
+            for n in range(args.users)
+        ))
+        first_user = db.scalar(select(func.min(models.User.id)))
+        crud.create_alerts(db, (
+            {"user_id": first_user + rng.randrange(args.users), "type": "campaign", "message": "Health tip",
+             "status": rng.choice(STATUSES), "provider_message_id": f"SM{n:032d}",
+             "sent_at": now - timedelta(minutes=rng.randrange(60 * 24 * 90))}
+            for n in range(args.alerts)
+        ), return_ids=False)
+        crud.create_vaccination_reminders(db, (
+            {"user_id": first_user + rng.randrange(args.users), "child_age": rng.randrange(24) / 2,
+             "vaccine_name": "MMR", "due_date": now + timedelta(days=rng.randrange(-30, 365)),
+             "reminded_at": None if rng.random() < 0.3 else now}
+            for _ in range(args.reminders)
+        ))
+    finally:
+        db.close()
+
+
+def hot_queries(args):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    return {
+        "campaign segment page": select(models.User.id, models.User.phone, models.User.language, models.User.location)
+            .where(models.User.opt_in.is_(True), models.User.id > 0,
+                   models.User.language.in_(["hi"]), models.User.location.in_(LOCATIONS[:3]))
+            .order_by(models.User.id).limit(1000),
+        "pending alert queue": select(models.Alert.id)
+            .where(models.Alert.status == "pending").order_by(models.Alert.id).limit(500),
+        "due reminder scan": select(models.VaccinationReminder.id)
+            .where(models.VaccinationReminder.reminded_at.is_(None), models.VaccinationReminder.due_date <= now)
+            .order_by(models.VaccinationReminder.due_date, models.VaccinationReminder.id).limit(500),
+        "status callback lookup": select(models.Alert.id)
+            .where(models.Alert.provider_message_id.in_([f"SM{rng.randrange(args.alerts):032d}" for _ in range(100)])),
+        "user alert history": select(models.Alert.id, models.Alert.status, models.Alert.sent_at)
+            .where(models.Alert.user_id == rng.randrange(1, args.users))
+            .order_by(models.Alert.sent_at.desc()).limit(20),
+    }
+
+
+def measure(args, label: str):
+    print(f"\n== {label} ==")
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE"))
+        for name, query in hot_queries(args).items():
+            sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN ANALYZE "
+            plan = [" | ".join(str(col) for col in row) for row in connection.execute(text(explain + sql))]
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                connection.execute(query).fetchall()
+                timings.append(time.perf_counter() - started)
+            print(f"{name:<24} median {statistics.median(timings) * 1000:9.3f} ms")
+            for line in plan:
+                print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--alerts", type=int, default=1000000)
+    parser.add_argument("--reminders", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    upgrade_database()
+    seed(args)
+    measure(args, "head (hot-path indexes)")
+    downgrade_database(BASELINE_REVISION)
+    try:
+        measure(args, f"revision {BASELINE_REVISION} (baseline, no hot-path indexes)")
+    finally:
+        upgrade_database()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: due-reminder throughput with several scheduler worker processes
+
+Seeds due vaccination reminders, then runs the reminder scheduler in 1..N
+worker processes at once, each with a stand-in sender that sleeps for a
+fixed latency. Reports reminders per second for each worker count and checks
+that no reminder was sent twice. Use PostgreSQL (SKIP LOCKED) to see claim
+throughput scale; on SQLite claims are serialised by the database lock.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/reminders.db python -m backend.benchmarks.reminder_scheduler --reminders 5000 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from ..db import crud, models
+from ..db.database import SessionLocal
+from ..db.migrations import upgrade_database
+from ..services.delivery_scheduler import delivery_scheduler
+from ..services.reminder_scheduler import ReminderScheduler
+
+
+def seed(reminders: int, users: int):
+    db = SessionLocal()
+    try:
+        db.execute(delete(models.VaccinationReminder))
+        db.commit()
+        if db.scalar(select(func.count()).select_from(models.User)) < users:
+            crud.create_users(db, ({"phone": f"+9180000{n:05d}", "language": "en", "location": "Delhi"} for n in range(users)))
+        user_ids = db.scalars(select(models.User.id).limit(users)).all()
+        due = datetime.utcnow() - timedelta(days=1)
+        crud.create_vaccination_reminders(db, (
+            {"user_id": user_ids[n % len(user_ids)], "child_age": 1.0, "vaccine_name": "MMR", "due_date": due}
+            for n in range(reminders)
+        ))
+    finally:
+        db.close()
+
+
+def reset():
+    db = SessionLocal()
+    try:
+        db.execute(update(models.VaccinationReminder).values(reminded_at=None, claimed_by=None, lease_expires_at=None,
+                                                             send_after=None, alert_id=None, skipped_at=None))
+        db.commit()
+    finally:
+        db.close()
+
+
+def worker(index: int, args, results):
+    sent = []
+
+    async def sender(phone: str, text: str, alert_id: int) -> bool:
+        await asyncio.sleep(args.send_latency)
+        return True
+
+    async def run():
+        # Measure claiming and sending, whatever the time of day
+        delivery_scheduler.quiet_start = delivery_scheduler.quiet_end
+        scheduler = ReminderScheduler(worker_id=f"bench-{index}", batch_size=args.batch_size, sender=sender)
+        original = scheduler._stamp
+
+        def stamp(reminder_ids, column="reminded_at"):
+            if column == "reminded_at":
+                sent.extend(reminder_ids)
+            return original(reminder_ids, column)
+
+        scheduler._stamp = stamp
+        while await scheduler.run_once():
+            pass
+
+    asyncio.run(run())
+    results.put(sent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--reminders", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--send-latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    upgrade_database()
+    seed(args.reminders, args.users)
+    for workers in args.workers:
+        reset()
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(i, args, results)) for i in range(workers)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        sent = Counter()
+        for _ in processes:
+            sent.update(results.get())
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        duplicates = sum(1 for count in sent.values() if count > 1)
+        print(f"{workers} worker(s): {len(sent)} reminders in {elapsed:.2f} s, "
+              f"{len(sent) / elapsed:,.0f}/s, {duplicates} sent more than once")
+
+
+if __name__ == "__main__":
+    main()
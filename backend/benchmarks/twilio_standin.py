@@ -0,0 +1,73 @@
+"""
+Local stand-in for the parts of the Twilio REST API the backend uses
+
+Accepts message creation and account fetches with a configurable latency and
+error rate, so SMS sending can be exercised and load tested without a real
+account. Point the backend at it with TWILIO_API_BASE_URL.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.twilio_standin --port 8765 --latency 0.2
+    TWILIO_API_BASE_URL=http://localhost:8765 TWILIO_ACCOUNT_SID=AC0 TWILIO_AUTH_TOKEN=x uvicorn backend.app:app
+"""
+
+import argparse
+import asyncio
+import random
+import uuid
+
+from fastapi import FastAPI, Form, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency: float = 0.0, error_rate: float = 0.0) -> FastAPI:
+    """Stand-in app; error_rate is the fraction of message requests answered with 429 or 500"""
+    app = FastAPI(title="Twilio stand-in")
+    app.state.messages = []
+
+    def _error(status: int, code: int, message: str) -> JSONResponse:
+        return JSONResponse(status_code=status, content={"code": code, "message": message, "status": status})
+
+    @app.middleware("http")
+    async def require_basic_auth(request: Request, call_next):
+        if not request.headers.get("authorization", "").startswith("Basic "):
+            return _error(401, 20003, "Authenticate")
+        return await call_next(request)
+
+    @app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+    async def create_message(account_sid: str, To: str = Form(...), From: str = Form(None), Body: str = Form(...)):
+        await asyncio.sleep(latency)
+        if random.random() < error_rate:
+            return random.choice([_error(429, 20429, "Too Many Requests"), _error(500, 20500, "Internal Server Error")])
+        sid = "SM" + uuid.uuid4().hex
+        app.state.messages.append({"sid": sid, "to": To, "from": From, "body": Body})
+        return JSONResponse(status_code=201, content={
+            "sid": sid,
+            "account_sid": account_sid,
+            "to": To,
+            "from": From,
+            "body": Body,
+            "status": "queued"
+        })
+
+    @app.get("/2010-04-01/Accounts/{account_sid}.json")
+    async def fetch_account(account_sid: str):
+        await asyncio.sleep(latency)
+        return {"sid": account_sid, "status": "active", "type": "Full"}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated Twilio latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.error_rate), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: per-message sender resolution with and without the user cache
+
+Seeds users, then resolves the sender of N inbound messages drawn from a
+skewed distribution (most traffic comes from a minority of active users, as
+with real chat traffic), once with a database query per message
+(crud.get_user_by_phone via the async session or a thread) and once through
+services/user_cache.py. Reports lookups per second, mean latency and the
+cache hit ratio.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/users.db python -m backend.benchmarks.user_cache --users 100000 --messages 50000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import func, select
+
+from ..db import async_crud, crud, models
+from ..db.database import AsyncSessionLocal, SessionLocal
+from ..db.migrations import upgrade_database
+from ..services.user_cache import LOOKUPS, user_cache
+
+
+def seed(users: int):
+    db = SessionLocal()
+    try:
+        if db.scalar(select(func.count()).select_from(models.User)) >= users:
+            return
+        print(f"seeding {users} users...")
+        crud.create_users(db, (
+            {"phone": f"+91{9000000000 + n}", "language": "hi", "location": "Lucknow"} for n in range(users)
+        ))
+    finally:
+        db.close()
+
+
+def lookup_in_thread(phone: str):
+    db = SessionLocal()
+    try:
+        return crud.get_user_by_phone(db, phone)
+    finally:
+        db.close()
+
+
+async def lookup_in_db(phone: str):
+    if AsyncSessionLocal is None:
+        return await asyncio.to_thread(lookup_in_thread, phone)
+    async with AsyncSessionLocal() as db:
+        return await async_crud.get_user_by_phone(db, phone)
+
+
+async def run(label: str, lookup, phones, concurrency: int):
+    queue = list(reversed(phones))
+
+    async def worker():
+        while queue:
+            await lookup(queue.pop())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {len(phones) / elapsed:10,.0f} lookups/s  {elapsed / len(phones) * 1e6:8.1f} us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of sender activity")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    upgrade_database()
+    seed(args.users)
+    rng = random.Random(1)
+    weights = [1 / (rank + 1) ** args.skew for rank in range(args.users)]
+    # Inbound WhatsApp senders arrive without the leading +
+    phones = [f"91{9000000000 + n}" for n in rng.choices(range(args.users), weights=weights, k=args.messages)]
+
+    async def both():
+        await run("database", lookup_in_db, phones, args.concurrency)
+        await run("user cache", user_cache.get, phones, args.concurrency)
+
+    asyncio.run(both())
+    hits = LOOKUPS.labels(result="hit")._value.get()
+    misses = LOOKUPS.labels(result="miss")._value.get()
+    print(f"hit ratio {hits / (hits + misses):.1%}, {len(user_cache)} profiles cached")
+
+
+if __name__ == "__main__":
+    main()
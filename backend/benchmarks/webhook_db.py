@@ -0,0 +1,135 @@
+"""
+Benchmark: webhook throughput with database writes, sync vs async sessions
+
+Each simulated webhook looks up the sender and records an alert, the DB work a
+real inbound message does. Three handler variants are compared:
+
+    sync    blocking SessionLocal calls directly in the async handler
+    thread  the same calls via asyncio.to_thread
+    async   AsyncSessionLocal with async_crud (asyncpg / aiosqlite)
+
+Requests are posted concurrently in-process; alongside them a ticker measures
+how late the event loop wakes up, which is what a blocked loop costs every
+other request. Point DATABASE_URL at PostgreSQL for representative numbers.
+
+Usage (from the repository root):
+    DATABASE_URL=sqlite:////tmp/bench.db python -m backend.benchmarks.webhook_db --requests 2000 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from ..db import async_crud, crud, models
+from ..db.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+MODES = ("sync", "thread", "async")
+
+
+def handle_sync(phone: str, body: str):
+    db = SessionLocal()
+    try:
+        user = crud.get_user_by_phone(db, phone)
+        crud.create_alert(db, user.id, "inbound", body)
+    finally:
+        db.close()
+
+
+async def handle_async(phone: str, body: str):
+    async with AsyncSessionLocal() as db:
+        user = await async_crud.get_user_by_phone(db, phone)
+        await async_crud.create_alert(db, user.id, "inbound", body)
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/webhook/{mode}")
+    async def webhook(mode: str, payload: dict):
+        if mode == "sync":
+            handle_sync(payload["from"], payload["body"])
+        elif mode == "thread":
+            await asyncio.to_thread(handle_sync, payload["from"], payload["body"])
+        else:
+            await handle_async(payload["from"], payload["body"])
+        return {"status": "ok"}
+
+    return app
+
+
+def seed_users(senders: int) -> list:
+    models.Base.metadata.create_all(bind=engine)
+    phones = [f"+9190000{n:05d}" for n in range(senders)]
+    db = SessionLocal()
+    try:
+        existing = {phone for (phone,) in db.query(models.User.phone).filter(models.User.phone.in_(phones))}
+        db.add_all(models.User(phone=phone, language="en", location="Delhi") for phone in phones if phone not in existing)
+        db.commit()
+    finally:
+        db.close()
+    return phones
+
+
+async def run_mode(mode: str, client: httpx.AsyncClient, phones: list, args) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    lag = []
+    done = asyncio.Event()
+
+    async def ticker():
+        # Event loop lag: how much later than requested a 10 ms sleep wakes up
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag.append(time.perf_counter() - started - 0.01)
+
+    async def post(n: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(f"/webhook/{mode}", json={"from": phones[n % len(phones)], "body": f"message {n}"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(post(n) for n in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker_task
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests_per_second": round(args.requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "loop_lag_max_ms": round(max(lag, default=0.0) * 1000, 2),
+        "loop_lag_mean_ms": round(statistics.mean(lag) * 1000, 2) if lag else 0.0,
+    }
+
+
+async def main(args):
+    phones = seed_users(args.senders)
+    modes = [mode for mode in args.modes if mode != "async" or AsyncSessionLocal is not None]
+    if len(modes) < len(args.modes):
+        print("async driver not installed, skipping the async mode")
+
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for mode in modes:
+            print(await run_mode(mode, client, phones, args))
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,143 @@
+"""
+Benchmark: WhatsApp webhook ingestion with large synthetic Meta payloads
+
+Posts batched deliveries (many entries x changes x messages, plus status
+callbacks) to the webhook in-process and measures the acknowledgement latency
+and the time until every reply has been sent. The Graph API is replaced by a
+fixed delay so the numbers reflect our pipeline, not the network. Per-sender
+reply order is verified on every run.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.whatsapp_webhook --entries 20 --changes 5 --messages 10 --senders 200
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from collections import defaultdict
+from itertools import count
+
+import httpx
+from fastapi import FastAPI
+
+from ..config import settings
+from ..routers import whatsapp
+from ..services.dedupe import webhook_deduplicator
+
+_ids = count()
+
+
+def build_payload(entries: int, changes: int, messages: int, senders: int, statuses: int) -> dict:
+    """A Meta webhook delivery with entries x changes x messages inbound texts"""
+    payload = {"object": "whatsapp_business_account", "entry": []}
+    for e in range(entries):
+        entry = {"id": f"WABA{e}", "changes": []}
+        for c in range(changes):
+            value = {
+                "messaging_product": "whatsapp",
+                "metadata": {"display_phone_number": "15550000000", "phone_number_id": "PHONE"},
+                "messages": [],
+                "statuses": []
+            }
+            for _ in range(messages):
+                n = next(_ids)
+                value["messages"].append({
+                    "from": f"9190000{n % senders:05d}",
+                    "id": f"wamid.bench{n}",
+                    "timestamp": str(int(time.time())),
+                    "type": "text",
+                    "text": {"body": f"{n} I have fever and headache"}
+                })
+            for _ in range(statuses):
+                n = next(_ids)
+                value["statuses"].append({"id": f"wamid.out{n}", "status": "delivered", "recipient_id": "919000000000"})
+            entry["changes"].append({"field": "messages", "value": value})
+        payload["entry"].append(entry)
+    return payload
+
+
+async def run(args) -> dict:
+    sent = defaultdict(list)
+
+    async def fake_send(to_number: str, message: str) -> bool:
+        # Stand-in for the Graph API round trip
+        await asyncio.sleep(args.send_latency)
+        sent[to_number].append(message)
+        return True
+
+    async def handle(item):
+        await whatsapp.process_health_message(item["message_body"])
+        await fake_send(item["from_number"], item["message_body"])
+
+    pool = whatsapp.WorkerPool("whatsapp_bench", handle, concurrency=args.concurrency, max_queue=10 ** 7)
+    whatsapp.inbound_pool = pool
+    webhook_deduplicator.backend = "memory"
+    settings.whatsapp_app_secret = settings.whatsapp_app_secret or "bench-secret"
+
+    app = FastAPI()
+    app.include_router(whatsapp.router, prefix="/api/whatsapp")
+    payloads = [
+        json.dumps(build_payload(args.entries, args.changes, args.messages, args.senders, args.statuses)).encode()
+        for _ in range(args.deliveries)
+    ]
+    total = args.deliveries * args.entries * args.changes * args.messages
+
+    pool.start()
+    ack_times = []
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for payload in payloads:
+            t0 = time.perf_counter()
+            signature = hmac.new(settings.whatsapp_app_secret.encode(), payload, hashlib.sha256).hexdigest()
+            response = await client.post("/api/whatsapp/webhook", content=payload, headers={
+                "Content-Type": "application/json", "X-Hub-Signature-256": f"sha256={signature}"
+            })
+            ack_times.append(time.perf_counter() - t0)
+            assert response.status_code == 200, response.text
+    acked = time.perf_counter() - started
+    await pool.join()
+    finished = time.perf_counter() - started
+    await pool.stop()
+
+    # Replies to each sender must come back in the order the sender wrote
+    for replies in sent.values():
+        numbers = [int(reply.split()[0]) for reply in replies]
+        assert numbers == sorted(numbers), "per-sender order violated"
+
+    return {
+        "messages": total,
+        "replies": sum(len(replies) for replies in sent.values()),
+        "ack_ms_avg": 1000 * sum(ack_times) / len(ack_times),
+        "ack_ms_max": 1000 * max(ack_times),
+        "all_acked_s": acked,
+        "all_replied_s": finished,
+        "messages_per_s": total / finished,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deliveries", type=int, default=5)
+    parser.add_argument("--entries", type=int, default=10)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--statuses", type=int, default=5)
+    parser.add_argument("--senders", type=int, default=200)
+    parser.add_argument("--send-latency", type=float, default=0.05, help="simulated Graph API latency (s)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    concurrency_levels = args.concurrency
+    print(f"{'workers':>8} {'msgs':>7} {'ack avg ms':>11} {'ack max ms':>11} {'replied s':>10} {'msg/s':>9}")
+    for level in concurrency_levels:
+        args.concurrency = level
+        result = asyncio.run(run(args))
+        print(f"{level:>8} {result['messages']:>7} {result['ack_ms_avg']:>11.1f} {result['ack_ms_max']:>11.1f} "
+              f"{result['all_replied_s']:>10.2f} {result['messages_per_s']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,8 @@ class Settings:
 
     # Database Configuration - Updated to match user's .env
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./health_chatbot.db")
+    # Rows per statement (or per COPY on PostgreSQL) in the bulk crud helpers
+    db_bulk_chunk_size: int = int(os.getenv("DB_BULK_CHUNK_SIZE", "1000"))
 
     # SMS/WhatsApp Configuration - Updated to match user's .env structure
     # WhatsApp (user has different variable names)
@@ -38,6 +40,82 @@ class Settings:
     # Map to new variable names for backward compatibility
     whatsapp_token: Optional[str] = os.getenv("WHATSAPP_TOKEN") or os.getenv("WHATSAPP_API_KEY")
     whatsapp_phone_number_id: Optional[str] = os.getenv("WHATSAPP_PHONE_NUMBER_ID") or os.getenv("WHATSAPP_PHONE_NUMBER")
+    # Meta app secret; webhook deliveries are signed with it (X-Hub-Signature-256) and rejected without it
+    whatsapp_app_secret: Optional[str] = os.getenv("WHATSAPP_APP_SECRET") or os.getenv("WHATSAPP_API_SECRET")
+
+    # Inbound WhatsApp processing: webhook acknowledges, background workers do the work
+    whatsapp_worker_concurrency: int = int(os.getenv("WHATSAPP_WORKER_CONCURRENCY", "8"))
+    whatsapp_queue_size: int = int(os.getenv("WHATSAPP_QUEUE_SIZE", "1000"))
+
+    # Outbound WhatsApp dispatch: pooled client, pacing and retries
+    whatsapp_api_base_url: str = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com/v17.0")
+    whatsapp_messages_per_second: float = float(os.getenv("WHATSAPP_MESSAGES_PER_SECOND", "80"))
+    whatsapp_tier_limit: int = int(os.getenv("WHATSAPP_TIER_LIMIT", "1000"))  # business-initiated recipients per 24h, 0 = unlimited
+    whatsapp_per_recipient_rate: float = float(os.getenv("WHATSAPP_PER_RECIPIENT_RATE", "0.17"))  # ~1 message / 6 s
+    whatsapp_per_recipient_burst: float = float(os.getenv("WHATSAPP_PER_RECIPIENT_BURST", "10"))
+    whatsapp_send_concurrency: int = int(os.getenv("WHATSAPP_SEND_CONCURRENCY", "32"))
+    whatsapp_send_queue_size: int = int(os.getenv("WHATSAPP_SEND_QUEUE_SIZE", "10000"))
+    whatsapp_send_timeout: float = float(os.getenv("WHATSAPP_SEND_TIMEOUT", "10.0"))
+    whatsapp_send_max_attempts: int = int(os.getenv("WHATSAPP_SEND_MAX_ATTEMPTS", "5"))
+    whatsapp_send_backoff: float = float(os.getenv("WHATSAPP_SEND_BACKOFF", "1.0"))
+
+    # Workers reserved for the high-priority (emergency) lane in each messaging pool
+    whatsapp_reserved_emergency_workers: int = int(os.getenv("WHATSAPP_RESERVED_EMERGENCY_WORKERS", "2"))
+    sms_reserved_emergency_workers: int = int(os.getenv("SMS_RESERVED_EMERGENCY_WORKERS", "2"))
+    sms_send_concurrency: int = int(os.getenv("SMS_SEND_CONCURRENCY", "16"))
+    sms_send_queue_size: int = int(os.getenv("SMS_SEND_QUEUE_SIZE", "10000"))
+    # Account-wide Twilio throughput (depends on the sender type: long code, toll-free, short code)
+    sms_messages_per_second: float = float(os.getenv("SMS_MESSAGES_PER_SECOND", "10"))
+    sms_send_max_attempts: int = int(os.getenv("SMS_SEND_MAX_ATTEMPTS", "3"))
+    sms_send_backoff: float = float(os.getenv("SMS_SEND_BACKOFF", "1.0"))
+    sms_bulk_max_recipients: int = int(os.getenv("SMS_BULK_MAX_RECIPIENTS", "100000"))
+
+    # Delivery status updates are buffered and written to alerts in batches
+    delivery_status_flush_size: int = int(os.getenv("DELIVERY_STATUS_FLUSH_SIZE", "500"))
+    delivery_status_flush_interval: float = float(os.getenv("DELIVERY_STATUS_FLUSH_INTERVAL", "2.0"))
+
+    # Seconds between background health probes of the Twilio and WhatsApp gateways
+    gateway_probe_interval: float = float(os.getenv("GATEWAY_PROBE_INTERVAL", "60"))
+
+    # Broadcast campaigns: users read per keyset page, and sends queued but not yet finished
+    campaign_page_size: int = int(os.getenv("CAMPAIGN_PAGE_SIZE", "1000"))
+    campaign_max_in_flight: int = int(os.getenv("CAMPAIGN_MAX_IN_FLIGHT", "500"))
+
+    # Vaccination reminder scheduler: due reminders claimed per batch, idle poll interval and claim lease (seconds)
+    reminder_scheduler_enabled: bool = os.getenv("REMINDER_SCHEDULER_ENABLED", "true").lower() == "true"
+    reminder_channel: str = os.getenv("REMINDER_CHANNEL", "whatsapp")  # whatsapp or sms
+    reminder_batch_size: int = int(os.getenv("REMINDER_BATCH_SIZE", "200"))
+    reminder_poll_interval: float = float(os.getenv("REMINDER_POLL_INTERVAL", "30"))
+    reminder_lease_seconds: float = float(os.getenv("REMINDER_LEASE_SECONDS", "600"))
+
+    # Scheduled deliveries (timing wheel): quiet hours in the user's local time, spread of
+    # releases after quiet hours (seconds), release rate per channel, and the directory of
+    # per-worker restart checkpoints (they hold phone numbers: use a private data volume)
+    default_timezone: str = os.getenv("DEFAULT_TIMEZONE", "Asia/Kolkata")
+    delivery_quiet_hours_start: int = int(os.getenv("DELIVERY_QUIET_HOURS_START", "21"))
+    delivery_quiet_hours_end: int = int(os.getenv("DELIVERY_QUIET_HOURS_END", "8"))
+    delivery_quiet_spread: float = float(os.getenv("DELIVERY_QUIET_SPREAD", "3600"))
+    delivery_release_rate: float = float(os.getenv("DELIVERY_RELEASE_RATE", "20"))
+    delivery_checkpoint_dir: str = os.getenv("DELIVERY_CHECKPOINT_DIR", "scheduled_deliveries")
+    delivery_checkpoint_interval: float = float(os.getenv("DELIVERY_CHECKPOINT_INTERVAL", "60"))
+
+    # Conversation log: events buffered in memory (ring buffer capacity) and written in batches
+    conversation_log_enabled: bool = os.getenv("CONVERSATION_LOG_ENABLED", "true").lower() == "true"
+    conversation_log_capacity: int = int(os.getenv("CONVERSATION_LOG_CAPACITY", "50000"))
+    conversation_log_flush_size: int = int(os.getenv("CONVERSATION_LOG_FLUSH_SIZE", "500"))
+    conversation_log_flush_interval: float = float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL", "5.0"))
+
+    # Read-through user profile cache for inbound messages (entries, seconds; unknown numbers use the negative TTL)
+    default_country_code: str = os.getenv("DEFAULT_COUNTRY_CODE", "91")  # for ten-digit national numbers
+    user_cache_size: int = int(os.getenv("USER_CACHE_SIZE", "100000"))
+    user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", "300"))
+    user_cache_negative_ttl: float = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "60"))
+
+    # Webhook redelivery de-duplication ("memory" per worker, or "db" shared across workers)
+    webhook_dedupe_backend: str = os.getenv("WEBHOOK_DEDUPE_BACKEND", "memory")
+    dedupe_exact_window: float = float(os.getenv("DEDUPE_EXACT_WINDOW", "600"))
+    dedupe_bloom_window: float = float(os.getenv("DEDUPE_BLOOM_WINDOW", str(7 * 86400)))
+    dedupe_bloom_capacity: int = int(os.getenv("DEDUPE_BLOOM_CAPACITY", "500000"))
 
     # SMS Configuration (user's structure)
     sms_api_key: Optional[str] = os.getenv("SMS_API_KEY")
@@ -47,6 +125,14 @@ class Settings:
     twilio_account_sid: Optional[str] = os.getenv("TWILIO_ACCOUNT_SID")
     twilio_auth_token: Optional[str] = os.getenv("TWILIO_AUTH_TOKEN")
     twilio_phone_number: Optional[str] = os.getenv("TWILIO_PHONE_NUMBER")
+    # Point at a local stand-in (e.g. http://localhost:8765) for load testing
+    twilio_api_base_url: str = os.getenv("TWILIO_API_BASE_URL", "https://api.twilio.com")
+    twilio_timeout: float = float(os.getenv("TWILIO_TIMEOUT", "10.0"))
+    # Public URL of /api/sms/status-callback; when set, Twilio reports delivery status there
+    twilio_status_callback_url: Optional[str] = os.getenv("TWILIO_STATUS_CALLBACK_URL")
+    # SMS rendering: segment budget per message (0 = unlimited) and emoji handling (keep, drop or transliterate)
+    sms_max_segments: int = int(os.getenv("SMS_MAX_SEGMENTS", "4"))
+    sms_emoji_mode: str = os.getenv("SMS_EMOJI_MODE", "transliterate")
 
     # Security Configuration - Updated to match user's .env
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -64,6 +150,30 @@ class Settings:
     disease_sh_base_url: str = "https://disease.sh/v3/covid-19"
     cdc_data_base_url: str = "https://data.cdc.gov/api/odata/v4"
     fda_base_url: str = "https://api.fda.gov"
+    covid19india_base_url: str = os.getenv("COVID19INDIA_BASE_URL", "https://api.covid19india.org")
+
+    # Adaptive outbound timeouts (seconds): p99 x factor, clamped to [min, max]
+    upstream_default_timeout: float = float(os.getenv("UPSTREAM_DEFAULT_TIMEOUT", "10.0"))
+    upstream_min_timeout: float = float(os.getenv("UPSTREAM_MIN_TIMEOUT", "1.0"))
+    upstream_max_timeout: float = float(os.getenv("UPSTREAM_MAX_TIMEOUT", "30.0"))
+    upstream_timeout_factor: float = float(os.getenv("UPSTREAM_TIMEOUT_FACTOR", "3.0"))
+    upstream_min_samples: int = int(os.getenv("UPSTREAM_MIN_SAMPLES", "20"))
+
+    # Hedged requests across redundant data sources (seconds)
+    hedge_default_delay: float = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))
+    hedge_min_delay: float = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))
+    hedge_max_delay: float = float(os.getenv("HEDGE_MAX_DELAY", "5.0"))
+    hedge_min_samples: int = int(os.getenv("HEDGE_MIN_SAMPLES", "10"))
+
+    # Health news aggregation
+    news_poll_interval: float = float(os.getenv("NEWS_POLL_INTERVAL", "300"))
+    news_poll_page_size: int = int(os.getenv("NEWS_POLL_PAGE_SIZE", "50"))
+    news_poll_queries: list = [q.strip() for q in os.getenv("NEWS_POLL_QUERIES", "health,disease outbreak").split(",") if q.strip()]
+    news_index_size: int = int(os.getenv("NEWS_INDEX_SIZE", "500"))
+
+    # Outbreak area index: data file (pincode -> district -> state, plus outbreaks) and seconds between reload checks
+    outbreak_data_path: str = os.getenv("OUTBREAK_DATA_PATH", os.path.join(os.path.dirname(__file__), "data", "outbreak_areas.json"))
+    outbreak_reload_interval: float = float(os.getenv("OUTBREAK_RELOAD_INTERVAL", "300"))
 
     # Other settings
     debug: bool = os.getenv("DEBUG", "false").lower() == "true"
@@ -0,0 +1,115 @@
+"""
+Async counterparts of crud.py, for use with AsyncSession (get_async_db)
+
+Same names and arguments as the sync functions, so a handler can switch by
+changing the import and awaiting the call.
+"""
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..config import settings
+from ..services.geo import area_condition, location_fields
+from ..services.user_cache import user_cache
+from ..utils.phone import normalise_phone, phone_variants
+from . import models
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def get_user_by_phone(db: AsyncSession, phone: str):
+    variants = phone_variants(phone, settings.default_country_code)
+    result = await db.execute(select(models.User).where(models.User.phone.in_(variants)).limit(1))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, phone: str, language: str, location: str):
+    phone = normalise_phone(phone, settings.default_country_code) or phone
+    db_user = models.User(phone=phone, language=language, location=location, **location_fields(location))
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate([phone])
+    return db_user
+
+async def set_user_opt_in(db: AsyncSession, phone: str, opt_in: bool):
+    """Opt a user in to or out of outbound messages; returns the user, or None if unknown"""
+    db_user = await get_user_by_phone(db, phone)
+    if db_user is None:
+        return None
+    db_user.opt_in = opt_in
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate([db_user.phone])
+    return db_user
+
+async def create_alert(db: AsyncSession, user_id: int, alert_type: str, message: str):
+    db_alert = models.Alert(user_id=user_id, type=alert_type, message=message, status="pending")
+    db.add(db_alert)
+    await db.commit()
+    await db.refresh(db_alert)
+    return db_alert
+
+async def create_alerts(db: AsyncSession, rows: Sequence[dict]) -> List[int]:
+    """Insert many pending alerts in one statement; returns the new IDs in the same order as rows"""
+    if not rows:
+        return []
+    values = [{"status": "pending", **row} for row in rows]
+    result = await db.execute(insert(models.Alert).returning(models.Alert.id, sort_by_parameter_order=True), values)
+    ids = list(result.scalars())
+    await db.commit()
+    return ids
+
+async def get_opted_in_users(db: AsyncSession, after_id: int = 0, limit: int = 1000,
+                             languages: Optional[Iterable[str]] = None, locations: Optional[Iterable[str]] = None,
+                             areas: Optional[Iterable[Tuple[str, str]]] = None):
+    """One keyset page of opted-in users (id, phone, language, location, timezone) with id > after_id, in id order"""
+    query = select(models.User.id, models.User.phone, models.User.language, models.User.location,
+                    models.User.timezone).where(
+        models.User.opt_in.is_(True),
+        models.User.id > after_id
+    )
+    if languages:
+        query = query.where(models.User.language.in_(list(languages)))
+    if locations:
+        query = query.where(models.User.location.in_(list(locations)))
+    if areas:
+        query = query.where(or_(*(area_condition(level, area) for level, area in areas)))
+    result = await db.execute(query.order_by(models.User.id).limit(limit))
+    return result.all()
+
+async def update_alert_status(db: AsyncSession, alert_id: int, status: str, provider_message_id: str = None):
+    values = {"status": status}
+    if provider_message_id:
+        values["provider_message_id"] = provider_message_id
+    result = await db.execute(
+        update(models.Alert).where(models.Alert.id == alert_id).values(**values).returning(models.Alert)
+    )
+    db_alert = result.scalars().first()
+    await db.commit()
+    return db_alert
+
+async def create_vaccination_reminder(db: AsyncSession, user_id: int, child_age: float, vaccine_name: str, due_date: str):
+    db_reminder = models.VaccinationReminder(
+        user_id=user_id,
+        child_age=child_age,
+        vaccine_name=vaccine_name,
+        due_date=due_date
+    )
+    db.add(db_reminder)
+    await db.commit()
+    await db.refresh(db_reminder)
+    return db_reminder
+
+async def claim_processed_message(db: AsyncSession, provider: str, message_id: str):
+    """Record an inbound provider message ID; raises IntegrityError if it was already claimed"""
+    db.add(models.ProcessedMessage(provider=provider, message_id=message_id))
+    await db.commit()
+
+async def release_processed_message(db: AsyncSession, provider: str, message_id: str):
+    await db.execute(
+        delete(models.ProcessedMessage).where(
+            models.ProcessedMessage.provider == provider,
+            models.ProcessedMessage.message_id == message_id
+        )
+    )
+    await db.commit()
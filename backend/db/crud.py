@@ -1,17 +1,43 @@
+import csv
+import io
+from datetime import date, datetime
+from itertools import islice
+from typing import Callable, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, or_, update
 from sqlalchemy.orm import Session
+from ..config import settings
+from ..services.geo import UNRESOLVED, area_condition, location_fields
+from ..services.user_cache import user_cache
+from ..utils.phone import normalise_phone, phone_variants
 from . import models
 
+COPY_NULL = "\\N"
+
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 def get_user_by_phone(db: Session, phone: str):
-    return db.query(models.User).filter(models.User.phone == phone).first()
+    variants = phone_variants(phone, settings.default_country_code)
+    return db.query(models.User).filter(models.User.phone.in_(variants)).first()
 
 def create_user(db: Session, phone: str, language: str, location: str):
-    db_user = models.User(phone=phone, language=language, location=location)
+    phone = normalise_phone(phone, settings.default_country_code) or phone
+    db_user = models.User(phone=phone, language=language, location=location, **location_fields(location))
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    user_cache.invalidate([phone])  # drops a cached "no such user"
+    return db_user
+
+def set_user_opt_in(db: Session, phone: str, opt_in: bool):
+    """Opt a user in to or out of outbound messages; returns the user, or None if unknown"""
+    db_user = get_user_by_phone(db, phone)
+    if db_user is None:
+        return None
+    db_user.opt_in = opt_in
+    db.commit()
+    db.refresh(db_user)
+    user_cache.invalidate([db_user.phone])
     return db_user
 
 def create_alert(db: Session, user_id: int, alert_type: str, message: str):
@@ -21,6 +47,175 @@ def create_alert(db: Session, user_id: int, alert_type: str, message: str):
     db.refresh(db_alert)
     return db_alert
 
+def _chunks(rows: Iterable[dict], size: int):
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _normalise(table, chunk: List[dict], defaults: dict) -> List[dict]:
+    """Give every row the same keys (executemany and COPY need one column list), filling Python-side defaults"""
+    keys = list(dict.fromkeys(key for row in chunk for key in row))
+    for key, value in defaults.items():
+        if key not in keys:
+            keys.append(key)
+    scalar_defaults = {
+        column.name: column.default.arg
+        for column in table.columns
+        if column.default is not None and column.default.is_scalar
+    }
+    return [
+        {key: row[key] if key in row else defaults.get(key, scalar_defaults.get(key)) for key in keys}
+        for row in chunk
+    ]
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _copy_chunk(db: Session, table, chunk: List[dict]):
+    """COPY ... FROM STDIN for one chunk (PostgreSQL with psycopg2 only)"""
+    columns = list(chunk[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in chunk:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    quote = db.get_bind().dialect.identifier_preparer.quote
+    statement = (
+        f"COPY {quote(table.name)} ({', '.join(quote(column) for column in columns)}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(statement, buffer)
+    finally:
+        cursor.close()
+
+def bulk_insert(db: Session, model, rows: Iterable[dict], return_ids: bool = False,
+                chunk_size: Optional[int] = None, defaults: Optional[dict] = None) -> List[int]:
+    """Insert many rows in chunks and commit once.
+
+    With return_ids each chunk is one INSERT ... RETURNING and the new IDs are
+    returned in the same order as rows. Without it, PostgreSQL (psycopg2) uses
+    COPY and other databases an executemany INSERT, and an empty list is returned.
+    """
+    table = model.__table__
+    chunk_size = chunk_size or settings.db_bulk_chunk_size
+    dialect = db.get_bind().dialect
+    use_copy = not return_ids and dialect.name == "postgresql" and dialect.driver == "psycopg2"
+    ids = []
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            chunk = _normalise(table, chunk, defaults or {})
+            if return_ids:
+                result = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), chunk)
+                ids.extend(result.scalars())
+            elif use_copy:
+                _copy_chunk(db, table, chunk)
+            else:
+                db.execute(insert(model), chunk)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return ids
+
+def create_users(db: Session, rows: Iterable[dict], return_ids: bool = False) -> List[int]:
+    """Insert many users (dicts with phone, language, location and optionally opt_in)"""
+    phones = []
+
+    def normalised(row: dict) -> dict:
+        phone = normalise_phone(row.get("phone"), settings.default_country_code) or row.get("phone")
+        phones.append(phone)
+        return {**location_fields(row.get("location")), **row, "phone": phone}
+
+    ids = bulk_insert(db, models.User, (normalised(row) for row in rows), return_ids=return_ids)
+    user_cache.invalidate(phones)
+    return ids
+
+def backfill_user_areas(db: Session, batch_size: int = 1000, stop: Optional[Callable[[], bool]] = None,
+                        unresolved: bool = False) -> int:
+    """Resolve pincode/district/state for users stored without them; returns the number updated
+
+    With unresolved, users whose location could not be resolved before are retried too
+    (after the area data changed); they are only written if they now resolve.
+    """
+    user = models.User
+    pending = user.state.is_(None)
+    if unresolved:
+        pending = pending | (user.state == UNRESOLVED)
+    updated = 0
+    after_id = 0
+    while not (stop and stop()):
+        rows = db.query(user.id, user.location, user.state).filter(
+            pending,
+            user.location.isnot(None),
+            user.id > after_id
+        ).order_by(user.id).limit(batch_size).all()
+        if not rows:
+            return updated
+        values = [{"id": row.id, **location_fields(row.location)} for row in rows]
+        values = [fields for fields, row in zip(values, rows) if row.state is None or fields["state"] != UNRESOLVED]
+        if values:
+            db.execute(update(user), values)
+            db.commit()
+        updated += len(values)
+        after_id = rows[-1].id
+    return updated
+
+def create_alerts(db: Session, rows: Iterable[dict], return_ids: bool = True) -> List[int]:
+    """Insert many pending alerts; rows are dicts with user_id, type and message.
+
+    Returns the new alert IDs in the same order as rows (unless return_ids is False).
+    """
+    return bulk_insert(db, models.Alert, rows, return_ids=return_ids, defaults={"status": "pending"})
+
+def create_vaccination_reminders(db: Session, rows: Iterable[dict], return_ids: bool = False) -> List[int]:
+    """Insert many reminders (dicts with user_id, child_age, vaccine_name and due_date)"""
+    return bulk_insert(db, models.VaccinationReminder, rows, return_ids=return_ids)
+
+def create_conversation_events(db: Session, rows: Iterable[dict]) -> List[int]:
+    """Insert many conversation events (dicts with the ConversationEvent columns)"""
+    return bulk_insert(db, models.ConversationEvent, rows)
+
+def get_opted_in_users(db: Session, after_id: int = 0, limit: int = 1000,
+                       languages: Optional[Iterable[str]] = None, locations: Optional[Iterable[str]] = None,
+                       areas: Optional[Iterable[Tuple[str, str]]] = None):
+    """One keyset page of opted-in users (id, phone, language, location, timezone) with id > after_id, in id order
+
+    areas are (level, area) pairs from geo.parse_area; a user in any of them matches.
+    """
+    query = db.query(models.User.id, models.User.phone, models.User.language, models.User.location,
+                     models.User.timezone).filter(
+        models.User.opt_in.is_(True),
+        models.User.id > after_id
+    )
+    if languages:
+        query = query.filter(models.User.language.in_(list(languages)))
+    if locations:
+        query = query.filter(models.User.location.in_(list(locations)))
+    if areas:
+        query = query.filter(or_(*(area_condition(level, area) for level, area in areas)))
+    return query.order_by(models.User.id).limit(limit).all()
+
+def update_alert_status(db: Session, alert_id: int, status: str, provider_message_id: str = None):
+    db_alert = db.query(models.Alert).filter(models.Alert.id == alert_id).first()
+    if db_alert is None:
+        return None
+    db_alert.status = status
+    if provider_message_id:
+        db_alert.provider_message_id = provider_message_id
+    db.commit()
+    return db_alert
+
 def create_vaccination_reminder(db: Session, user_id: int, child_age: float, vaccine_name: str, due_date: str):
     db_reminder = models.VaccinationReminder(
         user_id=user_id,
@@ -1,9 +1,12 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import ArgumentError, InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from dotenv import load_dotenv
 import os
 import time
 import logging
+from typing import Optional
 from ..config import settings
 
 load_dotenv()
@@ -42,6 +45,45 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Async drivers for the same database: asyncpg for PostgreSQL, aiosqlite for SQLite (both in requirements)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> Optional[str]:
+    """Map a sync database URL onto the matching async driver, or None if there is none"""
+    scheme, _, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme)
+    return f"{driver}://{rest}" if driver else None
+
+async_engine = None
+AsyncSessionLocal = None
+
+try:
+    async_url = async_database_url(SQLALCHEMY_DATABASE_URL)
+    if async_url is None:
+        raise ArgumentError(f"no async driver for {SQLALCHEMY_DATABASE_URL.partition('://')[0]}")
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        async_engine_kwargs = {}
+    else:
+        async_engine_kwargs = {
+            "pool_pre_ping": True,
+            "pool_recycle": 300,
+            "pool_size": 10,
+            "max_overflow": 20,
+        }
+    async_engine = create_async_engine(async_url, **async_engine_kwargs)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    logger.info("Async database engine configured")
+except (ImportError, ArgumentError, InvalidRequestError) as e:
+    # The async driver (asyncpg/aiosqlite) is optional, and other databases have none mapped;
+    # callers fall back to the sync engine in a thread
+    logger.warning(f"Async database driver not available, using sync sessions only: {e}")
+    async_engine = None
+
 def wait_for_db(max_retries=30, delay=2):
     """Wait for database to be ready with retry logic"""
     for attempt in range(max_retries):
@@ -67,4 +109,11 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async dependency, for handlers that use async_crud
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database driver not installed (asyncpg or aiosqlite)")
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
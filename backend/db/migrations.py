@@ -0,0 +1,74 @@
+"""
+Schema migrations (Alembic, backend/migrations) applied at startup
+
+A database created by the old create_all startup path has the tables but no
+alembic_version row; it is brought up to the baseline (tables and columns
+added to the models before migrations existed) and stamped, so only the later
+migrations run against it.
+"""
+
+import logging
+import os
+
+from sqlalchemy import Column, String, inspect
+
+from ..config import settings
+from . import models
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(connection=None):
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    # ConfigParser interpolation treats % specially (e.g. in URL-encoded passwords)
+    config.set_main_option("sqlalchemy.url", settings.database_url.replace("%", "%%"))
+    config.attributes["configure_logger"] = False
+    config.attributes["target_metadata"] = models.Base.metadata
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(revision: str = "head"):
+    """Bring the schema up to revision (create_all if alembic is not installed)"""
+    try:
+        from alembic import command
+    except ImportError:
+        logger.warning("alembic not installed, creating tables without migrations")
+        models.Base.metadata.create_all(bind=engine)
+        return
+
+    with engine.begin() as connection:
+        config = alembic_config(connection)
+        tables = set(inspect(connection).get_table_names())
+        if "users" in tables and "alembic_version" not in tables:
+            logger.info(f"Existing schema without migration history, stamping revision {BASELINE_REVISION}")
+            _complete_baseline(connection, tables)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
+
+
+def _complete_baseline(connection, tables):
+    """Add baseline tables/columns an older create_all database may be missing"""
+    from alembic.operations import Operations
+    from alembic.runtime.migration import MigrationContext
+
+    if "processed_messages" not in tables:
+        models.ProcessedMessage.__table__.create(connection)
+    alert_columns = {column["name"] for column in inspect(connection).get_columns("alerts")}
+    if "provider_message_id" not in alert_columns:
+        Operations(MigrationContext.configure(connection)).add_column("alerts", Column("provider_message_id", String))
+
+
+def downgrade_database(revision: str):
+    from alembic import command
+
+    with engine.begin() as connection:
+        command.downgrade(alembic_config(connection), revision)
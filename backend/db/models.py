@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -8,27 +8,106 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     phone = Column(String, unique=True, index=True)
     language = Column(String)
-    location = Column(String)
+    location = Column(String, index=True)
     opt_in = Column(Boolean, default=True)
+    timezone = Column(String)  # IANA name, e.g. Asia/Kolkata; settings.default_timezone if unset
+    # Canonical area of location, resolved at write time (services/geo.py)
+    pincode = Column(String)
+    district = Column(String)
+    state = Column(String)  # "" if location could not be resolved, NULL if not resolved yet
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Campaign segment selection: opted-in users by language/location, walked in id order
+        Index("ix_users_opted_in_segment", "language", "location", "id",
+              postgresql_where=opt_in.is_(True), sqlite_where=opt_in.is_(True)),
+        # Area -> opted-in user lookups for outbreak alerts, walked in id order
+        Index("ix_users_opted_in_state", "state", "id",
+              postgresql_where=opt_in.is_(True), sqlite_where=opt_in.is_(True)),
+        Index("ix_users_opted_in_district", "state", "district", "id",
+              postgresql_where=opt_in.is_(True), sqlite_where=opt_in.is_(True)),
+        Index("ix_users_opted_in_pincode", "pincode", "id",
+              postgresql_where=opt_in.is_(True), sqlite_where=opt_in.is_(True)),
+        # Users whose location has not been resolved yet (rows written before the area columns)
+        Index("ix_users_area_pending", "id",
+              postgresql_where=state.is_(None) & location.isnot(None),
+              sqlite_where=state.is_(None) & location.isnot(None)),
+    )
+
 class Alert(Base):
     __tablename__ = "alerts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", name="fk_alerts_user_id_users"))
     type = Column(String)  # vaccination or outbreak
     message = Column(String)
     sent_at = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String)  # pending, sent, failed
+    provider_message_id = Column(String, index=True)  # WhatsApp wamid / Twilio MessageSid once sent
+
+    __table_args__ = (
+        # A user's alert history, newest first
+        Index("ix_alerts_user_id_sent_at", "user_id", "sent_at"),
+        # Status reporting over a time range
+        Index("ix_alerts_status_sent_at", "status", "sent_at"),
+        # Queue of alerts still waiting to be sent, oldest first
+        Index("ix_alerts_pending", "id",
+              postgresql_where=status == "pending", sqlite_where=status == "pending"),
+    )
 
 class VaccinationReminder(Base):
     __tablename__ = "vaccination_reminders"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", name="fk_vaccination_reminders_user_id_users"))
     child_age = Column(Float)
     vaccine_name = Column(String)
     due_date = Column(DateTime)
-    reminded_at = Column(DateTime(timezone=True))
\ No newline at end of file
+    reminded_at = Column(DateTime(timezone=True))
+    claimed_by = Column(String)  # scheduler worker currently sending this reminder
+    lease_expires_at = Column(DateTime(timezone=True))  # claim is void after this, so another worker retries
+    send_after = Column(DateTime(timezone=True))  # not claimed before this (deferred out of the user's quiet hours)
+    # Alert row the reminder is sent under, reused when a failed send is retried
+    alert_id = Column(Integer, ForeignKey("alerts.id", ondelete="SET NULL", name="fk_vaccination_reminders_alert_id_alerts"))
+    skipped_at = Column(DateTime(timezone=True))  # closed without sending because the user opted out
+
+    __table_args__ = (
+        # A user's upcoming reminders
+        Index("ix_vaccination_reminders_user_id_due_date", "user_id", "due_date"),
+        # Due-reminder scan: only reminders neither sent nor skipped, in due order
+        Index("ix_vaccination_reminders_due", "due_date", "id",
+              postgresql_where=reminded_at.is_(None) & skipped_at.is_(None),
+              sqlite_where=reminded_at.is_(None) & skipped_at.is_(None)),
+    )
+
+class ProcessedMessage(Base):
+    __tablename__ = "processed_messages"
+    __table_args__ = (UniqueConstraint("provider", "message_id", name="uq_processed_messages_provider_message_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(String, nullable=False)  # whatsapp or twilio
+    message_id = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class ConversationEvent(Base):
+    __tablename__ = "conversation_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, nullable=False)  # web, whatsapp or sms
+    session_id = Column(String)  # chat session ID, or the sender's phone number
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL", name="fk_conversation_events_user_id_users"))
+    message = Column(String)
+    intent = Column(String)
+    confidence = Column(Float)
+    source = Column(String)  # rasa, patterns or fallback
+    latency_ms = Column(Float)
+    # When the message was handled; set by the app because rows are written in later batches
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # A conversation's history, in order
+        Index("ix_conversation_events_session_id_created_at", "session_id", "created_at"),
+        # Intent/latency reporting over a time range
+        Index("ix_conversation_events_created_at", "created_at"),
+    )
@@ -0,0 +1,71 @@
+"""foreign keys and indexes for hot query paths
+
+- users: location, and a partial (language, location, id) index over
+  opted-in users for campaign segment pages
+- alerts: user_id foreign key, provider_message_id lookups from status
+  callbacks, per-user and per-status history by sent_at, and a partial index
+  over pending alerts
+- vaccination_reminders: user_id foreign key, per-user upcoming reminders,
+  and a partial (due_date, id) index over reminders not yet sent
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_users_location", "users", ["location"])
+    op.create_index(
+        "ix_users_opted_in_segment", "users", ["language", "location", "id"],
+        postgresql_where=sa.text("opt_in IS true"), sqlite_where=sa.text("opt_in IS 1"),
+    )
+
+    with op.batch_alter_table("alerts") as batch_op:
+        batch_op.create_foreign_key("fk_alerts_user_id_users", "users", ["user_id"], ["id"], ondelete="CASCADE")
+    op.create_index("ix_alerts_provider_message_id", "alerts", ["provider_message_id"])
+    op.create_index("ix_alerts_user_id_sent_at", "alerts", ["user_id", "sent_at"])
+    op.create_index("ix_alerts_status_sent_at", "alerts", ["status", "sent_at"])
+    op.create_index(
+        "ix_alerts_pending", "alerts", ["id"],
+        postgresql_where=sa.text("status = 'pending'"), sqlite_where=sa.text("status = 'pending'"),
+    )
+
+    with op.batch_alter_table("vaccination_reminders") as batch_op:
+        batch_op.create_foreign_key(
+            "fk_vaccination_reminders_user_id_users", "users", ["user_id"], ["id"], ondelete="CASCADE"
+        )
+    op.create_index("ix_vaccination_reminders_user_id_due_date", "vaccination_reminders", ["user_id", "due_date"])
+    op.create_index(
+        "ix_vaccination_reminders_due", "vaccination_reminders", ["due_date", "id"],
+        postgresql_where=sa.text("reminded_at IS NULL"), sqlite_where=sa.text("reminded_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_vaccination_reminders_due", table_name="vaccination_reminders")
+    op.drop_index("ix_vaccination_reminders_user_id_due_date", table_name="vaccination_reminders")
+    with op.batch_alter_table("vaccination_reminders") as batch_op:
+        batch_op.drop_constraint("fk_vaccination_reminders_user_id_users", type_="foreignkey")
+
+    op.drop_index("ix_alerts_pending", table_name="alerts")
+    op.drop_index("ix_alerts_status_sent_at", table_name="alerts")
+    op.drop_index("ix_alerts_user_id_sent_at", table_name="alerts")
+    op.drop_index("ix_alerts_provider_message_id", table_name="alerts")
+    with op.batch_alter_table("alerts") as batch_op:
+        batch_op.drop_constraint("fk_alerts_user_id_users", type_="foreignkey")
+
+    op.drop_index("ix_users_opted_in_segment", table_name="users")
+    op.drop_index("ix_users_location", table_name="users")
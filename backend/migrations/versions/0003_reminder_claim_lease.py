@@ -0,0 +1,32 @@
+"""reminder claim lease
+
+Columns the reminder scheduler uses to claim due reminders: the claiming
+worker and when its claim lapses.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("vaccination_reminders", sa.Column("claimed_by", sa.String(), nullable=True))
+    op.add_column("vaccination_reminders", sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("vaccination_reminders") as batch_op:
+        batch_op.drop_column("lease_expires_at")
+        batch_op.drop_column("claimed_by")
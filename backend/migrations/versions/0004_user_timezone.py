@@ -0,0 +1,30 @@
+"""user timezone
+
+The user's IANA timezone, used to keep scheduled deliveries out of quiet
+hours in local time.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("timezone", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("timezone")
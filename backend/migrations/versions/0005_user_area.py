@@ -0,0 +1,47 @@
+"""user area columns
+
+Canonical pincode, district and state resolved from the free-text location,
+with partial indexes over opted-in users for area -> user lookups and one
+over users whose location has not been resolved yet. Existing users are
+resolved by the user area backfill at startup (services/geo.py).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPTED_IN = {"postgresql_where": sa.text("opt_in IS true"), "sqlite_where": sa.text("opt_in IS 1")}
+PENDING = sa.text("state IS NULL AND location IS NOT NULL")
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("pincode", sa.String(), nullable=True))
+    op.add_column("users", sa.Column("district", sa.String(), nullable=True))
+    op.add_column("users", sa.Column("state", sa.String(), nullable=True))
+    op.create_index("ix_users_opted_in_state", "users", ["state", "id"], **OPTED_IN)
+    op.create_index("ix_users_opted_in_district", "users", ["state", "district", "id"], **OPTED_IN)
+    op.create_index("ix_users_opted_in_pincode", "users", ["pincode", "id"], **OPTED_IN)
+    op.create_index("ix_users_area_pending", "users", ["id"], postgresql_where=PENDING, sqlite_where=PENDING)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_area_pending", table_name="users")
+    op.drop_index("ix_users_opted_in_pincode", table_name="users")
+    op.drop_index("ix_users_opted_in_district", table_name="users")
+    op.drop_index("ix_users_opted_in_state", table_name="users")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("state")
+        batch_op.drop_column("district")
+        batch_op.drop_column("pincode")
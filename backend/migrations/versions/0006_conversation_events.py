@@ -0,0 +1,51 @@
+"""conversation events
+
+Log of handled inbound messages (web chat, WhatsApp, SMS): intent,
+confidence, Rasa/pattern/fallback source and response latency, written in
+batches by services/conversation_log.py.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "conversation_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("channel", sa.String(), nullable=False),
+        sa.Column("session_id", sa.String(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("message", sa.String(), nullable=True),
+        sa.Column("intent", sa.String(), nullable=True),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        sa.Column("source", sa.String(), nullable=True),
+        sa.Column("latency_ms", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], name="fk_conversation_events_user_id_users",
+                                ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_conversation_events_id", "conversation_events", ["id"])
+    op.create_index("ix_conversation_events_session_id_created_at", "conversation_events", ["session_id", "created_at"])
+    op.create_index("ix_conversation_events_created_at", "conversation_events", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_conversation_events_created_at", table_name="conversation_events")
+    op.drop_index("ix_conversation_events_session_id_created_at", table_name="conversation_events")
+    op.drop_index("ix_conversation_events_id", table_name="conversation_events")
+    op.drop_table("conversation_events")
@@ -0,0 +1,30 @@
+"""reminder send after
+
+When a reminder claimed during the user's quiet hours may be sent, so it
+waits in the database rather than in one worker's memory.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-20 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("vaccination_reminders", sa.Column("send_after", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("vaccination_reminders") as batch_op:
+        batch_op.drop_column("send_after")
@@ -0,0 +1,49 @@
+"""reminder alert and skipped
+
+The alert row a reminder is sent under, so a retried send reuses it rather
+than adding another, and when a reminder was closed without being sent
+(its user opted out), so it is never claimed again.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-21 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("vaccination_reminders") as batch_op:
+        batch_op.add_column(sa.Column("alert_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("skipped_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_foreign_key("fk_vaccination_reminders_alert_id_alerts", "alerts", ["alert_id"], ["id"],
+                                    ondelete="SET NULL")
+    # Skipped reminders leave the due-reminder scan just as sent ones do
+    op.drop_index("ix_vaccination_reminders_due", table_name="vaccination_reminders")
+    op.create_index(
+        "ix_vaccination_reminders_due", "vaccination_reminders", ["due_date", "id"],
+        postgresql_where=sa.text("reminded_at IS NULL AND skipped_at IS NULL"),
+        sqlite_where=sa.text("reminded_at IS NULL AND skipped_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_vaccination_reminders_due", table_name="vaccination_reminders")
+    op.create_index(
+        "ix_vaccination_reminders_due", "vaccination_reminders", ["due_date", "id"],
+        postgresql_where=sa.text("reminded_at IS NULL"), sqlite_where=sa.text("reminded_at IS NULL"),
+    )
+    with op.batch_alter_table("vaccination_reminders") as batch_op:
+        batch_op.drop_constraint("fk_vaccination_reminders_alert_id_alerts", type_="foreignkey")
+        batch_op.drop_column("skipped_at")
+        batch_op.drop_column("alert_id")
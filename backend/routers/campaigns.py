@@ -0,0 +1,70 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+import logging
+from typing import Any, Dict, List, Optional
+from ..services.campaigns import campaign_engine
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class CampaignRequest(BaseModel):
+    name: str
+    channel: str = "whatsapp"  # whatsapp or sms
+    message: Optional[str] = None  # may use {location}, {language} and {campaign}
+    messages: Optional[Dict[str, str]] = None  # per-language overrides of message
+    template: Optional[str] = None  # registered template name, instead of message
+    fields: Optional[Dict[str, Any]] = None  # template fields shared by all recipients
+    languages: Optional[List[str]] = None
+    locations: Optional[List[str]] = None
+    areas: Optional[List[str]] = None  # e.g. state:Karnataka, district:Maharashtra/Mumbai, pincode:110001, prefix:7000
+    alert_type: str = "campaign"
+
+@router.post("")
+async def create_campaign(request: CampaignRequest):
+    """
+    Start a broadcast to all opted-in users matching the language/location/area filters
+    """
+    try:
+        campaign = campaign_engine.create(
+            request.name,
+            request.channel,
+            request.message,
+            messages=request.messages,
+            languages=request.languages,
+            locations=request.locations,
+            areas=request.areas,
+            alert_type=request.alert_type,
+            template=request.template,
+            fields=request.fields
+        )
+        return campaign.to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("")
+async def list_campaigns():
+    """
+    Progress of every campaign started by this worker
+    """
+    return {"campaigns": [campaign.to_dict() for campaign in campaign_engine.list()]}
+
+@router.get("/{campaign_id}")
+async def get_campaign(campaign_id: int):
+    """
+    Progress, throughput and failure counts of one campaign
+    """
+    campaign = campaign_engine.get(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign.to_dict()
+
+@router.post("/{campaign_id}/cancel")
+async def cancel_campaign(campaign_id: int):
+    """
+    Stop queueing further recipients; messages already queued are still sent
+    """
+    campaign = campaign_engine.cancel(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign.to_dict()
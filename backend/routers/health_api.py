@@ -4,12 +4,17 @@ import logging
 from typing import Dict, Any, List, Optional
 import re
 import json
+import time
 import uuid
 
 # Add new imports for external APIs (converted to relative imports)
 from ..services.health_data_service import health_data_service
 from ..services.india_health_service import india_health_service
 from ..services.rasa_service import rasa_service
+from ..services.news_aggregator import news_aggregator
+from ..services.outbreak import outbreak_areas
+from ..services.conversation_log import conversation_log
+from ..services.worker_pool import Priority
 from ..config import settings
 
 logger = logging.getLogger(__name__)
@@ -209,6 +214,11 @@ def detect_intent(message: str) -> tuple[str, float]:
 
     return best_intent, min(best_confidence, 1.0)
 
+def message_priority(message: str) -> Priority:
+    """Messaging lane for an inbound message: emergencies jump ahead of everything else"""
+    intent, _ = detect_intent(message)
+    return Priority.HIGH if intent == 'ask_emergency' else Priority.NORMAL
+
 def get_response_for_intent(intent: str) -> str:
     """Get a response for the detected intent"""
     if intent in INTENT_RESPONSES:
@@ -222,24 +232,30 @@ async def chat_with_rasa(chat_message: ChatMessage):
     """
     Enhanced chat endpoint using RASA for intelligent responses
     """
+    started = time.perf_counter()
+    # Generate session ID if not provided
+    session_id = chat_message.session_id or str(uuid.uuid4())
     try:
-        # Generate session ID if not provided
-        session_id = chat_message.session_id or str(uuid.uuid4())
-
         # Send message to RASA and get response
         rasa_response = await rasa_service.send_message_to_rasa(
             message=chat_message.message,
             sender_id=session_id
         )
 
-        # Return formatted response
-        return ChatResponse(**rasa_response)
+        # Formatted response
+        chat_response = ChatResponse(**rasa_response)
 
     except Exception as e:
         logger.error(f"Error in chat endpoint: {e}")
         # Fallback to basic response if RASA fails
         fallback_response = rasa_service._fallback_response(chat_message.message)
-        return ChatResponse(**fallback_response)
+        chat_response = ChatResponse(**fallback_response)
+
+    # Buffered in memory and written to the database in batches, off the request path
+    conversation_log.record("web", chat_message.message, intent=chat_response.intent,
+                            confidence=chat_response.confidence, source=chat_response.source,
+                            latency=time.perf_counter() - started, session_id=session_id)
+    return chat_response
 
 @router.get("/rasa/status")
 async def get_rasa_status():
@@ -295,8 +311,8 @@ async def get_outbreak_info(country: str = "all"):
         # Get COVID data from Disease.sh API (free)
         covid_result = await health_data_service.get_covid_data(country)
 
-        # Get health news for additional outbreak info
-        news_result = await health_data_service.get_health_news("disease outbreak")
+        # Outbreak news comes from the aggregated index, never an inline upstream call
+        outbreak_news = news_aggregator.query("disease outbreak", limit=5)
 
         alerts = []
 
@@ -323,7 +339,7 @@ async def get_outbreak_info(country: str = "all"):
         return {
             "message": "Current disease outbreak status",
             "alerts": alerts,
-            "news": news_result.get("data", []) if news_result["success"] else [],
+            "news": outbreak_news,
             "source": "Disease.sh API + Health News",
             "last_updated": "Real-time data"
         }
@@ -332,6 +348,23 @@ async def get_outbreak_info(country: str = "all"):
         logger.error(f"Error getting outbreak info: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving outbreak information")
 
+@router.get("/outbreak/area/{pincode}")
+async def get_area_outbreaks(pincode: str):
+    """Active outbreaks covering a pincode, its district and its state"""
+    if not re.fullmatch(r"\d{6}", pincode):
+        raise HTTPException(status_code=400, detail="Pincode must be 6 digits")
+    index = outbreak_areas.current()
+    return {
+        "location": index.locate(pincode),
+        "outbreaks": [outbreak.to_dict() for outbreak in index.outbreaks_at(pincode)]
+    }
+
+@router.get("/outbreak/affected")
+async def get_affected_pincodes(disease: str, days: int = 14):
+    """Pincodes covered by outbreaks of a disease active at any time in the last `days` days"""
+    pincodes = outbreak_areas.current().affected_pincodes(disease, days)
+    return {"disease": disease, "days": days, "count": len(pincodes), "pincodes": pincodes}
+
 @router.get("/drug-info/{drug_name}")
 async def get_drug_info(drug_name: str):
     """Get drug information from FDA API"""
@@ -377,15 +410,19 @@ async def get_weather_health_advisory(location: str = "global"):
         raise HTTPException(status_code=500, detail="Error retrieving weather advisory")
 
 @router.get("/health-news")
-async def get_health_news(query: str = "health"):
-    """Get latest health news and alerts"""
+async def get_health_news(query: str = "health", locale: Optional[str] = None, limit: int = 5):
+    """Get latest health news and alerts from the aggregated news index"""
     try:
-        result = await health_data_service.get_health_news(query)
+        articles = news_aggregator.query(query, locale=locale, limit=limit)
+        source = "Aggregated NewsAPI + Data.gov.in"
+        if not articles:
+            articles = health_data_service._get_fallback_health_news()["data"]
+            source = "Curated Health News"
 
         return {
             "message": f"Latest health news for: {query}",
-            "articles": result["data"],
-            "source": "NewsAPI" if settings.news_api_key else "Curated Health News"
+            "articles": articles,
+            "source": source
         }
     except Exception as e:
         logger.error(f"Error getting health news: {e}")
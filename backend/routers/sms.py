@@ -1,19 +1,38 @@
 from fastapi import APIRouter, HTTPException, Form, Request
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import json
 import logging
-from typing import Dict, Any
-from ..services.health_data_service import health_data_service
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
 from ..services.india_health_service import india_health_service
 from ..config import settings
+from ..db import crud
+from ..db.database import SessionLocal
+from ..services.dedupe import webhook_deduplicator
+from ..services.delivery_scheduler import delivery_scheduler
+from ..services.sms_dispatcher import sms_dispatcher
+from ..services.sms_renderer import render_sms
+from ..utils.sms_encoding import segment_info
+from ..services.templates import template_registry
+from ..services.gateway_status import gateway_prober
+from ..services.delivery_status import delivery_status_buffer
+from ..services.user_cache import opt_keyword, user_cache
+from ..services.conversation_log import conversation_log
+from ..services.worker_pool import Priority
 from ..routers.health_api import detect_intent, get_response_for_intent
-from twilio.rest import Client
+from twilio.request_validator import RequestValidator
 from twilio.twiml.messaging_response import MessagingResponse
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SMS_FOOTER = "Text STOP to unsubscribe. Emergency? Call 911/108"
+
 class SMSMessage(BaseModel):
     to: str
     message: str
@@ -22,6 +41,12 @@ class SMSResponse(BaseModel):
     success: bool
     message: str
     sid: str = None
+    segments: Optional[int] = None
+
+class BulkSMSRequest(BaseModel):
+    recipients: List[str]
+    message: str
+    priority: Priority = Priority.LOW
 
 @router.post("/webhook")
 async def sms_webhook(
@@ -34,10 +59,25 @@ async def sms_webhook(
     Handle incoming SMS messages via Twilio webhook
     """
     try:
+        # Twilio retries deliveries it considers failed; answer each MessageSid only once
+        if await webhook_deduplicator.is_duplicate("twilio", MessageSid):
+            logger.info(f"Skipping retried SMS {MessageSid}")
+            return Response(content=str(MessagingResponse()), media_type="application/xml")
+
         logger.info(f"Received SMS from {From}: {Body}")
 
+        # Twilio answers STOP/START itself (and blocks our reply); just record the change
+        opt_in = opt_keyword(Body)
+        if opt_in is not None:
+            # Written straight to the database, so a failed profile lookup cannot lose the request
+            await user_cache.set_opt_in(From, opt_in)
+            return Response(content=str(MessagingResponse()), media_type="application/xml")
+
+        # Sender's profile, almost always from the in-memory cache
+        user = await user_cache.get(From)
+
         # Process the health-related message
-        response_text = await process_health_sms(Body)
+        response_text = await process_health_sms(Body, sender=From, user_id=user.id if user else None)
 
         # Create TwiML response
         resp = MessagingResponse()
@@ -51,8 +91,36 @@ async def sms_webhook(
         resp = MessagingResponse()
         return Response(content=str(resp), media_type="application/xml")
 
-async def process_health_sms(message: str) -> str:
+@router.post("/status-callback")
+async def sms_status_callback(
+    request: Request,
+    MessageSid: str = Form(...),
+    MessageStatus: str = Form(...),
+    ErrorCode: str = Form(None)
+):
+    """
+    Handle Twilio delivery status callbacks (queued, sent, delivered, undelivered, failed)
+    """
+    # Only Twilio may rewrite alert statuses; it signs each callback with the account's auth token
+    if not settings.twilio_auth_token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    # Signed over the URL Twilio was given, which behind a proxy differs from the one received
+    url = settings.twilio_status_callback_url or str(request.url)
+    form = await request.form()
+    validator = RequestValidator(settings.twilio_auth_token)
+    if not validator.validate(url, dict(form), request.headers.get("X-Twilio-Signature", "")):
+        logger.warning(f"Rejected status callback for {MessageSid} with an invalid signature")
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    if ErrorCode:
+        logger.warning(f"SMS {MessageSid} is {MessageStatus} with error {ErrorCode}")
+    # Buffered and written to alerts in batches, coalesced per message
+    delivery_status_buffer.record_callback("twilio", MessageSid, MessageStatus)
+    return Response(status_code=204)
+
+async def process_health_sms(message: str, sender: Optional[str] = None, user_id: Optional[int] = None) -> str:
     """Process health-related SMS and return appropriate response"""
+    started = time.perf_counter()
     try:
         # Use the same intent detection from health_api
         intent, confidence = detect_intent(message)
@@ -63,84 +131,222 @@ async def process_health_sms(message: str) -> str:
         else:
             response = get_response_for_intent(intent)
 
-        # Truncate for SMS (160 character limit consideration)
-        if len(response) > 1500:  # Leave room for multiple SMS parts
-            response = response[:1497] + "..."
-
-        # Add SMS-specific footer
-        response += "\n\nText STOP to unsubscribe. Emergency? Call 911/108"
+        # Markdown/emoji-free, GSM-7 where possible and within the segment budget; the footer is always kept
+        response = render_sms(response, footer=SMS_FOOTER)
 
+        # Buffered in memory and written to the database in batches
+        conversation_log.record("sms", message, intent=intent, confidence=confidence,
+                                source="fallback" if intent == 'unknown' else "patterns",
+                                latency=time.perf_counter() - started, session_id=sender, user_id=user_id)
         return response
 
     except Exception as e:
         logger.error(f"Error processing health SMS: {e}")
+        conversation_log.record("sms", message, source="fallback", latency=time.perf_counter() - started,
+                                session_id=sender, user_id=user_id)
         return "Health Assistant: Service temporarily unavailable. For emergencies, call 911 (US) or 108 (India)."
 
 @router.post("/send-sms")
 async def send_sms(sms_data: SMSMessage) -> SMSResponse:
     """
     Send SMS message via Twilio
+
+    The body is sent exactly as written and the response reports its segment
+    count; a body needing more than SMS_MAX_SEGMENTS segments is rejected.
     """
+    _check_segments(sms_data.message)
+    # Callers always get the normal lane; the high lane is only for emergency alerts
+    return await _send_sms(sms_data, Priority.NORMAL)
+
+def _check_segments(message: str) -> int:
+    """Segment count of an operator-written body; 400 if it is over the segment budget"""
+    info = segment_info(message)
+    if settings.sms_max_segments and info.segments > settings.sms_max_segments:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Message needs {info.segments} {info.encoding} segments; at most {settings.sms_max_segments} are allowed"
+        )
+    return info.segments
+
+async def _send_sms(sms_data: SMSMessage, priority: Priority) -> SMSResponse:
+    """Queue an SMS on a dispatcher lane and wait for it to be sent; the body is sent as given"""
     try:
         if not settings.twilio_account_sid or not settings.twilio_auth_token:
             raise HTTPException(status_code=500, detail="Twilio credentials not configured")
 
-        # Initialize Twilio client
-        client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
-
-        # Send SMS
-        message = client.messages.create(
-            body=sms_data.message,
-            from_=settings.twilio_phone_number,
-            to=sms_data.to
-        )
-
-        logger.info(f"SMS sent successfully to {sms_data.to}, SID: {message.sid}")
+        # Queued on the dispatcher's priority lane and sent by its workers
+        sid = await sms_dispatcher.send(sms_data.to, sms_data.message, priority=priority)
 
         return SMSResponse(
             success=True,
             message="SMS sent successfully",
-            sid=message.sid
+            sid=sid,
+            segments=segment_info(sms_data.message).segments
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error sending SMS: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to send SMS: {str(e)}")
 
+@router.post("/send-bulk")
+async def send_bulk_sms(bulk: BulkSMSRequest):
+    """
+    Send one message to many recipients, streaming per-recipient results as NDJSON
+
+    Each line is {"index", "to", "status", "sid"|"error"} in completion order,
+    followed by a final {"summary": {...}} line with the message's segment count.
+    The message is sent exactly as written (rejected if over SMS_MAX_SEGMENTS
+    segments). Sends are paced to the account's messages-per-second limit by the
+    SMS dispatcher; repeated numbers are sent once.
+    """
+    if not sms_dispatcher.configured:
+        raise HTTPException(status_code=500, detail="Twilio credentials not configured")
+    if not bulk.recipients:
+        raise HTTPException(status_code=400, detail="No recipients")
+    if len(bulk.recipients) > settings.sms_bulk_max_recipients:
+        raise HTTPException(status_code=400, detail=f"At most {settings.sms_bulk_max_recipients} recipients per request")
+    if bulk.priority == Priority.HIGH:
+        # The high lane skips account pacing and has reserved workers; it is kept for emergency alerts
+        raise HTTPException(status_code=400, detail="Bulk sends can only use the low or normal priority lane")
+
+    message = bulk.message
+    segments = _check_segments(message)
+
+    async def results():
+        lines: asyncio.Queue = asyncio.Queue()
+        # Keep the dispatcher lane from overflowing on very large lists
+        in_flight = asyncio.Semaphore(max(1, settings.sms_send_queue_size // 2))
+        counts = {"sent": 0, "failed": 0, "duplicate": 0}
+        started = time.perf_counter()
+
+        def on_done(index: int, to: str, future: asyncio.Future):
+            in_flight.release()
+            if not future.cancelled() and future.exception() is None:
+                result = {"index": index, "to": to, "status": "sent", "sid": future.result()}
+            else:
+                error = "cancelled" if future.cancelled() else str(future.exception())
+                result = {"index": index, "to": to, "status": "failed", "error": error}
+            counts[result["status"]] += 1
+            lines.put_nowait(result)
+
+        async def produce():
+            seen = set()
+            for index, to in enumerate(bulk.recipients):
+                if to in seen:
+                    counts["duplicate"] += 1
+                    lines.put_nowait({"index": index, "to": to, "status": "duplicate"})
+                    continue
+                seen.add(to)
+                await in_flight.acquire()
+                future = sms_dispatcher.enqueue(to, message, priority=bulk.priority)
+                future.add_done_callback(lambda f, index=index, to=to: on_done(index, to, f))
+
+        producer = asyncio.create_task(produce())
+        try:
+            for _ in range(len(bulk.recipients)):
+                yield json.dumps(await lines.get()) + "\n"
+            await producer
+            elapsed = time.perf_counter() - started
+            summary = {
+                **counts,
+                "recipients": len(bulk.recipients),
+                "segments": segments,
+                "elapsed_seconds": round(elapsed, 3),
+                "messages_per_second": round(counts["sent"] / elapsed, 2) if elapsed > 0 else 0.0
+            }
+            yield json.dumps({"summary": summary}) + "\n"
+        finally:
+            # Client went away: stop queueing; messages already queued are still sent
+            producer.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @router.post("/send-health-alert")
-async def send_health_alert(phone_number: str, alert_type: str = "general"):
+async def send_health_alert(phone_number: str, alert_type: str = "general", language: str = "en"):
     """
     Send health alerts via SMS
+
+    Emergencies are sent immediately. Other alerts falling in the recipient's
+    quiet hours are held until they end and reported with status "held" and
+    scheduled_for; sent alerts have status "sent". Alerts to known users get an
+    Alert row, which records the outcome of a held send.
     """
     try:
-        # Get appropriate health alert based on type
-        if alert_type == "outbreak":
-            outbreak_data = await health_data_service.get_covid_data("all")
-            if outbreak_data["success"]:
-                message = f"Health Alert: COVID-19 Update - Active cases: {outbreak_data['data']['active']:,}. Stay safe, follow guidelines."
-            else:
-                message = "Health Alert: Stay updated on health guidelines. Wash hands, wear masks when needed."
-        elif alert_type == "vaccination":
-            message = "Health Reminder: Ensure you're up to date with vaccinations. COVID-19 boosters and annual flu shots recommended."
-        elif alert_type == "emergency":
-            message = "HEALTH EMERGENCY ALERT: If this is a medical emergency, call 911 (US) or 108 (India) immediately. Do not rely on SMS for emergency care."
-        else:
-            message = "Health Tip: Stay hydrated, eat balanced meals, exercise regularly, and get adequate sleep for optimal health."
+        # Rendered from the template registry; outbreak alerts fall back to general guidance without COVID data
+        template = alert_type if alert_type in ("outbreak", "vaccination", "emergency") else "general"
+        message = (await template_registry.render_batch(template, [{"language": language}], channel="sms"))[0]
+
+        # Emergencies go out at once on the high-priority lane
+        if alert_type == "emergency":
+            sms_response = await _send_sms(SMSMessage(to=phone_number, message=render_sms(message)), Priority.HIGH)
+            return {
+                "alert_sent": True,
+                "status": "sent",
+                "alert_type": alert_type,
+                "recipient": phone_number,
+                "sms_response": sms_response
+            }
 
-        # Send the SMS
-        sms_response = await send_sms(SMSMessage(to=phone_number, message=message))
+        # Routine alerts wait out the recipient's quiet hours
+        if not sms_dispatcher.configured:
+            raise HTTPException(status_code=500, detail="Twilio credentials not configured")
+        text = render_sms(message)
+        profile = await user_cache.get(phone_number)
+        alert_id = await asyncio.to_thread(_create_alert, profile.id, alert_type, text) if profile else None
+        key = f"alert:{uuid.uuid4().hex}"
+        delivery = delivery_scheduler.deliver("sms", phone_number, text, alert_id=alert_id,
+                                              timezone=profile.timezone if profile else None, key=key)
+        release_at = delivery_scheduler.due_time(key)
+        if release_at is not None:
+            # Nobody awaits a held send, so its outcome is logged (and recorded on the alert) when it happens
+            delivery.add_done_callback(lambda done: _held_alert_done(phone_number, alert_id, done))
+            return {
+                "alert_sent": False,
+                "status": "held",
+                "alert_type": alert_type,
+                "recipient": phone_number,
+                "alert_id": alert_id,
+                "scheduled_for": datetime.fromtimestamp(release_at, timezone.utc).isoformat()
+            }
 
+        sid = await delivery
         return {
             "alert_sent": True,
+            "status": "sent",
             "alert_type": alert_type,
             "recipient": phone_number,
-            "sms_response": sms_response
+            "alert_id": alert_id,
+            "sms_response": SMSResponse(success=True, message="SMS sent successfully", sid=sid,
+                                        segments=segment_info(text).segments)
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error sending health alert: {e}")
         raise HTTPException(status_code=500, detail="Failed to send health alert")
 
+def _create_alert(user_id: int, alert_type: str, message: str) -> int:
+    """Pending Alert row for a routine alert to a known user (runs in a thread)"""
+    db = SessionLocal()
+    try:
+        return crud.create_alerts(db, [{"user_id": user_id, "type": alert_type, "message": message}])[0]
+    finally:
+        db.close()
+
+def _held_alert_done(phone_number: str, alert_id: Optional[int], delivery: asyncio.Future):
+    if delivery.cancelled():
+        # Cancelled when this worker stops; the delivery is restored from the checkpoint and sent after the restart
+        logger.info(f"Held health alert to {phone_number} is pending a restart")
+    elif delivery.exception() is not None:
+        logger.error(f"Held health alert to {phone_number} failed: {delivery.exception()}")
+        if alert_id is not None:
+            delivery_status_buffer.record_alert(alert_id, "failed")
+    else:
+        logger.info(f"Held health alert sent to {phone_number}, SID: {delivery.result()}")
+
 @router.get("/status")
 async def sms_status():
     """
@@ -158,18 +364,15 @@ async def sms_status():
             ]) else "not_configured"
         }
 
-        # Test Twilio connection if configured
+        # Connection state comes from the background prober, not a live call per request
         if config_status["status"] == "configured":
-            try:
-                client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
-                # Test API access (this will raise exception if credentials are invalid)
-                account = client.api.accounts(settings.twilio_account_sid).fetch()
-                config_status["twilio_connection"] = "active"
-                config_status["account_status"] = account.status
-            except Exception as e:
-                logger.error(f"Twilio connection test failed: {e}")
-                config_status["twilio_connection"] = "failed"
-                config_status["error"] = str(e)
+            gateway = gateway_prober.status("twilio")
+            config_status["twilio_connection"] = {"up": "active", "down": "failed"}.get(gateway["state"], "unknown")
+            if gateway["last_check"]:
+                config_status["account_status"] = gateway["last_check"]["details"].get("account_status")
+                if gateway["last_check"]["error"]:
+                    config_status["error"] = gateway["last_check"]["error"]
+            config_status["gateway"] = gateway
 
         return {
             "status": "active" if config_status["status"] == "configured" else "needs_configuration",
@@ -182,19 +385,12 @@ async def sms_status():
         raise HTTPException(status_code=500, detail="Error checking SMS status")
 
 @router.get("/health-alerts-templates")
-async def get_health_alert_templates():
+async def get_health_alert_templates(language: str = "en"):
     """
     Get SMS templates for health alerts
     """
     try:
-        templates = {
-            "outbreak_alert": "🚨 Health Alert: {disease} outbreak reported in {location}. Cases: {cases}. Follow safety guidelines.",
-            "vaccination_reminder": "💉 Vaccination Reminder: {vaccine} due. Schedule appointment at your healthcare provider.",
-            "weather_health": "🌡️ Weather Health Advisory: {condition}. Take precautions: {advice}",
-            "emergency_info": "🚨 Emergency: For immediate help call 911 (US) or 108 (India). This is an automated message.",
-            "health_tip": "💡 Health Tip: {tip}. Stay healthy!",
-            "medication_reminder": "💊 Medication Reminder: Time for {medication}. Take as prescribed."
-        }
+        templates = template_registry.sources(language, channel="sms")
 
         return {
             "templates": templates,
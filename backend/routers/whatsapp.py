@@ -1,13 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
+import hashlib
+import hmac
 import logging
 import json
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from ..services.health_data_service import health_data_service
 from ..services.india_health_service import india_health_service
+from ..services import background
+from ..services.worker_pool import Priority, WorkerPool
+from ..services.dedupe import webhook_deduplicator
+from ..services.whatsapp_dispatcher import whatsapp_dispatcher
+from ..services.gateway_status import gateway_prober
+from ..services.delivery_status import delivery_status_buffer
+from ..services.user_cache import WHATSAPP_OPT_OUT_KEYWORDS, opt_keyword, user_cache
+from ..services.conversation_log import conversation_log
 from ..config import settings
-from ..routers.health_api import detect_intent, get_response_for_intent
-import httpx
+from ..routers.health_api import detect_intent, get_response_for_intent, message_priority
 
 logger = logging.getLogger(__name__)
 
@@ -26,35 +36,124 @@ class WhatsAppResponse(BaseModel):
 async def whatsapp_webhook(request: Request):
     """
     Handle incoming WhatsApp messages via webhook (Meta WhatsApp Business API)
-    """
-    try:
-        data = await request.json()
-
-        # Validate webhook signature if configured
-        if settings.whatsapp_token:
-            # In production, validate the webhook signature here
-            pass
-
-        # Extract message data from Meta WhatsApp webhook format
-        if "messages" in data.get("entry", [{}])[0].get("changes", [{}])[0].get("value", {}):
-            messages = data["entry"][0]["changes"][0]["value"]["messages"]
-
-            for message in messages:
-                from_number = message["from"]
-                message_body = message.get("text", {}).get("body", "")
-                message_id = message["id"]
 
-                # Process the health-related message
-                response_text = await process_health_message(message_body)
-
-                # Send response back via WhatsApp
-                await send_whatsapp_message(from_number, response_text)
-
-        return {"status": "success"}
+    Messages are validated and queued for the background workers, so Meta gets
+    its 200 right away instead of waiting on intent detection and the Graph API.
+    """
+    # Only Meta may report messages and rewrite alert statuses; it signs the raw body with the app secret
+    body = await request.body()
+    if not settings.whatsapp_app_secret:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    expected = "sha256=" + hmac.new(settings.whatsapp_app_secret.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, request.headers.get("X-Hub-Signature-256", "")):
+        logger.warning("Rejected WhatsApp webhook with an invalid signature")
+        raise HTTPException(status_code=403, detail="Forbidden")
 
+    try:
+        data = json.loads(body)
     except Exception as e:
-        logger.error(f"Error processing WhatsApp webhook: {e}")
-        raise HTTPException(status_code=500, detail="Error processing WhatsApp message")
+        logger.error(f"Invalid WhatsApp webhook payload: {e}")
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Unexpected WhatsApp webhook payload")
+
+    # Meta may batch several entries, changes and messages into one delivery
+    inbound_messages, status_updates = parse_webhook_payload(data)
+
+    for status in status_updates:
+        process_status_update(status)
+
+    dropped = 0
+    for message in inbound_messages:
+        # Drop Meta redeliveries before any processing
+        if await webhook_deduplicator.is_duplicate("whatsapp", message["message_id"]):
+            logger.info(f"Skipping redelivered WhatsApp message {message['message_id']}")
+            continue
+        # Keyed by sender: one sender's messages are answered in order, different senders concurrently.
+        # Emergencies go to the high-priority lane, which has reserved workers.
+        message["priority"] = message_priority(message["message_body"])
+        if not inbound_pool.submit(message, key=message["from_number"], priority=message["priority"]):
+            await webhook_deduplicator.forget("whatsapp", message["message_id"])
+            dropped += 1
+
+    if dropped:
+        # Ask Meta to redeliver later rather than silently losing messages
+        raise HTTPException(status_code=503, detail="WhatsApp processing queue is full")
+
+    return {"status": "success"}
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """Text of an inbound message: typed text, a quick-reply button or an interactive reply"""
+    if "text" in message:
+        return message["text"].get("body", "")
+    if "button" in message:
+        return message["button"].get("text", "")
+    interactive = message.get("interactive", {})
+    reply = interactive.get("button_reply") or interactive.get("list_reply") or {}
+    return reply.get("title", "")
+
+def parse_webhook_payload(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Walk every entry, change and message of a Meta webhook delivery
+
+    Returns:
+        (inbound messages, status callbacks), each in delivery order
+    """
+    messages = []
+    statuses = []
+    for entry in data.get("entry", []) or []:
+        for change in entry.get("changes", []) or []:
+            value = change.get("value", {}) or {}
+            for message in value.get("messages", []) or []:
+                if "from" not in message or "id" not in message:
+                    continue
+                messages.append({
+                    "from_number": message["from"],
+                    "message_body": _message_text(message),
+                    "message_id": message["id"],
+                    "timestamp": message.get("timestamp")
+                })
+            for status in value.get("statuses", []) or []:
+                if "id" in status and "status" in status:
+                    statuses.append(status)
+    return messages, statuses
+
+def process_status_update(status: Dict[str, Any]):
+    """Handle a delivery status callback (sent, delivered, read, failed) for an outbound message"""
+    logger.debug(f"WhatsApp message {status['id']} to {status.get('recipient_id')} is {status['status']}")
+    # Buffered and written to alerts in batches, coalesced per message
+    delivery_status_buffer.record_callback("whatsapp", status["id"], status["status"])
+
+OPTED_OUT_REPLY = "You have been unsubscribed from health alerts. Reply START to subscribe again."
+OPTED_IN_REPLY = "You are subscribed to health alerts again. Reply STOP to unsubscribe."
+
+async def handle_inbound_message(item: Dict[str, Any]):
+    """Worker-side processing of one inbound WhatsApp message"""
+    opt_in = opt_keyword(item["message_body"], WHATSAPP_OPT_OUT_KEYWORDS)
+    if opt_in is not None:
+        # Written straight to the database, so a failed profile lookup cannot lose the request
+        await user_cache.set_opt_in(item["from_number"], opt_in)
+        await send_whatsapp_message(item["from_number"], OPTED_IN_REPLY if opt_in else OPTED_OUT_REPLY)
+        return
+
+    # Sender's profile, almost always from the in-memory cache
+    user = await user_cache.get(item["from_number"])
+
+    # Process the health-related message
+    response_text = await process_health_message(item["message_body"], sender=item["from_number"],
+                                                 user_id=user.id if user else None)
+
+    # Send response back via WhatsApp, in the same lane the message arrived in
+    await send_whatsapp_message(item["from_number"], response_text, priority=item.get("priority", Priority.NORMAL))
+
+inbound_pool = WorkerPool(
+    "whatsapp_inbound",
+    handle_inbound_message,
+    concurrency=settings.whatsapp_worker_concurrency,
+    max_queue=settings.whatsapp_queue_size,
+    reserved_high=settings.whatsapp_reserved_emergency_workers
+)
+background.register("whatsapp inbound workers", start=inbound_pool.start, stop=inbound_pool.stop)
 
 @router.get("/webhook")
 async def whatsapp_webhook_verification(request: Request):
@@ -75,8 +174,9 @@ async def whatsapp_webhook_verification(request: Request):
         logger.error(f"Error verifying WhatsApp webhook: {e}")
         raise HTTPException(status_code=500, detail="Verification failed")
 
-async def process_health_message(message: str) -> str:
+async def process_health_message(message: str, sender: Optional[str] = None, user_id: Optional[int] = None) -> str:
     """Process health-related message and return appropriate response"""
+    started = time.perf_counter()
     try:
         # Use the same intent detection from health_api
         intent, confidence = detect_intent(message)
@@ -90,41 +190,22 @@ async def process_health_message(message: str) -> str:
         # Add WhatsApp-specific formatting
         response += "\n\n📱 Reply to continue our conversation or type 'emergency' for urgent help."
 
+        # Buffered in memory and written to the database in batches
+        conversation_log.record("whatsapp", message, intent=intent, confidence=confidence,
+                                source="fallback" if intent == 'unknown' else "patterns",
+                                latency=time.perf_counter() - started, session_id=sender, user_id=user_id)
         return response
 
     except Exception as e:
         logger.error(f"Error processing health message: {e}")
+        conversation_log.record("whatsapp", message, source="fallback", latency=time.perf_counter() - started,
+                                session_id=sender, user_id=user_id)
         return "I'm having trouble processing your message right now. For urgent health matters, please contact emergency services."
 
-async def send_whatsapp_message(to_number: str, message: str) -> bool:
-    """Send message via WhatsApp Business API"""
+async def send_whatsapp_message(to_number: str, message: str, priority: Priority = Priority.NORMAL) -> bool:
+    """Send message via WhatsApp Business API (paced and retried by the outbound dispatcher)"""
     try:
-        if not settings.whatsapp_phone_number_id or not settings.whatsapp_token:
-            logger.warning("WhatsApp credentials not configured")
-            return False
-
-        url = f"https://graph.facebook.com/v17.0/{settings.whatsapp_phone_number_id}/messages"
-        headers = {
-            "Authorization": f"Bearer {settings.whatsapp_token}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "messaging_product": "whatsapp",
-            "to": to_number,
-            "text": {"body": message}
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=headers, json=payload)
-
-        if response.status_code == 200:
-            logger.info(f"WhatsApp message sent successfully to {to_number}")
-            return True
-        else:
-            logger.error(f"Failed to send WhatsApp message: {response.status_code} - {response.text}")
-            return False
-
+        return await whatsapp_dispatcher.send(to_number, message, priority=priority)
     except Exception as e:
         logger.error(f"Error sending WhatsApp message: {e}")
         return False
@@ -161,6 +242,12 @@ async def whatsapp_status():
             "status": "configured" if (settings.whatsapp_token and settings.whatsapp_phone_number_id) else "not_configured"
         }
 
+        # Graph API reachability from the background prober (cached, with its age)
+        if config_status["status"] == "configured":
+            gateway = gateway_prober.status("whatsapp")
+            config_status["graph_api_connection"] = {"up": "active", "down": "failed"}.get(gateway["state"], "unknown")
+            config_status["gateway"] = gateway
+
         return {
             "status": "active",
             "configuration": config_status,
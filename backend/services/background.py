@@ -0,0 +1,48 @@
+"""
+Registry of background services started and stopped with the application
+
+Modules register their own start/stop hooks at import time; app.py runs them
+from its startup and shutdown events, stopping in reverse start order.
+"""
+
+import inspect
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_services: List[Tuple[str, Optional[Callable[[], Any]], Optional[Callable[[], Any]]]] = []
+
+
+def register(name: str, start: Optional[Callable[[], Any]] = None, stop: Optional[Callable[[], Any]] = None):
+    """Register start/stop hooks (plain or async callables) for a background service"""
+    _services.append((name, start, stop))
+
+
+async def _call(hook: Callable[[], Any]):
+    result = hook()
+    if inspect.isawaitable(result):
+        await result
+
+
+async def start_all():
+    """Run every registered start hook in registration order"""
+    for name, start, _ in _services:
+        if start is None:
+            continue
+        try:
+            await _call(start)
+            logger.info(f"Started background service: {name}")
+        except Exception as e:
+            logger.error(f"Failed to start background service {name}: {e}")
+
+
+async def stop_all():
+    """Run every registered stop hook, most recently registered first"""
+    for name, _, stop in reversed(_services):
+        if stop is None:
+            continue
+        try:
+            await _call(stop)
+        except Exception as e:
+            logger.error(f"Error stopping background service {name}: {e}")
@@ -0,0 +1,242 @@
+"""
+Broadcast campaigns to segments of opted-in users
+
+A campaign walks the users table in keyset pages (id > last seen id), so
+memory stays bounded by one page plus the in-flight sends no matter how many
+users match. Each page's messages are rendered once per segment (language,
+location), either from the request's message or from a registered template
+whose shared data is resolved once per campaign, then recorded as pending Alert rows in one bulk insert, and handed to
+the delivery scheduler: recipients outside their quiet hours go straight to the
+WhatsApp or SMS dispatcher on the low-priority lane, the rest are held until
+their quiet hours end. Held deliveries count towards the in-flight limit, so a
+campaign started late in the evening pauses once that many are held. Progress
+is kept in memory and exposed through the campaigns API.
+"""
+
+import asyncio
+import logging
+import time
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..db import crud
+from ..db.database import SessionLocal
+from . import background
+from .delivery_scheduler import delivery_scheduler
+from .geo import parse_area
+from .sms_dispatcher import sms_dispatcher
+from .sms_renderer import render_sms
+from .templates import template_registry
+from .whatsapp_dispatcher import whatsapp_dispatcher
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("whatsapp", "sms")
+
+
+class _SegmentFields(dict):
+    """Template fields; unknown placeholders are left as they are"""
+
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class Campaign:
+    """One broadcast and its progress counters"""
+
+    def __init__(self, campaign_id: int, name: str, channel: str, message: Optional[str] = None,
+                 messages: Optional[Dict[str, str]] = None, languages: Optional[List[str]] = None,
+                 locations: Optional[List[str]] = None, areas: Optional[List[str]] = None, alert_type: str = "campaign",
+                 template: Optional[str] = None, fields: Optional[Dict[str, Any]] = None):
+        self.id = campaign_id
+        self.name = name
+        self.channel = channel
+        self.message = message
+        self.messages = messages or {}  # language -> template, overriding message
+        self.template = template  # registered template name, used instead of message
+        self.fields = fields or {}  # extra template fields shared by every recipient
+        self.shared: Dict[str, Any] = {}
+        self.languages = languages or []
+        self.locations = locations or []
+        # e.g. "state:Karnataka" or "district:Maharashtra/Mumbai", resolved to canonical (level, area) pairs
+        self.areas = [parse_area(area) for area in areas or []]
+        self.alert_type = alert_type
+        self.status = "pending"  # pending, running, completed, cancelled, failed
+        self.error: Optional[str] = None
+        self.matched = 0
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_user_id = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self.task: Optional[asyncio.Task] = None
+        self._rendered: Dict[Tuple[str, str], str] = {}
+
+    def render(self, language: Optional[str], location: Optional[str]) -> str:
+        """Message for a segment, formatted once and reused for every user in it"""
+        segment = (language or "", location or "")
+        text = self._rendered.get(segment)
+        if text is None:
+            fields = _SegmentFields(self.fields, language=segment[0], location=segment[1], campaign=self.name)
+            if self.template:
+                text = template_registry.render(self.template, segment[0] or None, self.channel, fields, self.shared)
+            else:
+                text = self.messages.get(segment[0], self.message).format_map(fields)
+                if self.channel == "sms":
+                    text = render_sms(text)
+            self._rendered[segment] = text
+        return text
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        done = self.sent + self.failed
+        return {
+            "id": self.id,
+            "name": self.name,
+            "channel": self.channel,
+            "template": self.template,
+            "status": self.status,
+            "error": self.error,
+            "filters": {"languages": self.languages, "locations": self.locations,
+                        "areas": [f"{level}:{area}" for level, area in self.areas]},
+            "segments": len(self._rendered),
+            "matched": self.matched,
+            "queued": self.queued,
+            "in_flight": self.queued - done,
+            "sent": self.sent,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "messages_per_second": round(done / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+class CampaignEngine:
+    """Runs campaigns as background tasks with a bounded number of sends in flight"""
+
+    def __init__(self):
+        self.campaigns: Dict[int, Campaign] = {}
+        self._ids = count(1)
+
+    def create(self, name: str, channel: str, message: Optional[str] = None, **kwargs) -> Campaign:
+        """Start a campaign in the background and return it immediately"""
+        template = kwargs.get("template")
+        if not message and not template:
+            raise ValueError("Either message or template is required")
+        if template and template not in template_registry.names():
+            raise ValueError(f"Unknown template '{template}'")
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel '{channel}', expected one of {', '.join(CHANNELS)}")
+        dispatcher = whatsapp_dispatcher if channel == "whatsapp" else sms_dispatcher
+        if not dispatcher.configured:
+            raise ValueError(f"{channel} credentials not configured")
+
+        campaign = Campaign(next(self._ids), name, channel, message, **kwargs)
+        self.campaigns[campaign.id] = campaign
+        campaign.task = asyncio.create_task(self._run(campaign))
+        return campaign
+
+    def get(self, campaign_id: int) -> Optional[Campaign]:
+        return self.campaigns.get(campaign_id)
+
+    def list(self) -> List[Campaign]:
+        return list(self.campaigns.values())
+
+    def cancel(self, campaign_id: int) -> Optional[Campaign]:
+        """Stop queueing further pages; sends already queued still complete"""
+        campaign = self.campaigns.get(campaign_id)
+        if campaign is not None:
+            campaign.cancel_requested = True
+        return campaign
+
+    @staticmethod
+    def _next_page(campaign: Campaign) -> List[Tuple[str, Optional[str], str, int]]:
+        """Read the next page of recipients and record their pending alerts (runs in a thread)"""
+        db = SessionLocal()
+        try:
+            users = crud.get_opted_in_users(
+                db,
+                after_id=campaign.last_user_id,
+                limit=settings.campaign_page_size,
+                languages=campaign.languages,
+                locations=campaign.locations,
+                areas=campaign.areas
+            )
+            if not users:
+                return []
+            texts = [campaign.render(user.language, user.location) for user in users]
+            alert_ids = crud.create_alerts(db, [
+                {"user_id": user.id, "type": campaign.alert_type, "message": text}
+                for user, text in zip(users, texts)
+            ])
+            campaign.last_user_id = users[-1].id
+            return [
+                (user.phone, user.timezone, text, alert_id) for user, text, alert_id in zip(users, texts, alert_ids)
+            ]
+        finally:
+            db.close()
+
+    def _enqueue(self, campaign: Campaign, phone: str, user_timezone: Optional[str], text: str,
+                 alert_id: int) -> asyncio.Future:
+        return delivery_scheduler.deliver(campaign.channel, phone, text, alert_id=alert_id, timezone=user_timezone,
+                                          key=f"campaign:{campaign.id}:{alert_id}")
+
+    async def _run(self, campaign: Campaign):
+        campaign.status = "running"
+        campaign.started_at = time.time()
+        if campaign.template:
+            # e.g. COVID numbers: fetched once for the whole campaign, not per recipient
+            campaign.shared = await template_registry.resolve_shared(campaign.template)
+        in_flight = asyncio.Semaphore(settings.campaign_max_in_flight)
+        pending = set()
+
+        def on_done(future: asyncio.Future):
+            in_flight.release()
+            pending.discard(future)
+            # WhatsApp futures resolve to a bool, SMS futures to a SID or an exception
+            if future.cancelled() or future.exception() is not None or not future.result():
+                campaign.failed += 1
+            else:
+                campaign.sent += 1
+
+        try:
+            while not campaign.cancel_requested:
+                page = await asyncio.to_thread(self._next_page, campaign)
+                if not page:
+                    break
+                campaign.matched += len(page)
+                for phone, user_timezone, text, alert_id in page:
+                    await in_flight.acquire()
+                    future = self._enqueue(campaign, phone, user_timezone, text, alert_id)
+                    pending.add(future)
+                    campaign.queued += 1
+                    future.add_done_callback(on_done)
+            if pending:
+                await asyncio.wait(list(pending))
+            campaign.status = "cancelled" if campaign.cancel_requested else "completed"
+            logger.info(f"Campaign {campaign.id} {campaign.status}: {campaign.sent} sent, {campaign.failed} failed")
+        except asyncio.CancelledError:
+            campaign.status = "cancelled"
+            raise
+        except Exception as e:
+            campaign.status = "failed"
+            campaign.error = str(e)
+            logger.error(f"Campaign {campaign.id} failed: {e}")
+        finally:
+            campaign.finished_at = time.time()
+
+    async def stop(self):
+        """Cancel running campaigns on shutdown"""
+        tasks = [c.task for c in self.campaigns.values() if c.task and not c.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Global instance
+campaign_engine = CampaignEngine()
+background.register("campaigns", stop=campaign_engine.stop)
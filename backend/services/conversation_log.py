@@ -0,0 +1,140 @@
+"""
+Write-behind log of handled conversations (web chat, WhatsApp, SMS)
+
+Each handled message (its text, detected intent, confidence, whether Rasa,
+the pattern matcher or the fallback answered, and how long the answer took)
+is appended to a bounded in-memory ring buffer; recording never touches the
+database. A background flusher writes the buffer to conversation_events in
+bulk inserts once flush_size events are waiting or every flush_interval
+seconds, and drains it on shutdown. If the database is unavailable, events
+stay buffered for the next flush; when the buffer is full the oldest events
+are dropped (and counted) rather than blocking message handling.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from prometheus_client import Counter, Histogram
+
+from ..config import settings
+from ..db import crud
+from ..db.database import SessionLocal
+from . import background
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_EVENTS = Counter(
+    "health_chatbot_conversation_events_total",
+    "Conversation events by outcome (written to the database, or dropped from a full buffer)",
+    ["outcome"],
+)
+FLUSH_SECONDS = Histogram(
+    "health_chatbot_conversation_log_flush_seconds",
+    "Time spent writing one batch of conversation events",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+
+class ConversationLog:
+    """Ring buffer of conversation events, flushed to the database in batches"""
+
+    def __init__(self, capacity: int = 50_000, flush_size: int = 500, flush_interval: float = 5.0,
+                 enabled: bool = True):
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._buffer: Deque[dict] = deque(maxlen=capacity)
+        self._flush_requested = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def record(self, channel: str, message: str, intent: Optional[str] = None, confidence: Optional[float] = None,
+               source: Optional[str] = None, latency: Optional[float] = None, session_id: Optional[str] = None,
+               user_id: Optional[int] = None):
+        """Buffer one handled message; latency is in seconds"""
+        if not self.enabled:
+            return
+        if len(self._buffer) == self.capacity:
+            CONVERSATION_EVENTS.labels(outcome="dropped").inc()
+        self._buffer.append({
+            "channel": channel,
+            "session_id": session_id,
+            "user_id": user_id,
+            "message": message,
+            "intent": intent,
+            "confidence": confidence,
+            "source": source,
+            "latency_ms": round(latency * 1000, 3) if latency is not None else None,
+            "created_at": datetime.now(timezone.utc)
+        })
+        if len(self._buffer) >= self.flush_size:
+            self._flush_requested.set()
+
+    @staticmethod
+    def _write(rows: List[dict]):
+        db = SessionLocal()
+        try:
+            crud.create_conversation_events(db, rows)
+        finally:
+            db.close()
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; returns the number of events written"""
+        if not self._buffer:
+            return 0
+        rows = [self._buffer.popleft() for _ in range(len(self._buffer))]
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} conversation events: {e}")
+            # Put back as many as fit in front of the events recorded meanwhile, newest first
+            kept = rows[len(rows) - min(len(rows), self.capacity - len(self._buffer)):]
+            self._buffer.extendleft(reversed(kept))
+            CONVERSATION_EVENTS.labels(outcome="dropped").inc(len(rows) - len(kept))
+            return 0
+        FLUSH_SECONDS.observe(time.perf_counter() - started)
+        CONVERSATION_EVENTS.labels(outcome="written").inc(len(rows))
+        return len(rows)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flusher (idempotent)"""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still buffered"""
+        self._stopping = True
+        self._flush_requested.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+# Global instance
+conversation_log = ConversationLog(
+    capacity=settings.conversation_log_capacity,
+    flush_size=settings.conversation_log_flush_size,
+    flush_interval=settings.conversation_log_flush_interval,
+    enabled=settings.conversation_log_enabled
+)
+background.register("conversation log", start=conversation_log.start, stop=conversation_log.stop)
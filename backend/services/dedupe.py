@@ -0,0 +1,256 @@
+"""
+Idempotent webhook processing: bounded store of already-seen provider message IDs
+
+Meta redelivers WhatsApp webhooks and Twilio retries SMS webhooks, so every
+inbound message ID is checked here before any processing. Recent IDs are kept
+in an exact, time-bucketed window; IDs that age out of it are folded into
+rotating Bloom filters that cover the provider's long redelivery horizon in
+a fixed amount of memory. With the "db" backend the processed_messages table
+is the source of truth, so several workers share one view.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+from . import background
+from ..db import async_crud, models
+from ..db.database import AsyncSessionLocal, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+DUPLICATES = Counter(
+    "health_chatbot_webhook_duplicates_total",
+    "Inbound webhook messages dropped as redeliveries",
+    ["provider"],
+)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class MessageDeduplicator:
+    """Exact recent window plus rotating Bloom filters, O(1) per check"""
+
+    def __init__(self, exact_window: float = 600, bucket_seconds: float = 60,
+                 bloom_window: float = 7 * 86400, bloom_generations: int = 7,
+                 bloom_capacity: int = 1_000_000, bloom_error_rate: float = 1e-4):
+        self.bucket_seconds = bucket_seconds
+        self.exact_buckets = max(1, int(exact_window // bucket_seconds))
+        self.generation_seconds = bloom_window / bloom_generations
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        # key -> bucket number, with buckets expiring oldest-first
+        self._recent: Dict[str, int] = {}
+        self._buckets: Deque[Tuple[int, List[str]]] = deque()
+        # (generation number, filter), newest last
+        self._blooms: Deque[Tuple[int, BloomFilter]] = deque(maxlen=bloom_generations)
+
+    def _expire(self, now: float):
+        """Move IDs older than the exact window into the current Bloom generation"""
+        oldest_kept = int(now // self.bucket_seconds) - self.exact_buckets + 1
+        while self._buckets and self._buckets[0][0] < oldest_kept:
+            bucket, keys = self._buckets.popleft()
+            for key in keys:
+                if self._recent.get(key) == bucket:
+                    del self._recent[key]
+                    self._current_bloom(now).add(key)
+
+    def _current_bloom(self, now: float) -> BloomFilter:
+        generation = int(now // self.generation_seconds)
+        if not self._blooms or self._blooms[-1][0] != generation:
+            self._blooms.append((generation, BloomFilter(self.bloom_capacity, self.bloom_error_rate)))
+        return self._blooms[-1][1]
+
+    def seen_recently(self, key: str, now: float = None) -> bool:
+        """Exact check against the recent window only"""
+        self._expire(time.time() if now is None else now)
+        return key in self._recent
+
+    def contains(self, key: str, now: float = None) -> bool:
+        """Exact recent window, then the Bloom generations (false-positive rate bloom_error_rate)"""
+        if self.seen_recently(key, now):
+            return True
+        return any(key in bloom for _, bloom in self._blooms)
+
+    def add(self, key: str, now: float = None):
+        now = time.time() if now is None else now
+        bucket = int(now // self.bucket_seconds)
+        if not self._buckets or self._buckets[-1][0] != bucket:
+            self._buckets.append((bucket, []))
+        self._buckets[-1][1].append(key)
+        self._recent[key] = bucket
+
+    def discard(self, key: str):
+        """Forget a key that is still in the exact window (it will not reach the Bloom filters)"""
+        self._recent.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+
+class WebhookDeduplicator:
+    """Checks provider message IDs against the in-memory window and, optionally, the database"""
+
+    def __init__(self, backend: str = "memory"):
+        self.backend = backend
+        self._prune_task = None
+        self.memory = MessageDeduplicator(
+            exact_window=settings.dedupe_exact_window,
+            bloom_window=settings.dedupe_bloom_window,
+            bloom_capacity=settings.dedupe_bloom_capacity
+        )
+
+    async def is_duplicate(self, provider: str, message_id: str) -> bool:
+        """Return True if this message was seen before; otherwise record it as seen"""
+        key = f"{provider}:{message_id}"
+        if self.memory.seen_recently(key):
+            DUPLICATES.labels(provider=provider).inc()
+            return True
+
+        if self.backend == "db":
+            # Reserve in memory first so concurrent redeliveries in this worker short-circuit
+            self.memory.add(key)
+            if not await self._claim(provider, message_id):
+                DUPLICATES.labels(provider=provider).inc()
+                return True
+            return False
+
+        if self.memory.contains(key):
+            DUPLICATES.labels(provider=provider).inc()
+            return True
+        self.memory.add(key)
+        return False
+
+    async def forget(self, provider: str, message_id: str):
+        """Undo is_duplicate() for a message we could not accept, so its redelivery is processed"""
+        self.memory.discard(f"{provider}:{message_id}")
+        if self.backend == "db":
+            if AsyncSessionLocal is None:
+                await asyncio.to_thread(self._release_in_db, provider, message_id)
+                return
+            async with AsyncSessionLocal() as db:
+                try:
+                    await async_crud.release_processed_message(db, provider, message_id)
+                except Exception as e:
+                    await db.rollback()
+                    logger.error(f"Error releasing {provider} message {message_id} from dedupe store: {e}")
+
+    async def _claim(self, provider: str, message_id: str) -> bool:
+        """Insert the claim row; False if another delivery already claimed it"""
+        if AsyncSessionLocal is None:
+            # No async driver installed: keep the blocking session off the event loop
+            return await asyncio.to_thread(self._claim_in_db, provider, message_id)
+        async with AsyncSessionLocal() as db:
+            try:
+                await async_crud.claim_processed_message(db, provider, message_id)
+                return True
+            except IntegrityError:
+                await db.rollback()
+                return False
+            except Exception as e:
+                # Fail open: a duplicate reply is better than a lost health question
+                await db.rollback()
+                logger.error(f"Dedupe store unavailable, processing {provider} message {message_id}: {e}")
+                return True
+
+    @staticmethod
+    def _claim_in_db(provider: str, message_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            db.add(models.ProcessedMessage(provider=provider, message_id=message_id))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        except Exception as e:
+            # Fail open: a duplicate reply is better than a lost health question
+            db.rollback()
+            logger.error(f"Dedupe store unavailable, processing {provider} message {message_id}: {e}")
+            return True
+        finally:
+            db.close()
+
+    async def prune_loop(self):
+        """Delete database claims older than the redelivery horizon, once an hour"""
+        while True:
+            try:
+                removed = await asyncio.to_thread(self._prune_db)
+                if removed:
+                    logger.info(f"Pruned {removed} processed webhook message IDs")
+            except Exception as e:
+                logger.error(f"Error pruning processed webhook message IDs: {e}")
+            await asyncio.sleep(3600)
+
+    def start(self):
+        if self.backend == "db" and self._prune_task is None:
+            self._prune_task = asyncio.create_task(self.prune_loop())
+
+    async def stop(self):
+        if self._prune_task:
+            self._prune_task.cancel()
+            await asyncio.gather(self._prune_task, return_exceptions=True)
+            self._prune_task = None
+
+    @staticmethod
+    def _prune_db() -> int:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.dedupe_bloom_window)
+        db = SessionLocal()
+        try:
+            removed = db.query(models.ProcessedMessage).filter(models.ProcessedMessage.created_at < cutoff).delete()
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+    @staticmethod
+    def _release_in_db(provider: str, message_id: str):
+        db = SessionLocal()
+        try:
+            db.query(models.ProcessedMessage).filter(
+                models.ProcessedMessage.provider == provider,
+                models.ProcessedMessage.message_id == message_id
+            ).delete()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error releasing {provider} message {message_id} from dedupe store: {e}")
+        finally:
+            db.close()
+
+
+# Global instance
+webhook_deduplicator = WebhookDeduplicator(backend=settings.webhook_dedupe_backend)
+background.register("webhook dedupe store", start=webhook_deduplicator.start, stop=webhook_deduplicator.stop)
@@ -0,0 +1,436 @@
+"""
+Scheduled outbound deliveries: quiet hours, rate smoothing and restart checkpoints
+
+Deliveries wait in a hierarchical timing wheel (utils/timing_wheel.py), so
+millions can be pending with O(1) schedule and cancel. A delivery whose time
+falls inside the recipient's quiet hours (in their own timezone) is moved to
+the end of the quiet period, plus a per-delivery offset within a spread
+window so a morning's backlog does not all come due in the same second. Due
+deliveries are then released to the WhatsApp/SMS dispatchers at a steady
+per-channel rate. Campaigns and non-emergency alerts go through deliver(),
+which sends straight away outside quiet hours (the dispatchers pace those)
+and otherwise holds the delivery here.
+
+Each worker process checkpoints its pending deliveries to its own JSON-lines
+file in a shared directory, periodically and on shutdown, and holds an
+exclusive lock on it while running. On startup a worker takes over every
+checkpoint whose lock it can get (its own from before a restart, and those of
+workers that are gone), so each pending delivery is restored by exactly one
+process. The files hold phone numbers and message text: keep the directory
+on a private data volume, not in the source tree.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import IO, Deque, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+try:
+    import fcntl
+except ImportError:  # Windows: only this worker's own checkpoint is reloaded
+    fcntl = None
+
+from prometheus_client import Counter, Gauge
+
+from ..config import settings
+from ..utils.rate_limit import TokenBucket
+from ..utils.timing_wheel import TimingWheel
+from . import background
+from .sms_dispatcher import sms_dispatcher
+from .whatsapp_dispatcher import whatsapp_dispatcher
+from .worker_pool import Priority
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED = Gauge(
+    "health_chatbot_scheduled_deliveries",
+    "Deliveries waiting in the timing wheel or for a release slot",
+)
+RELEASED = Counter(
+    "health_chatbot_scheduled_deliveries_released_total",
+    "Scheduled deliveries handed to the dispatchers, by channel",
+    ["channel"],
+)
+DEFERRED = Counter(
+    "health_chatbot_scheduled_deliveries_deferred_total",
+    "Deliveries moved out of the recipient's quiet hours",
+)
+
+CHANNELS = ("whatsapp", "sms")
+
+# channel, recipient, text, alert id
+Delivery = Tuple[str, str, str, Optional[int]]
+
+
+@lru_cache(maxsize=1024)
+def _zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or settings.default_timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone {name!r}, using {settings.default_timezone}")
+        return ZoneInfo(settings.default_timezone)
+
+
+class DeliveryScheduler:
+    """Holds deliveries until their (quiet-hours-adjusted) time, then releases them at a steady rate"""
+
+    def __init__(self, quiet_start: int = 21, quiet_end: int = 8, spread: float = 3600.0,
+                 release_rate: float = 20.0, checkpoint_dir: Optional[str] = None,
+                 checkpoint_interval: float = 60.0, tick: float = 1.0, worker_id: Optional[str] = None):
+        self.quiet_start = quiet_start
+        self.quiet_end = quiet_end
+        self.spread = spread
+        self.checkpoint_dir = checkpoint_dir
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.checkpoint_path = os.path.join(checkpoint_dir, f"{worker_id}.jsonl") if checkpoint_dir else None
+        self.checkpoint_interval = checkpoint_interval
+        # Lock on our own checkpoint while running, and taken-over checkpoints to remove once saved
+        self._lock: Optional[IO] = None
+        self._taken_over: List[Tuple[str, IO]] = []
+        self.wheel = TimingWheel(time.time(), tick=tick)
+        self.buckets = {channel: TokenBucket(release_rate, burst=release_rate) for channel in CHANNELS}
+        # Due deliveries waiting for a release slot, per channel
+        self._due: Dict[str, Deque[Tuple[str, Delivery]]] = {channel: deque() for channel in CHANNELS}
+        self._has_due = {channel: asyncio.Event() for channel in CHANNELS}
+        # Futures of held deliveries made through deliver(), resolved with the dispatcher's outcome
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._stopping = asyncio.Event()
+        self._tasks = []
+
+    def __len__(self) -> int:
+        return len(self.wheel) + sum(len(due) for due in self._due.values())
+
+    def in_quiet_hours(self, local: datetime) -> bool:
+        if self.quiet_start == self.quiet_end:
+            return False
+        if self.quiet_start > self.quiet_end:
+            return local.hour >= self.quiet_start or local.hour < self.quiet_end
+        return self.quiet_start <= local.hour < self.quiet_end
+
+    def release_time(self, key: str, not_before: float, timezone: Optional[str] = None) -> float:
+        """Earliest time at or after not_before outside the recipient's quiet hours"""
+        local = datetime.fromtimestamp(not_before, _zone(timezone))
+        if not self.in_quiet_hours(local):
+            return not_before
+        end = local.replace(hour=self.quiet_end, minute=0, second=0, microsecond=0)
+        if end <= local:
+            end += timedelta(days=1)
+        DEFERRED.inc()
+        # Stable per-delivery offset, so a checkpointed delivery keeps its slot
+        offset = zlib.crc32(str(key).encode("utf-8")) % int(self.spread) if self.spread >= 1 else 0
+        return end.timestamp() + offset
+
+    def schedule(self, channel: str, to: str, text: str, alert_id: Optional[int] = None,
+                 not_before: Optional[float] = None, timezone: Optional[str] = None,
+                 key: Optional[str] = None) -> str:
+        """
+        Schedule a delivery (replacing any pending delivery with the same key)
+
+        Args:
+            channel: whatsapp or sms
+            to: Recipient in international format
+            text: Message body, already rendered for the channel
+            alert_id: Alert row the dispatcher records the outcome on
+            not_before: Unix time to send at (default: now), moved out of quiet hours
+            timezone: Recipient's IANA timezone (default: settings.default_timezone)
+            key: Cancellation key (default: a new unique key)
+
+        Returns:
+            The key, for cancel()
+        """
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel '{channel}', expected one of {', '.join(CHANNELS)}")
+        key = key if key is not None else uuid.uuid4().hex
+        due = self.release_time(key, not_before if not_before is not None else time.time(), timezone)
+        self.wheel.insert(key, due, (channel, to, text, alert_id))
+        SCHEDULED.set(len(self))
+        return key
+
+    def deliver(self, channel: str, to: str, text: str, alert_id: Optional[int] = None,
+                timezone: Optional[str] = None, key: Optional[str] = None) -> asyncio.Future:
+        """
+        Send now, or hold the delivery until the recipient's quiet hours end
+
+        Outside quiet hours the delivery goes straight to the dispatcher, which
+        paces it to the account limit. Otherwise it is scheduled as with
+        schedule(): checkpointed, then released at the channel's release rate.
+
+        Returns:
+            Future resolving like the dispatcher's (WhatsApp: bool, SMS: SID); cancelled if the
+            delivery is cancelled, or if this worker stops first (it is then restored from the
+            checkpoint and sent after the restart)
+        """
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel '{channel}', expected one of {', '.join(CHANNELS)}")
+        key = key if key is not None else uuid.uuid4().hex
+        now = time.time()
+        due = self.release_time(key, now, timezone)
+        if due <= now:
+            return self._dispatch((channel, to, text, alert_id))
+        self._drop_waiter(key)
+        self.wheel.insert(key, due, (channel, to, text, alert_id))
+        SCHEDULED.set(len(self))
+        waiter = self._waiters[key] = asyncio.get_running_loop().create_future()
+        return waiter
+
+    def due_time(self, key: str) -> Optional[float]:
+        """When a held delivery will be released (Unix time), or None if it is not held"""
+        return self.wheel.due(key)
+
+    async def send(self, channel: str, to: str, text: str, alert_id: Optional[int] = None) -> bool:
+        """
+        Send now, paced by the channel's release rate, and wait for the outcome
+
+        For callers that keep their own durable schedule (the reminder scheduler
+        stores deferrals on the reminder row) and only need the pacing.
+
+        Returns:
+            True once the dispatcher reports the message sent
+        """
+        if channel not in CHANNELS:
+            raise ValueError(f"Unknown channel '{channel}', expected one of {', '.join(CHANNELS)}")
+        await self.buckets[channel].acquire()
+        RELEASED.labels(channel=channel).inc()
+        # WhatsApp resolves to a bool, SMS to a SID (or raises)
+        return bool(await self._dispatch((channel, to, text, alert_id)))
+
+    def cancel(self, key: str) -> bool:
+        """Cancel a delivery still in the wheel; returns False if it was unknown or already due"""
+        cancelled = self.wheel.cancel(key) is not None
+        if cancelled:
+            self._drop_waiter(key)
+        SCHEDULED.set(len(self))
+        return cancelled
+
+    def _drop_waiter(self, key: str):
+        waiter = self._waiters.pop(key, None)
+        if waiter is not None:
+            waiter.cancel()
+
+    def _release_due(self):
+        for key, delivery in self.wheel.advance(time.time()):
+            self._due[delivery[0]].append((key, delivery))
+            self._has_due[delivery[0]].set()
+
+    def _dispatch(self, delivery: Delivery) -> asyncio.Future:
+        channel, to, text, alert_id = delivery
+        if channel == "whatsapp":
+            return whatsapp_dispatcher.enqueue(to, text, alert_id=alert_id, business_initiated=True,
+                                               priority=Priority.LOW)
+        return sms_dispatcher.enqueue(to, text, priority=Priority.LOW, alert_id=alert_id)
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future):
+        # The dispatchers record the outcome on the alert; only surface unexpected errors here
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Scheduled delivery failed: {future.exception()}")
+
+    @staticmethod
+    def _resolve(waiter: asyncio.Future, outcome: asyncio.Future):
+        if waiter.done():
+            return
+        if outcome.cancelled():
+            waiter.cancel()
+        elif outcome.exception() is not None:
+            waiter.set_exception(outcome.exception())
+        else:
+            waiter.set_result(outcome.result())
+
+    async def _tick_loop(self):
+        while not self._stopping.is_set():
+            self._release_due()
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.wheel.tick)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _release_loop(self, channel: str):
+        due = self._due[channel]
+        while not self._stopping.is_set():
+            if not due:
+                self._has_due[channel].clear()
+                await self._has_due[channel].wait()
+                continue
+            await self.buckets[channel].acquire()
+            if self._stopping.is_set() or not due:
+                continue
+            key, delivery = due.popleft()
+            outcome = self._dispatch(delivery)
+            waiter = self._waiters.pop(key, None)
+            if waiter is not None:
+                outcome.add_done_callback(lambda done, waiter=waiter: self._resolve(waiter, done))
+            else:
+                outcome.add_done_callback(self._log_failure)
+            RELEASED.labels(channel=channel).inc()
+            SCHEDULED.set(len(self))
+
+    async def _checkpoint_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.checkpoint_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping.is_set():
+                await self.checkpoint()
+
+    def _snapshot(self):
+        now = time.time()
+        rows = [(key, due, delivery) for key, due, delivery in self.wheel.items()]
+        # Deliveries already due but not yet released go out first after a restart
+        for due in self._due.values():
+            rows.extend((key, now, delivery) for key, delivery in due)
+        return rows
+
+    @staticmethod
+    def _write(path: str, rows):
+        tmp_path = f"{path}.tmp"
+        # Phone numbers and message text: readable by this user only
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+            for key, due, (channel, to, text, alert_id) in rows:
+                f.write(json.dumps({"key": key, "due": due, "channel": channel, "to": to,
+                                    "text": text, "alert_id": alert_id}, ensure_ascii=False))
+                f.write("\n")
+        os.replace(tmp_path, path)
+
+    async def checkpoint(self) -> int:
+        """Write every pending delivery to this worker's checkpoint file (atomically); returns the count"""
+        if not self.checkpoint_path:
+            return 0
+        rows = self._snapshot()
+        try:
+            await asyncio.to_thread(self._write, self.checkpoint_path, rows)
+        except Exception as e:
+            logger.error(f"Error writing delivery checkpoint {self.checkpoint_path}: {e}")
+            return 0
+        if self._taken_over:
+            # Their deliveries are saved in this worker's checkpoint now
+            await asyncio.to_thread(self._remove_taken_over)
+        return len(rows)
+
+    @staticmethod
+    def _try_lock(path: str) -> Optional[IO]:
+        """Exclusively lock a checkpoint without waiting; None while its worker is still running"""
+        handle = open(f"{path}.lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def _read(self, path: str) -> int:
+        loaded = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    self.wheel.insert(row["key"], row["due"], (row["channel"], row["to"], row["text"], row["alert_id"]))
+                    loaded += 1
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping bad delivery checkpoint line in {path}: {e}")
+        return loaded
+
+    def load(self) -> int:
+        """Lock this worker's checkpoint and re-schedule deliveries from every checkpoint no running worker holds
+
+        Past-due deliveries are released straight away.
+        """
+        if not self.checkpoint_dir:
+            return 0
+        os.makedirs(self.checkpoint_dir, mode=0o700, exist_ok=True)
+        if fcntl is None:
+            return self._read(self.checkpoint_path) if os.path.exists(self.checkpoint_path) else 0
+        self._lock = self._try_lock(self.checkpoint_path)
+        if self._lock is None:
+            logger.error(f"Delivery checkpoint {self.checkpoint_path} is locked by another process; not checkpointing")
+            self.checkpoint_path = None
+            return 0
+        loaded = 0
+        for name in sorted(os.listdir(self.checkpoint_dir)):
+            path = os.path.join(self.checkpoint_dir, name)
+            if not name.endswith(".jsonl"):
+                continue
+            if path == self.checkpoint_path:
+                loaded += self._read(path)
+                continue
+            lock = self._try_lock(path)
+            if lock is None:
+                continue
+            if not os.path.exists(path):
+                # Taken over and removed by another worker since the listing
+                with suppress(FileNotFoundError):
+                    os.remove(f"{path}.lock")
+                lock.close()
+                continue
+            loaded += self._read(path)
+            self._taken_over.append((path, lock))
+        SCHEDULED.set(len(self))
+        return loaded
+
+    def _remove_taken_over(self):
+        """Delete checkpoints taken over from other workers, once their deliveries are in ours"""
+        for path, lock in self._taken_over:
+            try:
+                os.remove(path)
+                os.remove(f"{path}.lock")
+            except OSError as e:
+                logger.warning(f"Error removing delivery checkpoint {path}: {e}")
+            lock.close()
+        self._taken_over = []
+
+    async def start(self):
+        """Reload checkpoints and start releasing deliveries (idempotent)"""
+        if self._tasks:
+            return
+        self._stopping.clear()
+        loaded = await asyncio.to_thread(self.load)
+        if loaded:
+            logger.info(f"Restored {loaded} scheduled deliveries from {self.checkpoint_dir}")
+        if self._taken_over:
+            await self.checkpoint()
+        self._tasks = [asyncio.create_task(self._tick_loop()), asyncio.create_task(self._checkpoint_loop())]
+        self._tasks += [asyncio.create_task(self._release_loop(channel)) for channel in CHANNELS]
+
+    async def stop(self):
+        """Stop releasing, checkpoint everything still pending and release the checkpoint lock"""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        for event in self._has_due.values():
+            event.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        saved = await self.checkpoint()
+        if saved:
+            logger.info(f"Checkpointed {saved} scheduled deliveries to {self.checkpoint_path}")
+        for key in list(self._waiters):
+            self._drop_waiter(key)
+        # Taken-over checkpoints that could not be saved into ours stay for the next worker
+        for _, lock in self._taken_over:
+            lock.close()
+        self._taken_over = []
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+
+# Global instance
+delivery_scheduler = DeliveryScheduler(
+    quiet_start=settings.delivery_quiet_hours_start,
+    quiet_end=settings.delivery_quiet_hours_end,
+    spread=settings.delivery_quiet_spread,
+    release_rate=settings.delivery_release_rate,
+    checkpoint_dir=settings.delivery_checkpoint_dir,
+    checkpoint_interval=settings.delivery_checkpoint_interval
+)
+background.register("delivery scheduler", start=delivery_scheduler.start, stop=delivery_scheduler.stop)
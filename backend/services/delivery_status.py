@@ -0,0 +1,194 @@
+"""
+Write-behind buffer for outbound message delivery status
+
+Dispatcher outcomes (keyed by alert ID) and provider status callbacks (keyed
+by WhatsApp wamid / Twilio MessageSid) are collected in memory and flushed to
+the alerts table in batches, on a size or time threshold. Several events for
+the same message in one window collapse to the most advanced status, and a
+callback never moves an alert back to an earlier status (e.g. a late "sent"
+after "delivered").
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import or_, update
+
+from ..config import settings
+from ..db import models
+from ..db.database import SessionLocal
+from . import background
+
+logger = logging.getLogger(__name__)
+
+STATUS_EVENTS = Counter(
+    "health_chatbot_delivery_status_events_total",
+    "Delivery status events received, by provider and normalised status",
+    ["provider", "status"],
+)
+FLUSH_ROWS = Histogram(
+    "health_chatbot_delivery_status_flush_rows",
+    "Coalesced status updates written per flush",
+    buckets=(1, 10, 50, 100, 500, 1000, 5000),
+)
+FLUSH_SECONDS = Histogram(
+    "health_chatbot_delivery_status_flush_seconds",
+    "Time spent writing one batch of status updates",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
+# Provider statuses mapped onto Alert.status
+PROVIDER_STATUS = {
+    "accepted": "pending",
+    "queued": "pending",
+    "scheduled": "pending",
+    "sending": "pending",
+    "sent": "sent",
+    "delivered": "delivered",
+    "read": "read",
+    "undelivered": "failed",
+    "failed": "failed",
+}
+STATUS_RANK = {"pending": 0, "sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+
+class DeliveryStatusBuffer:
+    """Coalesces status events in memory and writes them as batched UPDATEs"""
+
+    def __init__(self, flush_size: int = 500, flush_interval: float = 2.0):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # alert_id -> (status, provider_message_id) from the dispatchers
+        self._by_alert: Dict[int, Tuple[str, Optional[str]]] = {}
+        # provider_message_id -> status from provider callbacks
+        self._by_message: Dict[str, str] = {}
+        self._flush_requested = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._by_alert) + len(self._by_message)
+
+    @staticmethod
+    def _advance(current: Optional[str], status: str) -> str:
+        if current is None or STATUS_RANK[status] >= STATUS_RANK[current]:
+            return status
+        return current
+
+    def record_alert(self, alert_id: int, status: str, provider_message_id: Optional[str] = None):
+        """Outcome of a send for a known alert row (status: sent or failed)"""
+        current = self._by_alert.get(alert_id)
+        status = self._advance(current[0] if current else None, status)
+        self._by_alert[alert_id] = (status, provider_message_id or (current[1] if current else None))
+        self._maybe_flush()
+
+    def record_callback(self, provider: str, provider_message_id: str, provider_status: str):
+        """A provider status callback; unknown statuses (e.g. "receiving") are ignored"""
+        status = PROVIDER_STATUS.get((provider_status or "").lower())
+        if status is None or not provider_message_id:
+            return
+        STATUS_EVENTS.labels(provider=provider, status=status).inc()
+        self._by_message[provider_message_id] = self._advance(self._by_message.get(provider_message_id), status)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if len(self) >= self.flush_size:
+            self._flush_requested.set()
+
+    async def flush(self) -> int:
+        """Write everything buffered so far; returns the number of coalesced updates"""
+        if not len(self):
+            return 0
+        by_alert, self._by_alert = self._by_alert, {}
+        by_message, self._by_message = self._by_message, {}
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write, by_alert, by_message)
+        except Exception as e:
+            logger.error(f"Error writing {len(by_alert) + len(by_message)} delivery status updates: {e}")
+            # Put them back (newer events win) so the next flush retries
+            for alert_id, (status, message_id) in by_alert.items():
+                if alert_id not in self._by_alert:
+                    self._by_alert[alert_id] = (status, message_id)
+            for message_id, status in by_message.items():
+                self._by_message[message_id] = self._advance(self._by_message.get(message_id), status)
+            return 0
+        FLUSH_SECONDS.observe(time.perf_counter() - started)
+        FLUSH_ROWS.observe(len(by_alert) + len(by_message))
+        return len(by_alert) + len(by_message)
+
+    @staticmethod
+    def _write(by_alert: Dict[int, Tuple[str, Optional[str]]], by_message: Dict[str, str]):
+        db = SessionLocal()
+        try:
+            if by_alert:
+                # Bulk UPDATE by primary key (one executemany); sends are recorded before their callbacks
+                rows = []
+                for alert_id, (status, message_id) in by_alert.items():
+                    row = {"id": alert_id, "status": status}
+                    if message_id:
+                        row["provider_message_id"] = message_id
+                    rows.append(row)
+                with_ids = [row for row in rows if "provider_message_id" in row]
+                without_ids = [row for row in rows if "provider_message_id" not in row]
+                for group in (with_ids, without_ids):
+                    if group:
+                        db.execute(update(models.Alert), group)
+
+            # One UPDATE per target status, only moving alerts forward
+            grouped: Dict[str, List[str]] = defaultdict(list)
+            for message_id, status in by_message.items():
+                grouped[status].append(message_id)
+            for status, message_ids in grouped.items():
+                earlier = [s for s, rank in STATUS_RANK.items() if rank < STATUS_RANK[status]]
+                for start in range(0, len(message_ids), 500):
+                    db.execute(
+                        update(models.Alert)
+                        .where(models.Alert.provider_message_id.in_(message_ids[start:start + 500]))
+                        .where(or_(models.Alert.status.is_(None), models.Alert.status.in_(earlier)))
+                        .values(status=status)
+                        .execution_options(synchronize_session=False)
+                    )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flusher (idempotent)"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still buffered"""
+        # Wake the flusher for a final flush rather than cancelling it mid-write
+        self._stopping = True
+        self._flush_requested.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+
+
+# Global instance
+delivery_status_buffer = DeliveryStatusBuffer(
+    flush_size=settings.delivery_status_flush_size,
+    flush_interval=settings.delivery_status_flush_interval
+)
+background.register("delivery status buffer", start=delivery_status_buffer.start, stop=delivery_status_buffer.stop)
@@ -0,0 +1,142 @@
+"""
+Background health probes for the messaging gateways (Twilio, WhatsApp Graph API)
+
+Each gateway is checked at a fixed interval and the outcome, latency and any
+error are kept in a short history, so status endpoints and monitoring read
+cached results instead of calling the providers on every request.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from prometheus_client import Gauge
+
+from ..config import settings
+from . import background
+from .twilio_client import twilio_client
+from .upstream import upstream_get
+from .whatsapp_dispatcher import whatsapp_dispatcher
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_UP = Gauge(
+    "health_chatbot_gateway_up",
+    "Whether the last probe of a messaging gateway succeeded",
+    ["gateway"],
+)
+GATEWAY_PROBE_SECONDS = Gauge(
+    "health_chatbot_gateway_probe_seconds",
+    "Latency of the last probe of a messaging gateway",
+    ["gateway"],
+)
+
+# A probe returns provider details worth showing (e.g. account status) or raises
+Probe = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+async def probe_twilio() -> Dict[str, Any]:
+    account = await twilio_client.fetch_account()
+    return {"account_status": account.get("status")}
+
+
+async def probe_whatsapp() -> Dict[str, Any]:
+    response = await upstream_get(
+        whatsapp_dispatcher._get_client(),
+        "whatsapp-graph/{phone-number-id}",
+        f"/{settings.whatsapp_phone_number_id}",
+        params={"fields": "display_phone_number,quality_rating"}
+    )
+    data = response.json()
+    if response.status_code != 200:
+        raise RuntimeError(data.get("error", {}).get("message") or f"HTTP {response.status_code}")
+    return {
+        "display_phone_number": data.get("display_phone_number"),
+        "quality_rating": data.get("quality_rating")
+    }
+
+
+class GatewayProber:
+    """Runs registered probes on an interval and keeps their recent results"""
+
+    def __init__(self, interval: float = 60.0, history_size: int = 60):
+        self.interval = interval
+        self.history_size = history_size
+        self._probes: Dict[str, Probe] = {}
+        self._configured: Dict[str, Callable[[], bool]] = {}
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Probe, configured: Callable[[], bool]):
+        self._probes[name] = probe
+        self._configured[name] = configured
+        self._history[name] = deque(maxlen=self.history_size)
+
+    async def check(self, name: str) -> Dict[str, Any]:
+        """Probe one gateway now and record the result"""
+        started = time.perf_counter()
+        result = {"checked_at": time.time(), "ok": False, "latency_ms": None, "error": None, "details": {}}
+        try:
+            result["details"] = await self._probes[name]()
+            result["ok"] = True
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+            logger.warning(f"Gateway probe {name} failed: {result['error']}")
+        elapsed = time.perf_counter() - started
+        result["latency_ms"] = round(elapsed * 1000, 1)
+        self._history[name].append(result)
+        GATEWAY_UP.labels(gateway=name).set(1 if result["ok"] else 0)
+        GATEWAY_PROBE_SECONDS.labels(gateway=name).set(elapsed)
+        return result
+
+    async def check_all(self):
+        names = [name for name in self._probes if self._configured[name]()]
+        await asyncio.gather(*(self.check(name) for name in names))
+
+    def status(self, name: str, history: int = 10) -> Dict[str, Any]:
+        """Cached state of one gateway: last result with its age, success rate and recent history"""
+        results = self._history[name]
+        if not results:
+            return {"state": "unknown", "last_check": None, "age_seconds": None, "history": []}
+        last = results[-1]
+        latencies = sorted(r["latency_ms"] for r in results if r["ok"])
+        return {
+            "state": "up" if last["ok"] else "down",
+            "last_check": last,
+            "age_seconds": round(time.time() - last["checked_at"], 1),
+            "success_rate": round(sum(r["ok"] for r in results) / len(results), 3),
+            "median_latency_ms": latencies[len(latencies) // 2] if latencies else None,
+            "history": list(results)[-history:]
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"Error probing messaging gateways: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start background probing (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background probing"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+gateway_prober = GatewayProber(interval=settings.gateway_probe_interval)
+gateway_prober.register("twilio", probe_twilio, lambda: twilio_client.configured)
+gateway_prober.register("whatsapp", probe_whatsapp, lambda: whatsapp_dispatcher.configured)
+background.register("gateway prober", start=gateway_prober.start, stop=gateway_prober.stop)
@@ -0,0 +1,257 @@
+"""
+Location normalisation: free-text user locations -> canonical pincode, district and state
+
+Users type their location however they like ("Bandra, Mumbai 400050",
+"bangalore", "Kozhikode, Kerala"). At write time crud resolves it against the
+outbreak area hierarchy (services/outbreak.py) and stores the canonical names
+in indexed users.pincode/district/state columns. Those indexes are the
+area -> user inverted index: "every opted-in user in Karnataka" is an index
+range scan, not a string match over every location. A pincode that is not in
+the area data still gets its state from its leading digits (postal circles).
+Users whose location could not be resolved are retried whenever the area data
+is reloaded.
+"""
+
+import asyncio
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..db import models
+from ..db.database import SessionLocal
+from . import background
+from .outbreak import LEVELS, OutbreakIndex, area_key, outbreak_areas
+
+logger = logging.getLogger(__name__)
+
+# Common and former names -> district or state name as used in the area data
+ALIASES = {
+    "bangalore": "bengaluru urban",
+    "bengaluru": "bengaluru urban",
+    "bombay": "mumbai",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+    "kochi": "ernakulam",
+    "cochin": "ernakulam",
+    "calicut": "kozhikode",
+    "trivandrum": "thiruvananthapuram",
+    "mysore": "mysuru",
+    "poona": "pune",
+    "gurgaon": "gurugram",
+    "orissa": "odisha",
+}
+
+# Pincode leading digits -> state; the longest matching prefix wins
+PINCODE_STATES = {
+    "11": "Delhi",
+    "12": "Haryana", "13": "Haryana",
+    "14": "Punjab", "15": "Punjab", "160": "Chandigarh",
+    "17": "Himachal Pradesh",
+    "18": "Jammu and Kashmir", "19": "Jammu and Kashmir", "194": "Ladakh",
+    **{str(prefix): "Uttar Pradesh" for prefix in range(20, 29)},
+    "246": "Uttarakhand", "248": "Uttarakhand", "249": "Uttarakhand", "263": "Uttarakhand",
+    **{str(prefix): "Rajasthan" for prefix in range(30, 35)},
+    **{str(prefix): "Gujarat" for prefix in range(36, 40)},
+    **{str(prefix): "Maharashtra" for prefix in range(40, 45)},
+    "403": "Goa",
+    **{str(prefix): "Madhya Pradesh" for prefix in range(45, 49)},
+    "49": "Chhattisgarh",
+    "50": "Telangana",
+    "51": "Andhra Pradesh", "52": "Andhra Pradesh", "53": "Andhra Pradesh",
+    **{str(prefix): "Karnataka" for prefix in range(56, 60)},
+    **{str(prefix): "Tamil Nadu" for prefix in range(60, 65)},
+    "67": "Kerala", "68": "Kerala", "69": "Kerala",
+    **{str(prefix): "West Bengal" for prefix in range(70, 75)},
+    "737": "Sikkim", "744": "Andaman and Nicobar Islands",
+    "75": "Odisha", "76": "Odisha", "77": "Odisha",
+    "78": "Assam",
+    "790": "Arunachal Pradesh", "791": "Arunachal Pradesh", "792": "Arunachal Pradesh",
+    "793": "Meghalaya", "794": "Meghalaya", "795": "Manipur", "796": "Mizoram",
+    "797": "Nagaland", "798": "Nagaland", "799": "Tripura",
+    **{str(prefix): "Bihar" for prefix in range(80, 86)},
+    **{str(prefix): "Jharkhand" for prefix in (814, 815, 816, 825, 826, 827, 828, 829, 831, 832, 833, 834, 835)},
+}
+
+PINCODE_RE = re.compile(r"(?<!\d)([1-9]\d{2})\s?(\d{3})(?!\d)")
+MAX_NAME_WORDS = 3
+
+# Stored in users.state when a location could not be resolved, so only reloads of the area data retry it
+UNRESOLVED = ""
+
+
+class LocationResolver:
+    """District and state name lookups derived from one OutbreakIndex"""
+
+    def __init__(self, index: OutbreakIndex):
+        self.index = index
+        self.districts: Dict[str, List[Tuple[str, str]]] = {}
+        for district, state in index.districts.values():
+            self.districts.setdefault(area_key(district), []).append((district, state))
+        self.states = dict(index.states)
+
+    def pincode_state(self, pincode: str) -> Optional[str]:
+        """State of a pincode from its leading digits, named as in the area data where it has one"""
+        for length in (3, 2):
+            state = PINCODE_STATES.get(pincode[:length])
+            if state:
+                return self.states.get(area_key(state), state)
+        return None
+
+    def _names(self, words: List[str]):
+        """Every 1..MAX_NAME_WORDS word phrase, longest first, with aliases applied"""
+        for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size])
+                yield ALIASES.get(phrase, phrase)
+
+    def resolve(self, location: Optional[str]) -> Dict[str, Optional[str]]:
+        """Canonical pincode, district and state for a free-text location (None where unknown)"""
+        result = {"pincode": None, "district": None, "state": None}
+        if not location:
+            return result
+        match = PINCODE_RE.search(location)
+        if match:
+            result["pincode"] = match.group(1) + match.group(2)
+            located = self.index.locate(result["pincode"])
+            if located:
+                result.update(district=located["district"], state=located["state"])
+                return result
+
+        words = re.findall(r"[a-z]+", location.lower())
+        states = [self.states[name] for name in self._names(words) if name in self.states]
+        for name in self._names(words):
+            candidates = self.districts.get(name)
+            if not candidates:
+                continue
+            if len(candidates) > 1 and states:
+                candidates = [candidate for candidate in candidates if candidate[1] == states[0]] or candidates
+            if len(candidates) == 1:
+                result["district"], result["state"] = candidates[0]
+                return result
+        if states:
+            result["state"] = states[0]
+        elif result["pincode"]:
+            result["state"] = self.pincode_state(result["pincode"])
+        return result
+
+
+_resolver: Optional[LocationResolver] = None
+
+
+def resolver() -> LocationResolver:
+    """Resolver for the current outbreak index, rebuilt after the index is reloaded"""
+    global _resolver
+    index = outbreak_areas.current()
+    if _resolver is None or _resolver.index is not index:
+        _resolver = LocationResolver(index)
+    return _resolver
+
+
+def normalise_location(location: Optional[str]) -> Dict[str, Optional[str]]:
+    """Canonical pincode, district and state for a free-text location"""
+    return resolver().resolve(location)
+
+
+def location_fields(location: Optional[str]) -> Dict[str, Optional[str]]:
+    """users.pincode/district/state values for a location, as stored at write time"""
+    fields = normalise_location(location)
+    if location and fields["state"] is None:
+        fields["state"] = UNRESOLVED
+    return fields
+
+
+def parse_area(spec: str) -> Tuple[str, str]:
+    """Parse an area filter such as "state:Karnataka", "district:Maharashtra/Mumbai" or "prefix:7000"
+
+    A bare six-digit value is a pincode. Names are mapped to their canonical form.
+    """
+    level, sep, area = spec.partition(":")
+    if not sep:
+        level, area = ("pincode", spec) if spec.strip().isdigit() else ("state", spec)
+    level, area = level.strip().lower(), area.strip()
+    if level not in LEVELS or not area or (level in ("pincode", "prefix") and not area.isdigit()):
+        raise ValueError(f"Invalid area '{spec}', expected one of {', '.join(LEVELS)} followed by ':' and a name")
+    index = resolver().index
+    if level == "state":
+        area = index.states.get(area_key(area), area)
+    elif level == "district":
+        state, _, district = area.partition("/")
+        area = "/".join(index.districts.get(f"{area_key(state)}/{area_key(district)}", (district.strip(), state.strip()))[::-1])
+    return level, area
+
+
+def area_condition(level: str, area: str):
+    """SQL condition matching users in an area, served by the ix_users_opted_in_* indexes"""
+    user = models.User
+    if level == "state":
+        return user.state == area
+    if level == "district":
+        state, _, district = area.partition("/")
+        return (user.state == state) & (user.district == district)
+    if level == "pincode":
+        return user.pincode == area
+    if level == "prefix":
+        # A range rather than LIKE, so the pincode index is used whatever the collation; the bounds
+        # are digit strings because some collations ignore punctuation
+        if set(area) == {"9"}:
+            return user.pincode >= area
+        return (user.pincode >= area) & (user.pincode < str(int(area) + 1).zfill(len(area)))
+    raise ValueError(f"Unknown area level '{level}'")
+
+
+class UserAreaBackfill:
+    """Resolves the areas of users stored before the area columns existed, and of unresolved
+    users, at startup and again whenever the outbreak area data is reloaded"""
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+        self._stopping = threading.Event()
+        self._again = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _run(self) -> int:
+        from ..db import crud  # crud imports this module
+
+        db = SessionLocal()
+        try:
+            return crud.backfill_user_areas(db, self.batch_size, stop=self._stopping.is_set, unresolved=True)
+        finally:
+            db.close()
+
+    async def _backfill(self):
+        self._again = True
+        while self._again and not self._stopping.is_set():
+            self._again = False
+            try:
+                updated = await asyncio.to_thread(self._run)
+                if updated:
+                    logger.info(f"Resolved locations of {updated} users")
+            except Exception as e:
+                logger.error(f"Error resolving user locations: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._backfill())
+
+    def rerun(self, index: Optional[OutbreakIndex] = None):
+        """Backfill again with the current area data, after the pass in progress if there is one"""
+        if self._task is not None and not self._task.done():
+            self._again = True
+        elif not self._stopping.is_set():
+            self._task = asyncio.create_task(self._backfill())
+
+    async def stop(self):
+        """Stop after the batch in progress; the rest is picked up on the next startup"""
+        self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+
+# Global instance
+user_area_backfill = UserAreaBackfill(batch_size=settings.db_bulk_chunk_size)
+background.register("user area backfill", start=user_area_backfill.start, stop=user_area_backfill.stop)
+outbreak_areas.add_listener(user_area_backfill.rerun)
@@ -2,6 +2,8 @@ import httpx
 import logging
 from typing import Dict, List, Optional, Any
 from ..config import settings
+from . import background
+from .upstream import upstream_get
 import asyncio
 from datetime import datetime
 
@@ -11,32 +13,41 @@ class HealthDataService:
     """Service to fetch real health data from various APIs"""
 
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=10.0)
+        self.client = httpx.AsyncClient(timeout=settings.upstream_max_timeout)
 
     async def get_covid_data(self, country: str = "all") -> Dict[str, Any]:
-        """Get COVID-19 data from Disease.sh API (free, no key required)"""
+        """Get COVID-19 data from Disease.sh API (free, no key required)
+
+        Not hedged: covid19india.org has no critical-case count, so its answer
+        would not match this shape.
+        """
         try:
-            url = f"{settings.disease_sh_base_url}/{country}"
-            response = await self.client.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "success": True,
-                    "data": {
-                        "country": data.get("country", "Global"),
-                        "cases": data.get("cases", 0),
-                        "deaths": data.get("deaths", 0),
-                        "recovered": data.get("recovered", 0),
-                        "active": data.get("active", 0),
-                        "critical": data.get("critical", 0),
-                        "updated": data.get("updated", 0)
-                    }
-                }
+            data = await self._disease_sh_covid_data(country)
+            if data:
+                return {"success": True, "data": data}
         except Exception as e:
             logger.error(f"Error fetching COVID data: {e}")
 
         return {"success": False, "error": "Unable to fetch COVID data"}
 
+    async def _disease_sh_covid_data(self, country: str) -> Optional[Dict[str, Any]]:
+        """COVID-19 figures for a country (or "all") from Disease.sh"""
+        url = f"{settings.disease_sh_base_url}/{country}"
+        response = await upstream_get(self.client, "disease.sh/{country}", url)
+        if response.status_code != 200:
+            return None
+
+        data = response.json()
+        return {
+            "country": data.get("country", "Global"),
+            "cases": data.get("cases", 0),
+            "deaths": data.get("deaths", 0),
+            "recovered": data.get("recovered", 0),
+            "active": data.get("active", 0),
+            "critical": data.get("critical", 0),
+            "updated": data.get("updated", 0)
+        }
+
     async def get_vaccination_schedule(self, age_group: str = "adult") -> Dict[str, Any]:
         """Get vaccination schedule information"""
         try:
@@ -45,7 +56,7 @@ class HealthDataService:
                 headers = {"X-API-Key": settings.cdc_api_key}
                 # CDC API endpoint for vaccination schedules
                 url = f"{settings.cdc_data_base_url}/vaccination-schedules"
-                response = await self.client.get(url, headers=headers)
+                response = await upstream_get(self.client, "cdc/vaccination-schedules", url, headers=headers)
                 if response.status_code == 200:
                     return {"success": True, "data": response.json()}
         except Exception as e:
@@ -97,7 +108,7 @@ class HealthDataService:
                 "search": f"openfda.generic_name:{drug_name.lower()}"
             }
 
-            response = await self.client.get(url, params=params)
+            response = await upstream_get(self.client, "openfda/drug/label.json", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 results = data.get("results", [])
@@ -119,8 +130,8 @@ class HealthDataService:
 
         return {"success": False, "error": f"Unable to find information for {drug_name}"}
 
-    async def get_health_news(self, query: str = "health") -> Dict[str, Any]:
-        """Get health news from NewsAPI"""
+    async def get_health_news(self, query: str = "health", since: Optional[str] = None, page_size: int = 5) -> Dict[str, Any]:
+        """Get health news from NewsAPI, optionally only articles published after `since` (ISO 8601)"""
         try:
             if not settings.news_api_key:
                 return self._get_fallback_health_news()
@@ -131,14 +142,16 @@ class HealthDataService:
                 "apiKey": settings.news_api_key,
                 "language": "en",
                 "sortBy": "publishedAt",
-                "pageSize": 5
+                "pageSize": page_size
             }
+            if since:
+                params["from"] = since
 
-            response = await self.client.get(url, params=params)
+            response = await upstream_get(self.client, "newsapi/v2/everything", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 articles = []
-                for article in data.get("articles", [])[:5]:
+                for article in data.get("articles", [])[:page_size]:
                     articles.append({
                         "title": article.get("title", "No title"),
                         "description": article.get("description", "No description"),
@@ -170,7 +183,7 @@ class HealthDataService:
                 "source": "CDC"
             }
         ]
-        return {"success": True, "data": fallback_news}
+        return {"success": True, "data": fallback_news, "fallback": True}
 
     async def get_weather_health_advisory(self, location: str) -> Dict[str, Any]:
         """Get weather-based health advisory"""
@@ -185,7 +198,7 @@ class HealthDataService:
                 "units": "metric"
             }
 
-            response = await self.client.get(url, params=params)
+            response = await upstream_get(self.client, "openweather/data/2.5/weather", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 temp = data["main"]["temp"]
@@ -242,3 +255,4 @@ class HealthDataService:
 
 # Global instance
 health_data_service = HealthDataService()
+background.register("health data service", stop=health_data_service.close)
@@ -2,84 +2,143 @@ import httpx
 import logging
 from typing import Dict, List, Optional, Any
 from ..config import settings
+from . import background
+from .upstream import hedged_fetch, upstream_get
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 logger = logging.getLogger(__name__)
 
+# covid19india.org reports times in Indian Standard Time
+IST = timezone(timedelta(hours=5, minutes=30))
+
 class IndiaHealthDataService:
     """Service to fetch real Indian health data from government and local APIs"""
 
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=10.0)
-        self.covid19_india_base = "https://api.covid19india.org"
+        self.client = httpx.AsyncClient(timeout=settings.upstream_max_timeout)
+        self.covid19_india_base = settings.covid19india_base_url
         self.data_gov_in_base = "https://api.data.gov.in"
 
     async def get_covid_india_data(self, state: str = "India") -> Dict[str, Any]:
-        """Get COVID-19 data for India from covid19india.org API (free)"""
+        """Get COVID-19 data for India, hedged across covid19india.org and Disease.sh"""
         try:
-            url = f"{self.covid19_india_base}/data.json"
-            response = await self.client.get(url)
-
-            if response.status_code == 200:
-                data = response.json()
-
-                # Extract state-specific or national data
-                if state.lower() == "india":
-                    # National data
-                    statewise = data.get("statewise", [])
-                    india_data = next((item for item in statewise if item.get("state") == "Total"), {})
-                else:
-                    # State-specific data
-                    statewise = data.get("statewise", [])
-                    india_data = next((item for item in statewise if item.get("state").lower() == state.lower()), {})
-
-                if india_data:
-                    return {
-                        "success": True,
-                        "data": {
-                            "state": india_data.get("state", "India"),
-                            "confirmed": int(india_data.get("confirmed", 0)),
-                            "active": int(india_data.get("active", 0)),
-                            "recovered": int(india_data.get("recovered", 0)),
-                            "deaths": int(india_data.get("deaths", 0)),
-                            "delta_confirmed": int(india_data.get("deltaconfirmed", 0)),
-                            "delta_deaths": int(india_data.get("deltadeaths", 0)),
-                            "last_updated": india_data.get("lastupdatedtime", ""),
-                            "state_notes": india_data.get("statenotes", "")
-                        }
-                    }
+            data = await hedged_fetch([
+                ("covid19india/data.json", lambda: self._covid19india_state_data(state)),
+                ("disease.sh/countries/india" if state.lower() == "india" else "disease.sh/gov/India",
+                 lambda: self._disease_sh_state_data(state)),
+            ])
+            if data:
+                return {"success": True, "data": data}
         except Exception as e:
             logger.error(f"Error fetching COVID India data: {e}")
 
         return {"success": False, "error": "Unable to fetch COVID-19 data for India"}
 
-    async def get_vaccination_india_data(self) -> Dict[str, Any]:
-        """Get vaccination data for India"""
-        try:
-            url = f"{self.covid19_india_base}/v4/min/data.min.json"
-            response = await self.client.get(url)
+    async def _covid19india_state_data(self, state: str) -> Optional[Dict[str, Any]]:
+        """National or state COVID-19 figures from covid19india.org"""
+        url = f"{self.covid19_india_base}/data.json"
+        response = await upstream_get(self.client, "covid19india/data.json", url)
+        if response.status_code != 200:
+            return None
+
+        statewise = response.json().get("statewise", [])
+        if state.lower() == "india":
+            # National data
+            india_data = next((item for item in statewise if item.get("state") == "Total"), {})
+        else:
+            # State-specific data
+            india_data = next((item for item in statewise if (item.get("state") or "").lower() == state.lower()), {})
 
-            if response.status_code == 200:
-                data = response.json()
-                india_data = data.get("TT", {})  # TT = Total (India)
+        if not india_data:
+            return None
+        return {
+            "state": india_data.get("state", "India"),
+            "confirmed": int(india_data.get("confirmed", 0)),
+            "active": int(india_data.get("active", 0)),
+            "recovered": int(india_data.get("recovered", 0)),
+            "deaths": int(india_data.get("deaths", 0)),
+            "delta_confirmed": int(india_data.get("deltaconfirmed", 0)),
+            "delta_deaths": int(india_data.get("deltadeaths", 0)),
+            "last_updated": india_data.get("lastupdatedtime", ""),
+            "state_notes": india_data.get("statenotes", "")
+        }
 
-                return {
-                    "success": True,
-                    "data": {
-                        "total_vaccinated": india_data.get("total", {}).get("vaccinated", 0),
-                        "total_doses": india_data.get("total", {}).get("vaccinated1", 0) + india_data.get("total", {}).get("vaccinated2", 0),
-                        "first_dose": india_data.get("total", {}).get("vaccinated1", 0),
-                        "second_dose": india_data.get("total", {}).get("vaccinated2", 0),
-                        "precaution_dose": india_data.get("total", {}).get("precautiondose", 0),
-                        "today_vaccinated": india_data.get("delta", {}).get("vaccinated", 0)
-                    }
-                }
+    async def _disease_sh_state_data(self, state: str) -> Optional[Dict[str, Any]]:
+        """National or state COVID-19 figures from Disease.sh, in the covid19india shape"""
+        if state.lower() == "india":
+            url = f"{settings.disease_sh_base_url}/countries/india"
+            response = await upstream_get(self.client, "disease.sh/countries/india", url)
+            if response.status_code != 200:
+                return None
+            item = response.json()
+            name, updated = "India", item.get("updated")
+        else:
+            url = f"{settings.disease_sh_base_url}/gov/India"
+            response = await upstream_get(self.client, "disease.sh/gov/India", url)
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            item = next((s for s in data.get("states", []) if (s.get("state") or "").lower() == state.lower()), None)
+            if not item:
+                return None
+            # State rows carry no timestamp of their own
+            name, updated = item.get("state", state), data.get("updated")
+
+        return {
+            "state": name,
+            "confirmed": int(item.get("cases", 0) or 0),
+            "active": int(item.get("active", 0) or 0),
+            "recovered": int(item.get("recovered", 0) or 0),
+            "deaths": int(item.get("deaths", 0) or 0),
+            "delta_confirmed": int(item.get("todayCases", 0) or 0),
+            "delta_deaths": int(item.get("todayDeaths", 0) or 0),
+            "last_updated": self._covid19india_time(updated),
+            "state_notes": ""  # covid19india.org notes are editorial; Disease.sh has none
+        }
+
+    @staticmethod
+    def _covid19india_time(updated: Optional[int]) -> str:
+        """Disease.sh epoch milliseconds in covid19india.org's "dd/mm/yyyy HH:MM:SS" IST format"""
+        if not updated:
+            return ""
+        return datetime.fromtimestamp(updated / 1000, IST).strftime("%d/%m/%Y %H:%M:%S")
+
+    async def get_vaccination_india_data(self) -> Dict[str, Any]:
+        """Get vaccination data for India from covid19india.org
+
+        Not hedged: Disease.sh only reports total doses, without the per-dose
+        breakdown this returns.
+        """
+        try:
+            data = await self._covid19india_vaccination_data()
+            if data:
+                return {"success": True, "data": data}
         except Exception as e:
             logger.error(f"Error fetching vaccination data: {e}")
 
         return {"success": False, "error": "Unable to fetch vaccination data"}
 
+    async def _covid19india_vaccination_data(self) -> Optional[Dict[str, Any]]:
+        """Vaccination totals from covid19india.org"""
+        url = f"{self.covid19_india_base}/v4/min/data.min.json"
+        response = await upstream_get(self.client, "covid19india/v4/min/data.min.json", url)
+        if response.status_code != 200:
+            return None
+
+        india_data = response.json().get("TT", {})  # TT = Total (India)
+        if not india_data:
+            return None
+        total = india_data.get("total", {})
+        return {
+            "total_vaccinated": total.get("vaccinated", 0),
+            "total_doses": total.get("vaccinated1", 0) + total.get("vaccinated2", 0),
+            "first_dose": total.get("vaccinated1", 0),
+            "second_dose": total.get("vaccinated2", 0),
+            "precaution_dose": total.get("precautiondose", 0),
+            "today_vaccinated": india_data.get("delta", {}).get("vaccinated", 0)
+        }
+
     async def get_indian_health_schemes(self) -> Dict[str, Any]:
         """Get information about Indian government health schemes"""
         schemes = [
@@ -224,7 +283,7 @@ class IndiaHealthDataService:
                 "units": "metric"
             }
 
-            response = await self.client.get(url, params=params)
+            response = await upstream_get(self.client, "openweather/data/2.5/weather", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 temp = data["main"]["temp"]
@@ -324,7 +383,7 @@ class IndiaHealthDataService:
                 "format": "json",
                 "limit": limit
             }
-            response = await self.client.get(url, params=params)
+            response = await upstream_get(self.client, "data.gov.in/resource/health-news", url, params=params)
             if response.status_code == 200:
                 data = response.json()
                 news_items = data.get("records", [])
@@ -342,3 +401,4 @@ class IndiaHealthDataService:
 
 # Global instance
 india_health_service = IndiaHealthDataService()
+background.register("India health data service", stop=india_health_service.close)
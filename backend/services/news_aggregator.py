@@ -0,0 +1,239 @@
+"""
+Incremental, de-duplicated health news aggregation
+
+Polls NewsAPI and Data.gov.in in the background and keeps a bounded,
+time-ordered in-memory index that the news and outbreak endpoints read from,
+so serving news never waits on an upstream call.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import re
+from datetime import datetime, timezone
+from itertools import count
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from ..config import settings
+from . import background
+from .health_data_service import health_data_service
+from .india_health_service import india_health_service
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = {
+    "the", "and", "for", "with", "from", "that", "this", "are", "was", "has", "have",
+    "its", "into", "over", "after", "amid", "new", "says", "said", "will", "can",
+}
+
+# Titles sharing at least this fraction of their significant words are treated as the same story
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+
+def _tokens(text: str) -> Set[str]:
+    """Significant lowercase words of a title or description"""
+    return {word for word in re.findall(r"[a-z0-9]+", (text or "").lower()) if len(word) > 2 and word not in STOPWORDS}
+
+
+def _normalise_url(url: str) -> str:
+    """Strip scheme, www, query string, fragment and trailing slash so mirrors of one link compare equal"""
+    parts = urlsplit((url or "").strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/')}"
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    """Epoch seconds from an ISO 8601 string (NewsAPI uses a trailing Z)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class HealthNewsAggregator:
+    """Bounded, time-ordered article index with URL and near-duplicate-title de-duplication"""
+
+    def __init__(self, max_items: int = 500):
+        self.max_items = max_items
+        self._ids = count()
+        self._articles: Dict[int, Dict[str, Any]] = {}
+        # (published_ts, id) ascending; the oldest entries are evicted first
+        self._order: List[Tuple[float, int]] = []
+        self._by_url: Dict[str, int] = {}
+        # Inverted index of significant words -> article ids, used for keyword queries and near-duplicate checks
+        self._by_token: Dict[str, Set[int]] = {}
+        self._title_tokens: Dict[int, Set[str]] = {}
+        # Newest publishedAt seen per source, for incremental polling
+        self._last_seen: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def add(self, article: Dict[str, Any], locale: str) -> bool:
+        """Index an article; returns False if it is a duplicate or too old to keep"""
+        published = _parse_timestamp(article.get("published_at"))
+        if published is None:
+            return False
+
+        url_key = _normalise_url(article.get("url", ""))
+        if url_key and url_key in self._by_url:
+            return False
+
+        title_tokens = _tokens(article.get("title", ""))
+        if self._is_near_duplicate(title_tokens):
+            return False
+
+        if len(self._order) >= self.max_items and published <= self._order[0][0]:
+            return False
+
+        article_id = next(self._ids)
+        self._articles[article_id] = dict(article, locale=locale)
+        bisect.insort(self._order, (published, article_id))
+        if url_key:
+            self._by_url[url_key] = article_id
+        self._title_tokens[article_id] = title_tokens
+        for token in title_tokens | _tokens(article.get("description", "")):
+            self._by_token.setdefault(token, set()).add(article_id)
+
+        while len(self._order) > self.max_items:
+            self._evict(self._order[0][1])
+        return True
+
+    def _is_near_duplicate(self, title_tokens: Set[str]) -> bool:
+        """Compare only against indexed titles sharing one of the title's rarest words
+
+        A title at or above the threshold shares all but (1 - threshold) of this
+        title's words, so probing one more than that many words is certain to
+        reach it, whichever words they are (words never seen before included);
+        the rarest are probed because they have the fewest postings.
+        """
+        if not title_tokens:
+            return False
+        # Words a near-duplicate may lack, plus one; the epsilon keeps e.g. 0.8 * 10 from rounding up to 9
+        probes = len(title_tokens) - math.ceil(NEAR_DUPLICATE_THRESHOLD * len(title_tokens) - 1e-9) + 1
+        rarest = sorted(title_tokens, key=lambda token: len(self._by_token.get(token, ())))[:probes]
+        candidates = set().union(*(self._by_token.get(token, set()) for token in rarest))
+        for candidate in candidates:
+            other = self._title_tokens[candidate]
+            overlap = len(title_tokens & other) / len(title_tokens | other)
+            if overlap >= NEAR_DUPLICATE_THRESHOLD:
+                return True
+        return False
+
+    def _evict(self, article_id: int):
+        article = self._articles.pop(article_id)
+        self._order.pop(0)
+        self._by_url.pop(_normalise_url(article.get("url", "")), None)
+        tokens = self._title_tokens.pop(article_id) | _tokens(article.get("description", ""))
+        for token in tokens:
+            ids = self._by_token.get(token)
+            if ids is not None:
+                ids.discard(article_id)
+                if not ids:
+                    del self._by_token[token]
+
+    def query(self, keyword: Optional[str] = None, locale: Optional[str] = None, limit: int = 5) -> List[Dict[str, Any]]:
+        """Newest articles matching any word of `keyword` and the given locale"""
+        if keyword:
+            matching: Optional[Set[int]] = set()
+            for token in _tokens(keyword):
+                matching |= self._by_token.get(token, set())
+        else:
+            matching = None
+
+        results = []
+        for _, article_id in reversed(self._order):
+            if matching is not None and article_id not in matching:
+                continue
+            article = self._articles[article_id]
+            if locale and article["locale"] != locale:
+                continue
+            results.append(article)
+            if len(results) >= limit:
+                break
+        return results
+
+    def _ingest(self, source: str, articles: Iterable[Dict[str, Any]], locale: str) -> int:
+        """Add the articles newer than the last one seen from this source"""
+        last_seen = self._last_seen.get(source, 0.0)
+        added = 0
+        for article in articles:
+            published = _parse_timestamp(article.get("published_at"))
+            if published is None or published <= last_seen:
+                continue
+            if self.add(article, locale):
+                added += 1
+            self._last_seen[source] = max(self._last_seen.get(source, 0.0), published)
+        return added
+
+    async def poll_once(self) -> int:
+        """Fetch new articles from every configured source; returns how many were indexed"""
+        added = 0
+
+        if settings.news_api_key:
+            for query in settings.news_poll_queries:
+                source = f"newsapi:{query}"
+                since = None
+                if source in self._last_seen:
+                    since = datetime.fromtimestamp(self._last_seen[source], tz=timezone.utc).isoformat()
+                result = await health_data_service.get_health_news(query, since=since, page_size=settings.news_poll_page_size)
+                if result.get("success") and not result.get("fallback"):
+                    added += self._ingest(source, result["data"], locale="global")
+
+        if settings.data_gov_in_api_key:
+            result = await india_health_service.get_latest_health_news(limit=settings.news_poll_page_size)
+            if result.get("success"):
+                added += self._ingest("data.gov.in", (self._from_data_gov_in(record) for record in result["data"]), locale="in")
+
+        if added:
+            logger.info(f"News aggregator indexed {added} new articles ({len(self)} held)")
+        return added
+
+    @staticmethod
+    def _from_data_gov_in(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a Data.gov.in record onto the NewsAPI article shape"""
+        return {
+            "title": record.get("title") or record.get("headline", "No title"),
+            "description": record.get("description") or record.get("summary", ""),
+            "url": record.get("url") or record.get("link", ""),
+            "published_at": record.get("published_at") or record.get("publishedAt") or record.get("date", ""),
+            "source": record.get("source", "Data.gov.in")
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Error polling health news: {e}")
+            await asyncio.sleep(settings.news_poll_interval)
+
+    def start(self):
+        """Start background polling (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop background polling"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+news_aggregator = HealthNewsAggregator(max_items=settings.news_index_size)
+background.register("health news aggregator", start=news_aggregator.start, stop=news_aggregator.stop)
@@ -1,9 +1,262 @@
+"""
+Outbreak area index: pincode -> district -> state, with active outbreaks per area
+
+Built from a JSON data file (settings.outbreak_data_path) into an immutable
+index. Pincodes are kept in one sorted array, so every district and state
+(and any pincode prefix) is a contiguous range or a precomputed list, and
+checking a pincode looks up the outbreaks on it, its prefixes, its district
+and its state with a handful of dict hits. Outbreaks of each disease are
+kept in an interval index over their active period (reported to resolved),
+so "pincodes affected by Dengue in the last 14 days" finds the outbreaks
+active at any time in that window without a scan. Reloads build a new index
+off the event loop and swap the reference, so readers always see a complete
+index.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..utils.intervals import IntervalIndex
+from . import background
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("pincode", "prefix", "district", "state")
+
+
+def area_key(name: str) -> str:
+    return " ".join((name or "").split()).lower()
+
+
+@dataclass(frozen=True)
+class Outbreak:
+    """One reported outbreak; area is a pincode, pincode prefix, "State/District" or state"""
+    disease: str
+    level: str
+    area: str
+    reported_on: date
+    resolved_on: Optional[date] = None
+    cases: Optional[int] = None
+
+    def active(self, on: date) -> bool:
+        return self.reported_on <= on and (self.resolved_on is None or self.resolved_on >= on)
+
+    def to_dict(self) -> dict:
+        return {
+            "disease": self.disease,
+            "level": self.level,
+            "area": self.area,
+            "reported_on": self.reported_on.isoformat(),
+            "resolved_on": self.resolved_on.isoformat() if self.resolved_on else None,
+            "cases": self.cases
+        }
+
+
+class OutbreakIndex:
+    """Immutable area hierarchy and outbreak lookups; build a new one to change it"""
+
+    def __init__(self, areas: Dict[str, Dict[str, List[str]]], outbreaks: List[Outbreak]):
+        rows = sorted(
+            (str(pincode), district, state)
+            for state, districts in areas.items()
+            for district, pincodes in districts.items()
+            for pincode in pincodes
+        )
+        self.pincodes = [pincode for pincode, _, _ in rows]
+        # pincode -> (district, state) display names
+        self._location: Dict[str, Tuple[str, str]] = {pincode: (district, state) for pincode, district, state in rows}
+        self.district_pincodes: Dict[str, List[str]] = {}
+        self.state_pincodes: Dict[str, List[str]] = {}
+        self.states: Dict[str, str] = {}
+        self.districts: Dict[str, Tuple[str, str]] = {}
+        for pincode, district, state in rows:
+            district_key = f"{area_key(state)}/{area_key(district)}"
+            self.district_pincodes.setdefault(district_key, []).append(pincode)
+            self.state_pincodes.setdefault(area_key(state), []).append(pincode)
+            self.states[area_key(state)] = state
+            self.districts[district_key] = (district, state)
+
+        # (level, normalised area) -> outbreaks on that area
+        self._by_area: Dict[Tuple[str, str], List[Outbreak]] = {}
+        by_disease: Dict[str, List[Outbreak]] = {}
+        for outbreak in sorted(outbreaks, key=lambda o: o.reported_on):
+            self._by_area.setdefault((outbreak.level, self._normalise_area(outbreak.level, outbreak.area)), []).append(outbreak)
+            by_disease.setdefault(area_key(outbreak.disease), []).append(outbreak)
+        # normalised disease -> outbreaks by active period; unresolved ones stay active indefinitely
+        self._by_disease: Dict[str, IntervalIndex[Outbreak]] = {
+            disease: IntervalIndex((o.reported_on, o.resolved_on or date.max, o) for o in entries)
+            for disease, entries in by_disease.items()
+        }
+        self.outbreak_count = len(outbreaks)
+
+    @staticmethod
+    def _normalise_area(level: str, area: str) -> str:
+        if level in ("pincode", "prefix"):
+            return area.strip()
+        if level == "district":
+            state, _, district = area.partition("/")
+            return f"{area_key(state)}/{area_key(district)}"
+        return area_key(area)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "OutbreakIndex":
+        outbreaks = []
+        for row in data.get("outbreaks", []):
+            try:
+                level = row.get("level", "pincode")
+                if level not in LEVELS:
+                    raise ValueError(f"unknown level '{level}'")
+                outbreaks.append(Outbreak(
+                    disease=row["disease"],
+                    level=level,
+                    area=str(row["area"]),
+                    reported_on=date.fromisoformat(row["reported_on"]),
+                    resolved_on=date.fromisoformat(row["resolved_on"]) if row.get("resolved_on") else None,
+                    cases=row.get("cases")
+                ))
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping bad outbreak entry {row!r}: {e}")
+        return cls(data.get("areas", {}), outbreaks)
+
+    @classmethod
+    def from_file(cls, path: str) -> "OutbreakIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def locate(self, pincode: str) -> Optional[Dict[str, str]]:
+        """District and state of a pincode, or None if it is not in the index"""
+        location = self._location.get(str(pincode).strip())
+        if location is None:
+            return None
+        return {"pincode": str(pincode).strip(), "district": location[0], "state": location[1]}
+
+    def prefix_range(self, prefix: str) -> List[str]:
+        """Every indexed pincode starting with prefix (a contiguous slice of the sorted array)"""
+        start = bisect_left(self.pincodes, prefix)
+        end = bisect_left(self.pincodes, prefix + ":")  # ":" sorts just after "9"
+        return self.pincodes[start:end]
+
+    def pincodes_in(self, level: str, area: str) -> List[str]:
+        """Pincodes covered by an area at any level (sorted)"""
+        key = self._normalise_area(level, area)
+        if level == "pincode":
+            return [key] if key in self._location else []
+        if level == "prefix":
+            return self.prefix_range(key)
+        if level == "district":
+            return self.district_pincodes.get(key, [])
+        return self.state_pincodes.get(key, [])
+
+    def outbreaks_at(self, pincode: str, on: Optional[date] = None) -> List[Outbreak]:
+        """Active outbreaks covering a pincode: on it, on a prefix of it, its district or its state"""
+        pincode = str(pincode).strip()
+        on = on or date.today()
+        keys = [("pincode", pincode)] + [("prefix", pincode[:length]) for length in range(1, len(pincode))]
+        location = self._location.get(pincode)
+        if location is not None:
+            district, state = location
+            keys += [("district", f"{area_key(state)}/{area_key(district)}"), ("state", area_key(state))]
+        return [outbreak for key in keys for outbreak in self._by_area.get(key, ()) if outbreak.active(on)]
+
+    def reported_since(self, disease: str, since: date) -> List[Outbreak]:
+        """Outbreaks of a disease reported on or after a date, oldest first"""
+        intervals = self._by_disease.get(area_key(disease))
+        return intervals.starting_from(since) if intervals else []
+
+    def active_between(self, disease: str, start: date, end: date) -> List[Outbreak]:
+        """Outbreaks of a disease active at any time from start to end, oldest report first"""
+        intervals = self._by_disease.get(area_key(disease))
+        return intervals.overlapping(start, end) if intervals else []
+
+    def affected_pincodes(self, disease: str, days: int = 14, on: Optional[date] = None) -> List[str]:
+        """Pincodes covered by outbreaks of a disease active at any time in the last `days` days (sorted)"""
+        on = on or date.today()
+        affected = set()
+        for outbreak in self.active_between(disease, on - timedelta(days=days), on):
+            affected.update(self.pincodes_in(outbreak.level, outbreak.area))
+        return sorted(affected)
+
+
+class OutbreakAreas:
+    """Holds the current OutbreakIndex and reloads it when the data file changes"""
+
+    def __init__(self, path: str, reload_interval: float = 300.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.index = OutbreakIndex({}, [])
+        self._mtime: Optional[float] = None
+        self._listeners: List[Callable[[OutbreakIndex], object]] = []
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self) -> bool:
+        """Build a new index from the data file and swap it in; returns False if it was unchanged or unreadable"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            index = OutbreakIndex.from_file(self.path)
+        except Exception as e:
+            logger.error(f"Error loading outbreak data {self.path}: {e}")
+            return False
+        self.index, self._mtime = index, mtime
+        logger.info(f"Loaded outbreak index: {len(index.pincodes)} pincodes, {index.outbreak_count} outbreaks")
+        return True
+
+    def add_listener(self, callback: Callable[[OutbreakIndex], object]):
+        """Call callback(index) on the event loop whenever a changed data file is reloaded"""
+        self._listeners.append(callback)
+
+    def current(self) -> OutbreakIndex:
+        """The current index, loading it on first use"""
+        if self._mtime is None:
+            self.load()
+        return self.index
+
+    async def _watch(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.reload_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping.is_set() and await asyncio.to_thread(self.load):
+                for listener in self._listeners:
+                    try:
+                        listener(self.index)
+                    except Exception as e:
+                        logger.error(f"Error in outbreak index reload listener: {e}")
+
+    async def start(self):
+        """Load the index and start watching the data file (idempotent)"""
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            await asyncio.to_thread(self.load)
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+
+# Global instance
+outbreak_areas = OutbreakAreas(settings.outbreak_data_path, reload_interval=settings.outbreak_reload_interval)
+background.register("outbreak area index", start=outbreak_areas.start, stop=outbreak_areas.stop)
+
+
 def check_area(pincode):
-    """Check for disease outbreaks in an area"""
-    # Dummy implementation - replace with actual data
-    outbreaks = {
-        "110001": ["Dengue", "Malaria"],
-        "400001": ["COVID-19"],
-        "600001": ["H1N1"]
-    }
-    return outbreaks.get(pincode, [])
\ No newline at end of file
+    """Check for disease outbreaks in an area (the pincode, its district and its state)"""
+    return sorted({outbreak.disease for outbreak in outbreak_areas.current().outbreaks_at(pincode)})
+
+
+def affected_pincodes(disease: str, days: int = 14) -> List[str]:
+    """Pincodes affected by an outbreak of a disease active in the last `days` days"""
+    return outbreak_areas.current().affected_pincodes(disease, days)
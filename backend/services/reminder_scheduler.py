@@ -0,0 +1,268 @@
+"""
+Sends due vaccination reminders; safe to run in several worker processes at once
+
+Each cycle claims a batch of due, un-reminded rows by stamping them with this
+worker's ID and a lease expiry in one UPDATE ... RETURNING. On PostgreSQL the
+candidate rows are selected FOR UPDATE SKIP LOCKED, so concurrent workers take
+disjoint batches without waiting on each other; on SQLite writes are
+serialised and the lease alone keeps claims disjoint.
+
+The database stays the source of truth. A claimed reminder that falls in the
+user's quiet hours is released with send_after set to the end of them (plus
+the delivery scheduler's per-delivery spread) and is claimed again then. The
+rest are sent through the WhatsApp or SMS dispatcher under a pending Alert
+row, paced by the delivery scheduler's release rate; reminders the
+dispatcher reports sent are stamped reminded_at in one bulk UPDATE. A failed
+send keeps its claim until the lease expires, after which any worker retries
+it under the same Alert row. Reminders of users who have opted out (or no
+longer exist) are stamped skipped_at instead: closed without sending, and not
+revived if the user opts back in.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy import bindparam, or_, select, update
+
+from ..config import settings
+from ..db import crud, models
+from ..db.database import SessionLocal
+from . import background
+from .delivery_scheduler import delivery_scheduler
+from .sms_dispatcher import sms_dispatcher
+from .templates import template_registry
+from .whatsapp_dispatcher import whatsapp_dispatcher
+
+logger = logging.getLogger(__name__)
+
+REMINDERS = Counter(
+    "health_chatbot_reminders_total",
+    "Vaccination reminders processed by the scheduler, by outcome",
+    ["outcome"],
+)
+
+# Sends (phone, text, alert_id) and resolves to whether the message was accepted
+Sender = Callable[[str, str, int], Awaitable[bool]]
+
+Reminder = Tuple[int, str, str, int]  # reminder id, phone, text, alert id
+
+
+class ReminderScheduler:
+    """Claims due reminders in leased batches and sends them, deferring any in quiet hours"""
+
+    def __init__(self, worker_id: Optional[str] = None, channel: str = "whatsapp", batch_size: int = 200,
+                 poll_interval: float = 30.0, lease_seconds: float = 600.0, sender: Optional[Sender] = None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.channel = channel
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.sender = sender
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def configured(self) -> bool:
+        if self.sender is not None:
+            return True
+        return (whatsapp_dispatcher if self.channel == "whatsapp" else sms_dispatcher).configured
+
+    def _claim(self) -> Tuple[List[Reminder], List[int], int]:
+        """Claim a batch, defer those in quiet hours and create alert rows for the rest (runs in a thread)
+
+        Returns:
+            Reminders to send, IDs of claimed reminders to skip because their user has
+            opted out, and the number deferred out of quiet hours
+        """
+        now = datetime.now(timezone.utc)
+        reminder = models.VaccinationReminder
+        db = SessionLocal()
+        try:
+            candidates = (
+                select(reminder.id)
+                .where(
+                    reminder.reminded_at.is_(None),
+                    reminder.skipped_at.is_(None),
+                    # due_date is stored without a timezone, in UTC
+                    reminder.due_date <= now.replace(tzinfo=None),
+                    or_(reminder.lease_expires_at.is_(None), reminder.lease_expires_at < now),
+                    or_(reminder.send_after.is_(None), reminder.send_after <= now)
+                )
+                .order_by(reminder.due_date, reminder.id)
+                .limit(self.batch_size)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                candidates = candidates.with_for_update(skip_locked=True)
+            claimed = db.execute(
+                update(reminder)
+                .where(reminder.id.in_(candidates.scalar_subquery()))
+                .values(claimed_by=self.worker_id, lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+                .returning(reminder.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+            if not claimed:
+                return [], [], 0
+
+            rows = db.execute(
+                select(reminder.id, reminder.user_id, reminder.vaccine_name, reminder.due_date, reminder.alert_id,
+                       models.User.phone, models.User.language, models.User.opt_in, models.User.timezone)
+                .join(models.User, models.User.id == reminder.user_id)
+                .where(reminder.id.in_(claimed))
+                .order_by(reminder.due_date, reminder.id)
+            ).all()
+            found = {row.id for row in rows}
+            skipped = [reminder_id for reminder_id in claimed if reminder_id not in found]
+            skipped += [row.id for row in rows if row.opt_in is False]
+            rows = [row for row in rows if row.opt_in is not False]
+
+            # Reminders in the user's quiet hours go back to the table until they end
+            release = {
+                row.id: delivery_scheduler.release_time(f"reminder:{row.id}", now.timestamp(), row.timezone)
+                for row in rows
+            }
+            deferred = [row for row in rows if release[row.id] > now.timestamp()]
+            if deferred:
+                # One executemany on the table; an ORM UPDATE with per-row parameters needs full primary keys
+                table = reminder.__table__
+                db.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("reminder_id"), table.c.claimed_by == self.worker_id)
+                    .values(send_after=bindparam("until"), claimed_by=None, lease_expires_at=None),
+                    [{"reminder_id": row.id, "until": datetime.fromtimestamp(release[row.id], timezone.utc)}
+                     for row in deferred]
+                )
+                db.commit()
+                rows = [row for row in rows if release[row.id] <= now.timestamp()]
+
+            texts = [
+                template_registry.render("vaccination_reminder", row.language, self.channel, {
+                    "vaccine": row.vaccine_name,
+                    "due_date": row.due_date.strftime("%d %b %Y") if row.due_date else ""
+                })
+                for row in rows
+            ]
+            # A retried reminder is sent under the alert of its first attempt; the others get one now
+            new = [(row, text) for row, text in zip(rows, texts) if row.alert_id is None]
+            created = crud.create_alerts(db, [
+                {"user_id": row.user_id, "type": "vaccination", "message": text} for row, text in new
+            ])
+            alert_ids = dict(zip((row.id for row, _ in new), created))
+            table = reminder.__table__
+            if created:
+                db.execute(
+                    update(table).where(table.c.id == bindparam("reminder_id")).values(alert_id=bindparam("new_alert_id")),
+                    [{"reminder_id": reminder_id, "new_alert_id": alert_id} for reminder_id, alert_id in alert_ids.items()]
+                )
+            retried = [row.alert_id for row in rows if row.alert_id is not None]
+            if retried:
+                db.execute(
+                    update(models.Alert).where(models.Alert.id.in_(retried)).values(status="pending")
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            return [
+                (row.id, row.phone, text, row.alert_id or alert_ids[row.id]) for row, text in zip(rows, texts)
+            ], skipped, len(deferred)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _stamp(self, reminder_ids: Sequence[int], column: str = "reminded_at") -> int:
+        """Mark reminders as sent (or skipped) and drop their claim, if this worker still holds it (runs in a thread)"""
+        if not reminder_ids:
+            return 0
+        reminder = models.VaccinationReminder
+        db = SessionLocal()
+        try:
+            stamped = 0
+            for start in range(0, len(reminder_ids), 500):
+                result = db.execute(
+                    update(reminder)
+                    .where(reminder.id.in_(reminder_ids[start:start + 500]), reminder.claimed_by == self.worker_id)
+                    .values({column: datetime.now(timezone.utc), "claimed_by": None, "lease_expires_at": None})
+                    .execution_options(synchronize_session=False)
+                )
+                stamped += result.rowcount
+            db.commit()
+            return stamped
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _send(self, reminder_id: int, phone: str, text: str, alert_id: int) -> bool:
+        if self.sender is not None:
+            return await self.sender(phone, text, alert_id)
+        return await delivery_scheduler.send(self.channel, phone, text, alert_id=alert_id)
+
+    async def run_once(self) -> int:
+        """Claim and send one batch; returns the number of reminders claimed"""
+        batch, skipped, deferred = await asyncio.to_thread(self._claim)
+        if not batch and not skipped and not deferred:
+            return 0
+        results = await asyncio.gather(
+            *(self._send(*reminder) for reminder in batch),
+            return_exceptions=True
+        )
+        sent = [reminder_id for (reminder_id, *_), ok in zip(batch, results) if ok is True]
+        failed = len(batch) - len(sent)
+        await asyncio.to_thread(self._stamp, sent)
+        await asyncio.to_thread(self._stamp, skipped, "skipped_at")
+        REMINDERS.labels(outcome="sent").inc(len(sent))
+        REMINDERS.labels(outcome="failed").inc(failed)
+        REMINDERS.labels(outcome="skipped").inc(len(skipped))
+        REMINDERS.labels(outcome="deferred").inc(deferred)
+        if failed:
+            logger.warning(f"{failed} vaccination reminders failed to send; retrying after the claim lease expires")
+        return len(batch) + len(skipped) + deferred
+
+    async def _run(self):
+        while not self._stopping:
+            claimed = 0
+            if self.configured:
+                try:
+                    claimed = await self.run_once()
+                except Exception as e:
+                    logger.error(f"Error sending vaccination reminders: {e}")
+            # A full batch means more are probably due: go again straight away
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+
+    def start(self):
+        """Start the scheduling loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Finish the batch in progress, then stop"""
+        self._stopping = True
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+
+# Global instance
+reminder_scheduler = ReminderScheduler(
+    channel=settings.reminder_channel,
+    batch_size=settings.reminder_batch_size,
+    poll_interval=settings.reminder_poll_interval,
+    lease_seconds=settings.reminder_lease_seconds
+)
+if settings.reminder_scheduler_enabled:
+    background.register("vaccination reminder scheduler", start=reminder_scheduler.start, stop=reminder_scheduler.stop)
@@ -0,0 +1,171 @@
+"""
+Outbound SMS dispatcher
+
+Queues messages for Twilio on prioritised lanes: emergency alerts go to the
+high lane, which has reserved workers, so they are never stuck behind a bulk
+campaign on the low lane. Messages to the same recipient are sent in order.
+Sends are paced to the account's messages-per-second limit, and 429/5xx
+responses and connection failures before the request went out are retried
+with exponential backoff.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from prometheus_client import Counter, Histogram
+
+from ..config import settings
+from ..utils.rate_limit import TokenBucket
+from . import background
+from .delivery_status import delivery_status_buffer
+from .twilio_client import TwilioAPIError, twilio_client
+from .worker_pool import Priority, WorkerPool
+
+logger = logging.getLogger(__name__)
+
+SENDS = Counter(
+    "health_chatbot_sms_sends_total",
+    "Outbound SMS messages by lane and final outcome",
+    ["lane", "outcome"],
+)
+RETRIES = Counter(
+    "health_chatbot_sms_send_retries_total",
+    "Outbound SMS send attempts that were retried",
+    ["reason"],
+)
+SEND_SECONDS = Histogram(
+    "health_chatbot_sms_send_seconds",
+    "Time from enqueue to final outcome of an outbound SMS",
+    ["lane"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+
+# Transport errors raised before the request was sent; anything later (read timeouts, dropped
+# connections) may follow a message Twilio already accepted, so retrying could send it twice
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class SMSDispatchError(Exception):
+    """An SMS could not be queued or sent"""
+
+
+class SMSDispatcher:
+    """Prioritised, per-recipient ordered sender for Twilio SMS"""
+
+    def __init__(self):
+        self.account_bucket = TokenBucket(settings.sms_messages_per_second, burst=settings.sms_messages_per_second)
+        self.pool = WorkerPool(
+            "sms_outbound",
+            self._deliver,
+            concurrency=settings.sms_send_concurrency,
+            max_queue=settings.sms_send_queue_size,
+            reserved_high=settings.sms_reserved_emergency_workers
+        )
+
+    @property
+    def configured(self) -> bool:
+        return twilio_client.configured
+
+    def enqueue(self, to_number: str, message: str, priority: Priority = Priority.NORMAL,
+                alert_id: Optional[int] = None) -> "asyncio.Future[str]":
+        """
+        Queue an SMS for delivery
+
+        Args:
+            to_number: Recipient in international format
+            message: Text body
+            priority: Lane to queue on
+            alert_id: Alert row to update with the final status, if any
+
+        Returns:
+            Future resolving to the Twilio message SID, or failing with SMSDispatchError
+        """
+        future = asyncio.get_running_loop().create_future()
+        job = {
+            "to": to_number,
+            "message": message,
+            "priority": priority,
+            "alert_id": alert_id,
+            "future": future,
+            "enqueued_at": time.perf_counter()
+        }
+        if not self.pool.submit(job, key=to_number, priority=priority):
+            self._finish(job, "dropped", error=SMSDispatchError(f"SMS {priority.name.lower()} lane is full"))
+            if alert_id is not None:
+                delivery_status_buffer.record_alert(alert_id, "failed")
+        return future
+
+    async def send(self, to_number: str, message: str, priority: Priority = Priority.NORMAL,
+                   alert_id: Optional[int] = None) -> str:
+        """Queue an SMS and wait until it is sent; returns the message SID"""
+        if not self.configured:
+            raise SMSDispatchError("Twilio credentials not configured")
+        return await self.enqueue(to_number, message, priority, alert_id)
+
+    async def _deliver(self, job: Dict[str, Any]):
+        """Worker-side send; always resolves the job's future"""
+        try:
+            message = await self._send_with_retries(job)
+            logger.info(f"SMS sent successfully to {job['to']}, SID: {message['sid']}")
+            self._finish(job, "sent", sid=message["sid"])
+        except Exception as e:
+            logger.error(f"Error sending SMS to {job['to']}: {e}")
+            self._finish(job, "failed", error=SMSDispatchError(str(e)))
+        if job["alert_id"] is not None:
+            status = "sent" if job["outcome"] == "sent" else "failed"
+            delivery_status_buffer.record_alert(job["alert_id"], status, job.get("sid"))
+
+    async def _send_with_retries(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Paced send with exponential backoff on 429, 5xx and connection failures"""
+        for attempt in range(1, settings.sms_send_max_attempts + 1):
+            if job["priority"] == Priority.HIGH:
+                # Emergencies don't wait for account throughput; bulk sends repay the debt
+                self.account_bucket.force_acquire()
+            else:
+                await self.account_bucket.acquire()
+            try:
+                return await twilio_client.send_message(
+                    job["to"], job["message"], status_callback=settings.twilio_status_callback_url
+                )
+            except TwilioAPIError as e:
+                if not e.retryable or attempt == settings.sms_send_max_attempts:
+                    raise
+                reason = str(e.status)
+            except UNSENT_ERRORS as e:
+                if attempt == settings.sms_send_max_attempts:
+                    raise
+                reason = type(e).__name__
+            RETRIES.labels(reason=reason).inc()
+            logger.warning(f"SMS send to {job['to']} failed with {reason} (attempt {attempt}), retrying")
+            delay = settings.sms_send_backoff * (2 ** (attempt - 1))
+            await asyncio.sleep(min(delay, 60.0) * random.uniform(0.8, 1.2))
+
+    def _finish(self, job: Dict[str, Any], outcome: str, sid: Optional[str] = None,
+                error: Optional[Exception] = None):
+        job["outcome"], job["sid"] = outcome, sid
+        lane = job["priority"].name.lower()
+        SENDS.labels(lane=lane, outcome=outcome).inc()
+        SEND_SECONDS.labels(lane=lane).observe(time.perf_counter() - job["enqueued_at"])
+        future = job["future"]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(sid)
+
+    def start(self):
+        self.pool.start()
+
+    async def stop(self):
+        await self.pool.stop()
+
+
+# Global instance
+sms_dispatcher = SMSDispatcher()
+background.register("sms dispatcher", start=sms_dispatcher.start, stop=sms_dispatcher.stop)
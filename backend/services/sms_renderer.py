@@ -0,0 +1,52 @@
+"""
+SMS rendering stage: turn chat-style responses into the cheapest SMS
+
+Strips Markdown, handles emoji per SMS_EMOJI_MODE, swaps typography for
+GSM-7 equivalents and tightens whitespace, so most English responses go out
+as GSM-7 (160/153 chars per segment) instead of UCS-2 (70/67). The result is
+then fitted to the SMS_MAX_SEGMENTS budget with the footer kept.
+"""
+
+from typing import Optional
+
+from prometheus_client import Histogram
+
+from ..config import settings
+from ..utils.sms_encoding import compact, fit_to_segments, replace_emoji, segment_info, strip_markdown
+
+SEGMENTS = Histogram(
+    "health_chatbot_sms_segments",
+    "Segments per rendered outbound SMS",
+    ["encoding"],
+    buckets=(1, 2, 3, 4, 6, 8, 10, 15, 20),
+)
+SEGMENTS_SAVED = Histogram(
+    "health_chatbot_sms_segments_saved",
+    "Segments saved per SMS by rendering, compared with sending the raw text",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 20),
+)
+
+
+def render_sms(text: str, footer: str = "", max_segments: Optional[int] = None,
+               emoji_mode: Optional[str] = None) -> str:
+    """
+    Render text (plus an optional footer that is never cut) as a compact SMS
+
+    Args:
+        text: Response text, possibly with Markdown and emoji
+        footer: Appended verbatim after the body
+        max_segments: Segment budget, defaults to settings.sms_max_segments (0 = unlimited)
+        emoji_mode: keep, drop or transliterate, defaults to settings.sms_emoji_mode
+    """
+    max_segments = settings.sms_max_segments if max_segments is None else max_segments
+    emoji_mode = emoji_mode or settings.sms_emoji_mode
+
+    body = compact(replace_emoji(strip_markdown(text), emoji_mode))
+    tail = "\n" + compact(footer) if footer.strip() else ""
+    rendered = fit_to_segments(body, tail, max_segments)
+
+    before = segment_info(text + footer).segments
+    after = segment_info(rendered)
+    SEGMENTS.labels(encoding=after.encoding).observe(after.segments)
+    SEGMENTS_SAVED.observe(max(0, before - after.segments))
+    return rendered
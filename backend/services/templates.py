@@ -0,0 +1,212 @@
+"""
+Message template registry with per-language, per-channel compilation and batch rendering
+
+Templates are parsed once into literal/field parts for each (language,
+channel) pair; SMS variants are compacted at compile time (no Markdown or
+emoji, GSM-7 typography) so rendering a message is just a join. Templates can
+require shared data providers (e.g. current COVID numbers) that are resolved
+once per render batch, not once per recipient; if a provider fails, the
+template's fallback template is used instead.
+"""
+
+import asyncio
+import logging
+from string import Formatter
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from ..config import settings
+from ..utils.sms_encoding import compact, fit_to_segments, replace_emoji, segment_info, strip_markdown
+from .health_data_service import health_data_service
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = "en"
+CHANNELS = ("sms", "whatsapp")
+
+# A provider returns fields shared by every message in a batch
+Provider = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class TemplateNotFound(KeyError):
+    """No template with this name exists in any language"""
+
+
+class CompiledTemplate:
+    """A template parsed into (literal, field, format_spec) parts for one language and channel"""
+
+    def __init__(self, name: str, language: str, channel: str, source: str,
+                 requires: Sequence[str] = (), fallback: Optional[str] = None):
+        self.name = name
+        self.language = language
+        self.channel = channel
+        self.requires = tuple(requires)
+        self.fallback = fallback
+        if channel == "sms":
+            source = compact(replace_emoji(strip_markdown(source), settings.sms_emoji_mode))
+        self.source = source
+        self.parts: List[Tuple[str, Optional[str], str]] = [
+            (literal, field, spec or "") for literal, field, spec, _ in Formatter().parse(source)
+        ]
+        self.fields = {field for _, field, _ in self.parts if field}
+
+    def render(self, fields: Mapping[str, Any]) -> str:
+        """Fill in fields; missing fields are left as {placeholders}"""
+        pieces = []
+        for literal, field, spec in self.parts:
+            pieces.append(literal)
+            if field is None:
+                continue
+            if field in fields:
+                value = fields[field]
+                pieces.append(format(value, spec) if spec else str(value))
+            else:
+                pieces.append("{" + field + "}")
+        text = "".join(pieces)
+        if self.channel == "sms" and settings.sms_max_segments and segment_info(text).segments > settings.sms_max_segments:
+            text = fit_to_segments(text, max_segments=settings.sms_max_segments)
+        return text
+
+
+class TemplateRegistry:
+    """Template sources by (name, language), compiled lazily per channel and cached"""
+
+    def __init__(self):
+        self._sources: Dict[Tuple[str, str], Tuple[str, Tuple[str, ...], Optional[str]]] = {}
+        self._compiled: Dict[Tuple[str, str, str], CompiledTemplate] = {}
+        self._providers: Dict[str, Provider] = {}
+
+    def add(self, name: str, language: str, source: str, requires: Sequence[str] = (), fallback: Optional[str] = None):
+        """Register (or replace) a template; fallback names the template used if a provider fails"""
+        self._sources[(name, language)] = (source, tuple(requires), fallback)
+        for channel in CHANNELS:
+            self._compiled.pop((name, language, channel), None)
+
+    def register_provider(self, name: str, provider: Provider):
+        self._providers[name] = provider
+
+    def names(self) -> List[str]:
+        return sorted({name for name, _ in self._sources})
+
+    def get(self, name: str, language: Optional[str] = None, channel: str = "sms") -> CompiledTemplate:
+        """Compiled template, falling back to the default language"""
+        language = language or DEFAULT_LANGUAGE
+        key = (name, language, channel)
+        compiled = self._compiled.get(key)
+        if compiled is not None:
+            return compiled
+        source = self._sources.get((name, language))
+        if source is None:
+            if language != DEFAULT_LANGUAGE:
+                compiled = self._compiled[key] = self.get(name, DEFAULT_LANGUAGE, channel)
+                return compiled
+            raise TemplateNotFound(name)
+        compiled = self._compiled[key] = CompiledTemplate(name, language, channel, *source)
+        return compiled
+
+    def sources(self, language: Optional[str] = None, channel: str = "sms") -> Dict[str, str]:
+        """Compiled source text of every template for a language and channel"""
+        return {name: self.get(name, language, channel).source for name in self.names()}
+
+    async def resolve_shared(self, name: str) -> Dict[str, Any]:
+        """
+        Resolve the providers a template (and its fallbacks) needs, once
+
+        Returns:
+            Shared fields; "_unavailable" lists providers that failed
+        """
+        required: Set[str] = set()
+        seen = set()
+        while name and name not in seen:
+            seen.add(name)
+            source = self._sources.get((name, DEFAULT_LANGUAGE))
+            if source is None:
+                break
+            required.update(source[1])
+            name = source[2]
+
+        shared: Dict[str, Any] = {"_unavailable": set()}
+        names = sorted(required)
+        results = await asyncio.gather(*(self._providers[provider]() for provider in names), return_exceptions=True)
+        for provider, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Template data provider {provider} failed: {result}")
+                shared["_unavailable"].add(provider)
+            else:
+                shared.update(result)
+        return shared
+
+    def select(self, name: str, language: Optional[str], channel: str, shared: Mapping[str, Any]) -> CompiledTemplate:
+        """The template to render given which shared providers are unavailable"""
+        template = self.get(name, language, channel)
+        unavailable = shared.get("_unavailable", ())
+        while template.fallback and any(provider in unavailable for provider in template.requires):
+            template = self.get(template.fallback, language, channel)
+        return template
+
+    def render(self, name: str, language: Optional[str] = None, channel: str = "sms",
+               fields: Optional[Mapping[str, Any]] = None, shared: Optional[Mapping[str, Any]] = None) -> str:
+        """Render one message from already-resolved shared data"""
+        shared = shared or {}
+        template = self.select(name, language, channel, shared)
+        return template.render({**shared, **(fields or {})})
+
+    async def render_batch(self, name: str, recipients: Iterable[Mapping[str, Any]], channel: str = "sms") -> List[str]:
+        """
+        Render one message per recipient, resolving shared data once for the whole batch
+
+        Args:
+            name: Template name
+            recipients: Field mappings; an optional "language" key picks the translation
+            channel: sms or whatsapp
+        """
+        shared = await self.resolve_shared(name)
+        templates: Dict[Optional[str], CompiledTemplate] = {}
+        messages = []
+        for fields in recipients:
+            language = fields.get("language")
+            template = templates.get(language)
+            if template is None:
+                template = templates[language] = self.select(name, language, channel, shared)
+            messages.append(template.render({**shared, **fields}))
+        return messages
+
+
+async def covid_fields() -> Dict[str, Any]:
+    """Global COVID-19 numbers for outbreak alerts"""
+    result = await health_data_service.get_covid_data("all")
+    if not result.get("success"):
+        raise RuntimeError(result.get("error", "COVID data unavailable"))
+    data = result["data"]
+    return {
+        "covid_active": f"{data['active']:,}",
+        "covid_cases": f"{data['cases']:,}",
+        "covid_deaths": f"{data['deaths']:,}",
+    }
+
+
+# Global instance
+template_registry = TemplateRegistry()
+template_registry.register_provider("covid", covid_fields)
+
+# Alert templates used by send-health-alert and campaigns
+template_registry.add("outbreak", "en", "Health Alert: COVID-19 Update - Active cases: {covid_active}. Stay safe, follow guidelines.",
+                      requires=("covid",), fallback="outbreak_general")
+template_registry.add("outbreak_general", "en", "Health Alert: Stay updated on health guidelines. Wash hands, wear masks when needed.")
+template_registry.add("vaccination", "en", "Health Reminder: Ensure you're up to date with vaccinations. COVID-19 boosters and annual flu shots recommended.")
+template_registry.add("emergency", "en", "HEALTH EMERGENCY ALERT: If this is a medical emergency, call 911 (US) or 108 (India) immediately. Do not rely on SMS for emergency care.")
+template_registry.add("general", "en", "Health Tip: Stay hydrated, eat balanced meals, exercise regularly, and get adequate sleep for optimal health.")
+template_registry.add("outbreak_alert", "en", "🚨 Health Alert: {disease} outbreak reported in {location}. Cases: {cases}. Follow safety guidelines.")
+template_registry.add("vaccination_reminder", "en", "💉 Vaccination Reminder: {vaccine} due. Schedule appointment at your healthcare provider.")
+template_registry.add("weather_health", "en", "🌡️ Weather Health Advisory: {condition}. Take precautions: {advice}")
+template_registry.add("emergency_info", "en", "🚨 Emergency: For immediate help call 911 (US) or 108 (India). This is an automated message.")
+template_registry.add("health_tip", "en", "💡 Health Tip: {tip}. Stay healthy!")
+template_registry.add("medication_reminder", "en", "💊 Medication Reminder: Time for {medication}. Take as prescribed.")
+
+template_registry.add("outbreak", "hi", "स्वास्थ्य चेतावनी: COVID-19 अपडेट - सक्रिय मामले: {covid_active}। सुरक्षित रहें, दिशानिर्देशों का पालन करें।",
+                      requires=("covid",), fallback="outbreak_general")
+template_registry.add("outbreak_general", "hi", "स्वास्थ्य चेतावनी: स्वास्थ्य दिशानिर्देशों की जानकारी रखें। हाथ धोएं, ज़रूरत हो तो मास्क पहनें।")
+template_registry.add("vaccination", "hi", "स्वास्थ्य अनुस्मारक: सुनिश्चित करें कि आपके सभी टीके समय पर लगे हैं। COVID-19 बूस्टर और सालाना फ्लू का टीका लगवाएं।")
+template_registry.add("emergency", "hi", "स्वास्थ्य आपातकालीन चेतावनी: चिकित्सा आपातकाल में तुरंत 108 (भारत) या 911 (US) पर कॉल करें। आपातकालीन देखभाल के लिए SMS पर निर्भर न रहें।")
+template_registry.add("general", "hi", "स्वास्थ्य सुझाव: पर्याप्त पानी पिएं, संतुलित भोजन करें, नियमित व्यायाम करें और पूरी नींद लें।")
+template_registry.add("outbreak_alert", "hi", "🚨 स्वास्थ्य चेतावनी: {location} में {disease} का प्रकोप। मामले: {cases}। सुरक्षा दिशानिर्देशों का पालन करें।")
+template_registry.add("vaccination_reminder", "hi", "💉 टीकाकरण अनुस्मारक: {vaccine} का समय हो गया है। अपने स्वास्थ्य केंद्र पर समय लें।")
@@ -0,0 +1,103 @@
+"""
+Async client for the Twilio REST API
+
+Replaces the blocking twilio.rest.Client on the request path: one pooled
+httpx client with keep-alive connections and the account credentials set
+once. The base URL is configurable so sends can be load tested against a
+local stand-in (see backend/benchmarks/twilio_standin.py).
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ..config import settings
+from . import background
+from .upstream import upstream_get
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "2010-04-01"
+
+
+class TwilioAPIError(Exception):
+    """Error response from the Twilio REST API"""
+
+    def __init__(self, status: int, message: str, code: Optional[int] = None):
+        super().__init__(f"Twilio API error {status}" + (f" ({code})" if code else "") + f": {message}")
+        self.status = status
+        self.code = code
+        self.message = message
+
+    @property
+    def retryable(self) -> bool:
+        return self.status == 429 or self.status >= 500
+
+
+class TwilioClient:
+    """Pooled async Twilio REST client"""
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.twilio_account_sid and settings.twilio_auth_token)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                base_url=f"{settings.twilio_api_base_url.rstrip('/')}/{API_VERSION}/Accounts",
+                auth=(settings.twilio_account_sid or "", settings.twilio_auth_token or ""),
+                timeout=settings.twilio_timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.sms_send_concurrency,
+                    max_keepalive_connections=settings.sms_send_concurrency
+                )
+            )
+        return self.client
+
+    @staticmethod
+    def _raise_for_error(response: httpx.Response):
+        if response.status_code < 400:
+            return
+        try:
+            error = response.json()
+        except ValueError:
+            error = {}
+        raise TwilioAPIError(response.status_code, error.get("message") or response.text, error.get("code"))
+
+    async def send_message(self, to: str, body: str, from_: Optional[str] = None,
+                           status_callback: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create an outbound message
+
+        Returns:
+            The message resource (sid, status, ...) as returned by Twilio
+
+        Raises:
+            TwilioAPIError: on an error response
+            httpx.TransportError: when Twilio could not be reached
+        """
+        data = {"To": to, "From": from_ or settings.twilio_phone_number, "Body": body}
+        if status_callback:
+            data["StatusCallback"] = status_callback
+        response = await self._get_client().post(f"/{settings.twilio_account_sid}/Messages.json", data=data)
+        self._raise_for_error(response)
+        return response.json()
+
+    async def fetch_account(self) -> Dict[str, Any]:
+        """Fetch the account resource (used as a credentials/connectivity check)"""
+        response = await upstream_get(self._get_client(), "twilio/Accounts/{sid}.json", f"/{settings.twilio_account_sid}.json")
+        self._raise_for_error(response)
+        return response.json()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+
+
+# Global instance
+twilio_client = TwilioClient()
+background.register("twilio client", stop=twilio_client.close)
@@ -0,0 +1,245 @@
+"""
+Upstream latency tracking, adaptive timeouts and hedged requests across
+redundant data sources
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_LATENCY = Histogram(
+    "health_chatbot_upstream_request_seconds",
+    "Latency of outbound requests per upstream endpoint",
+    ["upstream"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0),
+)
+UPSTREAM_TIMEOUT = Gauge(
+    "health_chatbot_upstream_timeout_seconds",
+    "Timeout currently applied to outbound requests per upstream endpoint",
+    ["upstream"],
+)
+UPSTREAM_CANCELLED = Counter(
+    "health_chatbot_upstream_cancelled_total",
+    "Outbound requests cancelled because a hedged request to another source won, per upstream endpoint",
+    ["upstream"],
+)
+UPSTREAM_TIMEOUTS = Counter(
+    "health_chatbot_upstream_timeouts_total",
+    "Outbound requests that hit their timeout per upstream endpoint",
+    ["upstream"],
+)
+
+# A fetcher returns the normalised payload, or None when the source had nothing usable
+Fetcher = Callable[[], Awaitable[Optional[Any]]]
+
+
+class LatencyHistogram:
+    """Rolling window of observed latencies (seconds) and failures for one upstream endpoint"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def observe(self, seconds: float, success: bool = True):
+        """Record one completed call"""
+        self.samples.append(seconds)
+        self.outcomes.append(success)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-th quantile (0..1) of the window, or None without samples"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    @property
+    def failure_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class UpstreamRegistry:
+    """Per-endpoint latency histograms shared by all data services"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._histograms: Dict[str, LatencyHistogram] = {}
+
+    def get(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = LatencyHistogram(self.window)
+        return histogram
+
+    def timeout_for(self, name: str) -> float:
+        """Timeout for the next request to an upstream: p99 x factor, clamped to bounds.
+
+        Until enough samples exist the configured default applies, so a cold
+        upstream is never cut off on its first slow answers.
+        """
+        histogram = self.get(name)
+        if histogram.count < settings.upstream_min_samples:
+            return settings.upstream_default_timeout
+        p99 = histogram.percentile(0.99)
+        return min(settings.upstream_max_timeout, max(settings.upstream_min_timeout, p99 * settings.upstream_timeout_factor))
+
+    def hedge_delay(self, name: str) -> float:
+        """How long to wait on a source before firing the next one (its observed p95)"""
+        histogram = self.get(name)
+        if histogram.count < settings.hedge_min_samples:
+            return settings.hedge_default_delay
+        p95 = histogram.percentile(0.95)
+        return min(settings.hedge_max_delay, max(settings.hedge_min_delay, p95))
+
+    def rank(self, names: Sequence[str]) -> List[str]:
+        """Order sources fastest-first by p95, penalising recent failures.
+
+        Sources without enough samples keep their configured position so that
+        a cold start still prefers the declared primary.
+        """
+        def score(item: Tuple[int, str]) -> Tuple[float, int]:
+            position, name = item
+            histogram = self.get(name)
+            if histogram.count < settings.hedge_min_samples:
+                return (settings.hedge_default_delay, position)
+            p95 = histogram.percentile(0.95)
+            return (p95 * (1.0 + 4.0 * histogram.failure_rate), position)
+
+        return [name for _, name in sorted(enumerate(names), key=score)]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Summary of every tracked source, for status endpoints"""
+        return {
+            name: {
+                "samples": histogram.count,
+                "p50": histogram.percentile(0.5),
+                "p95": histogram.percentile(0.95),
+                "p99": histogram.percentile(0.99),
+                "failure_rate": round(histogram.failure_rate, 3),
+                "timeout": self.timeout_for(name),
+            }
+            for name, histogram in self._histograms.items()
+        }
+
+
+async def upstream_get(client: httpx.AsyncClient, endpoint: str, url: str, **kwargs) -> httpx.Response:
+    """
+    GET from an upstream endpoint with a latency-derived timeout, recording the outcome
+
+    Args:
+        client: Shared client of the calling service
+        endpoint: Key the latency window is tracked under: the upstream plus the
+            path template, e.g. "disease.sh/{country}", so a small lookup never
+            inherits the timeout of a large feed on the same host
+        url: Request URL; remaining kwargs are passed to client.get
+
+    Raises:
+        httpx.TimeoutException: when the upstream exceeds its current timeout
+    """
+    histogram = upstream_registry.get(endpoint)
+    timeout = upstream_registry.timeout_for(endpoint)
+    UPSTREAM_TIMEOUT.labels(upstream=endpoint).set(timeout)
+
+    started = time.perf_counter()
+    try:
+        response = await client.get(url, timeout=timeout, **kwargs)
+    except httpx.TimeoutException:
+        elapsed = time.perf_counter() - started
+        UPSTREAM_TIMEOUTS.labels(upstream=endpoint).inc()
+        histogram.observe(elapsed, success=False)
+        logger.warning(f"Upstream {endpoint} timed out after {timeout:.2f}s")
+        raise
+    except asyncio.CancelledError:
+        # A hedge loser's elapsed time is only a lower bound on its latency; recording it
+        # would pull the percentiles (and so the ranking and timeouts) down, so it is not kept
+        UPSTREAM_CANCELLED.labels(upstream=endpoint).inc()
+        raise
+    except Exception:
+        histogram.observe(time.perf_counter() - started, success=False)
+        raise
+
+    elapsed = time.perf_counter() - started
+    histogram.observe(elapsed, success=response.status_code < 500)
+    UPSTREAM_LATENCY.labels(upstream=endpoint).observe(elapsed)
+    return response
+
+
+async def _attempt(name: str, fetcher: Fetcher) -> Optional[Any]:
+    """Run one hedged fetcher, treating exceptions as "no data"; latency is recorded by upstream_get"""
+    try:
+        return await fetcher()
+    except Exception as e:
+        logger.warning(f"Upstream {name} failed: {e}")
+        return None
+
+
+async def hedged_fetch(sources: Sequence[Tuple[str, Fetcher]]) -> Optional[Any]:
+    """
+    Fetch the same data from redundant sources, hedging slow ones
+
+    The fastest source (by observed p95) is tried first. If it has not answered
+    within its p95, the next source is fired as well and whichever returns a
+    usable result first wins; the others are cancelled. A source that fails
+    outright triggers the next one immediately.
+
+    Args:
+        sources: (endpoint, fetcher) pairs in declared preference order, keyed
+            like upstream_get so the ranking uses the same latency windows
+
+    Returns:
+        The first non-None result, or None if every source failed
+    """
+    fetchers = dict(sources)
+    remaining = upstream_registry.rank([name for name, _ in sources])
+    pending: Dict[asyncio.Task, str] = {}
+
+    def launch():
+        name = remaining.pop(0)
+        task = asyncio.create_task(_attempt(name, fetchers[name]))
+        pending[task] = name
+
+    launch()
+    try:
+        while pending:
+            # Only hedge while there is still something left to fire
+            newest = list(pending.values())[-1]
+            timeout = upstream_registry.hedge_delay(newest) if remaining else None
+            done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                logger.info(f"Hedging: {newest} slower than p95, firing {remaining[0]}")
+                launch()
+                continue
+
+            for task in done:
+                name = pending.pop(task)
+                result = task.result()
+                if result is not None:
+                    return result
+                logger.info(f"Source {name} returned no data")
+
+            if not pending and remaining:
+                launch()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# Global instance
+upstream_registry = UpstreamRegistry()
@@ -0,0 +1,214 @@
+"""
+Read-through cache of user profiles keyed by normalised phone number
+
+Inbound WhatsApp and SMS handling resolves the sender on every message, so
+profiles (language, location, area, opt-in) are kept in a bounded LRU with a
+TTL, and unknown numbers are cached too for a shorter time. Concurrent misses
+for one number share a single query. crud invalidates an entry whenever it
+writes that user (create_user, create_users, set_user_opt_in), so this
+worker never serves a stale profile after its own writes.
+
+Other workers learn about a write only through the TTL, unless an
+invalidation listener is registered: add_listener(callback) is called with
+the phones invalidated here (possibly from a worker thread), and can publish
+them over Redis, PostgreSQL NOTIFY or similar. The receiving side then calls
+invalidate(phones, broadcast=False).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from ..config import settings
+from ..db.database import AsyncSessionLocal, SessionLocal
+from ..utils.phone import normalise_phone
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = Counter(
+    "health_chatbot_user_cache_lookups_total",
+    "User profile lookups by phone number, by result",
+    ["result"],
+)
+
+# Keywords carriers and users conventionally use to leave and rejoin a messaging list (Twilio honours all of these)
+OPT_OUT_KEYWORDS = {"stop", "stopall", "unsubscribe", "cancel", "end", "quit"}
+OPT_IN_KEYWORDS = {"start", "unstop", "subscribe"}
+# WhatsApp has no carrier keywords; only an explicit request unsubscribes, so "cancel" or "end" reach the bot
+WHATSAPP_OPT_OUT_KEYWORDS = {"stop", "unsubscribe"}
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """The user fields message handling needs, detached from any session"""
+    id: int
+    phone: str
+    language: Optional[str]
+    location: Optional[str]
+    pincode: Optional[str]
+    district: Optional[str]
+    state: Optional[str]
+    opt_in: bool
+    timezone: Optional[str]
+
+    @classmethod
+    def from_user(cls, user) -> "UserProfile":
+        return cls(
+            id=user.id, phone=user.phone, language=user.language, location=user.location,
+            pincode=user.pincode, district=user.district, state=user.state,
+            opt_in=user.opt_in is not False, timezone=user.timezone
+        )
+
+
+def opt_keyword(text: str, opt_out_keywords: Iterable[str] = OPT_OUT_KEYWORDS) -> Optional[bool]:
+    """False for an opt-out keyword, True for an opt-in keyword, None for anything else"""
+    word = (text or "").strip().strip(".!").lower()
+    if word in opt_out_keywords:
+        return False
+    if word in OPT_IN_KEYWORDS:
+        return True
+    return None
+
+
+class UserCache:
+    """Bounded LRU of UserProfile (or None for unknown numbers) with per-entry expiry"""
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 300.0, negative_ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # phone -> (expires at, profile or None), least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, Optional[UserProfile]]]" = OrderedDict()
+        # Lookups in progress; invalidate() drops them so a load that raced a write is not stored
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._listeners: List[Callable[[List[str]], object]] = []
+        # crud invalidates from worker threads
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cached(self, phone: str) -> Tuple[bool, Optional[UserProfile]]:
+        with self._lock:
+            entry = self._entries.get(phone)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._entries[phone]
+                return False, None
+            self._entries.move_to_end(phone)
+            return True, entry[1]
+
+    def _store(self, phone: str, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            self._loading.pop(phone, None)
+            return
+        profile = future.result()
+        expires = time.monotonic() + (self.ttl if profile is not None else self.negative_ttl)
+        with self._lock:
+            if self._loading.get(phone) is not future:
+                return  # invalidated while loading
+            del self._loading[phone]
+            self._entries[phone] = (expires, profile)
+            self._entries.move_to_end(phone)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _load_sync(phone: str) -> Optional[UserProfile]:
+        from ..db import crud  # crud imports this module
+
+        db = SessionLocal()
+        try:
+            user = crud.get_user_by_phone(db, phone)
+            return UserProfile.from_user(user) if user is not None else None
+        finally:
+            db.close()
+
+    async def _load(self, phone: str) -> Optional[UserProfile]:
+        if AsyncSessionLocal is None:
+            return await asyncio.to_thread(self._load_sync, phone)
+        from ..db import async_crud  # async_crud imports this module
+
+        async with AsyncSessionLocal() as db:
+            user = await async_crud.get_user_by_phone(db, phone)
+            return UserProfile.from_user(user) if user is not None else None
+
+    async def get(self, phone: str) -> Optional[UserProfile]:
+        """The user with this phone number, or None if there is none (or the lookup failed)"""
+        key = normalise_phone(phone, settings.default_country_code)
+        if key is None:
+            return None
+        hit, profile = self._cached(key)
+        if hit:
+            LOOKUPS.labels(result="hit").inc()
+            return profile
+        LOOKUPS.labels(result="miss").inc()
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key))
+            self._loading[key] = future
+            future.add_done_callback(lambda done, key=key: self._store(key, done))
+        try:
+            return await asyncio.shield(future)
+        except Exception as e:
+            # Message handling carries on without the profile rather than failing
+            logger.error(f"Error looking up user {key}: {e}")
+            return None
+
+    def invalidate(self, phones: Iterable[str], broadcast: bool = True):
+        """Drop cached profiles after a write; listeners are told unless broadcast is False"""
+        keys = [key for key in (normalise_phone(phone, settings.default_country_code) for phone in phones) if key]
+        if not keys:
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._loading.pop(key, None)
+        if broadcast:
+            for listener in self._listeners:
+                try:
+                    listener(keys)
+                except Exception as e:
+                    logger.error(f"Error in user cache invalidation listener: {e}")
+
+    def add_listener(self, callback: Callable[[List[str]], object]):
+        """Call callback(phones) on every local invalidation, e.g. to publish it to other workers"""
+        self._listeners.append(callback)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+
+    async def set_opt_in(self, phone: str, opt_in: bool) -> Optional[UserProfile]:
+        """Record an opt-in change for a known user; returns the updated profile, or None if unknown"""
+        from ..db import async_crud, crud
+
+        key = normalise_phone(phone, settings.default_country_code)
+        if AsyncSessionLocal is None:
+            def update():
+                db = SessionLocal()
+                try:
+                    return crud.set_user_opt_in(db, key, opt_in)
+                finally:
+                    db.close()
+            user = await asyncio.to_thread(update)
+            return UserProfile.from_user(user) if user is not None else None
+        async with AsyncSessionLocal() as db:
+            user = await async_crud.set_user_opt_in(db, key, opt_in)
+            return UserProfile.from_user(user) if user is not None else None
+
+
+# Global instance
+user_cache = UserCache(
+    max_size=settings.user_cache_size,
+    ttl=settings.user_cache_ttl,
+    negative_ttl=settings.user_cache_negative_ttl
+)
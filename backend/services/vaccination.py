@@ -1,12 +1,184 @@
-def get_schedule(age):
-    """Get vaccination schedule for given age"""
-    # Dummy implementation - replace with actual schedule
-    schedules = {
-        0: ["BCG", "OPV-0", "Hepatitis B-1"],
-        6: ["DPT-1", "OPV-1", "Hepatitis B-2"],
-        10: ["DPT-2", "OPV-2"],
-        14: ["DPT-3", "OPV-3", "Hepatitis B-3"],
-        36: ["MMR"],
-        60: ["DPT Booster", "OPV Booster"]
-    }
-    return schedules.get(age, [])
\ No newline at end of file
+"""
+Childhood immunization schedule (India's Universal Immunization Programme)
+
+Each dose is an age interval in days: from when it is first due, through the
+end of the recommended window, to the oldest age it may still be given. The
+doses are kept sorted by start age, so "what is due or overdue at age X" is a
+bisection plus a short scan of the doses that have started. Cohort mode
+computes the due dates of every dose for a whole array of birth dates at once
+with NumPy, producing rows for crud.create_vaccination_reminders.
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+DAYS = {"days": 1, "weeks": 7, "months": 30.4375, "years": 365.25}
+
+
+@dataclass(frozen=True)
+class Dose:
+    """One vaccine dose; ages in days from birth"""
+    vaccine: str
+    start: float  # first due
+    due_by: float  # end of the recommended window; overdue after this
+    max_age: float  # not given after this age
+    description: str = ""
+
+    def status(self, age_days: float) -> str:
+        if age_days < self.start:
+            return "upcoming"
+        if age_days <= self.due_by:
+            return "due"
+        if age_days <= self.max_age:
+            return "overdue"
+        return "missed"
+
+
+# The same day counts as age conversions, so an age of exactly 12 months is the end of a 9-12 month window
+W, M, Y = DAYS["weeks"], DAYS["months"], DAYS["years"]
+
+NATIONAL_SCHEDULE = [
+    Dose("BCG", 0, 14, 1 * Y, "Tuberculosis"),
+    Dose("OPV-0", 0, 15, 15, "Oral polio, birth dose"),
+    Dose("Hepatitis B birth dose", 0, 1, 1, "Hepatitis B, within 24 hours of birth"),
+    Dose("OPV-1", 6 * W, 8 * W, 5 * Y, "Oral polio"),
+    Dose("Pentavalent-1", 6 * W, 8 * W, 1 * Y, "Diphtheria, pertussis, tetanus, hepatitis B, Hib"),
+    Dose("Rotavirus-1", 6 * W, 8 * W, 1 * Y, "Rotavirus diarrhoea"),
+    Dose("fIPV-1", 6 * W, 8 * W, 1 * Y, "Inactivated polio"),
+    Dose("PCV-1", 6 * W, 8 * W, 1 * Y, "Pneumococcal pneumonia"),
+    Dose("OPV-2", 10 * W, 12 * W, 5 * Y, "Oral polio"),
+    Dose("Pentavalent-2", 10 * W, 12 * W, 1 * Y, "Diphtheria, pertussis, tetanus, hepatitis B, Hib"),
+    Dose("Rotavirus-2", 10 * W, 12 * W, 1 * Y, "Rotavirus diarrhoea"),
+    Dose("OPV-3", 14 * W, 16 * W, 5 * Y, "Oral polio"),
+    Dose("Pentavalent-3", 14 * W, 16 * W, 1 * Y, "Diphtheria, pertussis, tetanus, hepatitis B, Hib"),
+    Dose("Rotavirus-3", 14 * W, 16 * W, 1 * Y, "Rotavirus diarrhoea"),
+    Dose("fIPV-2", 14 * W, 16 * W, 1 * Y, "Inactivated polio"),
+    Dose("PCV-2", 14 * W, 16 * W, 1 * Y, "Pneumococcal pneumonia"),
+    Dose("MR-1", 9 * M, 12 * M, 5 * Y, "Measles, rubella"),
+    Dose("JE-1", 9 * M, 12 * M, 15 * Y, "Japanese encephalitis (endemic districts)"),
+    Dose("PCV-Booster", 9 * M, 12 * M, 2 * Y, "Pneumococcal pneumonia"),
+    Dose("fIPV-3", 9 * M, 12 * M, 1 * Y, "Inactivated polio"),
+    Dose("Vitamin A-1", 9 * M, 12 * M, 5 * Y, "Vitamin A supplement"),
+    Dose("MR-2", 16 * M, 24 * M, 5 * Y, "Measles, rubella"),
+    Dose("JE-2", 16 * M, 24 * M, 15 * Y, "Japanese encephalitis (endemic districts)"),
+    Dose("DPT-Booster-1", 16 * M, 24 * M, 7 * Y, "Diphtheria, pertussis, tetanus"),
+    Dose("OPV-Booster", 16 * M, 24 * M, 5 * Y, "Oral polio"),
+    Dose("DPT-Booster-2", 5 * Y, 6 * Y, 7 * Y, "Diphtheria, pertussis, tetanus"),
+    Dose("Td-1", 10 * Y, 10 * Y + 6 * M, 16 * Y, "Tetanus, adult diphtheria"),
+    Dose("Td-2", 16 * Y, 16 * Y + 6 * M, 18 * Y, "Tetanus, adult diphtheria"),
+]
+
+
+class ScheduleIndex:
+    """Doses sorted by start age, with their ages as NumPy arrays for cohort queries"""
+
+    def __init__(self, doses: Sequence[Dose]):
+        self.doses = sorted(doses, key=lambda dose: (dose.start, dose.vaccine))
+        self.starts = [dose.start for dose in self.doses]
+        # Whole days for date arithmetic: a window covers every day any part of it falls on
+        self._start_days = np.floor(self.starts).astype("timedelta64[D]")
+        self._due_by_days = np.ceil([dose.due_by for dose in self.doses]).astype("timedelta64[D]")
+        self._max_age_days = np.ceil([dose.max_age for dose in self.doses]).astype("timedelta64[D]")
+        self._names = np.array([dose.vaccine for dose in self.doses])
+
+    def at_age(self, age_days: float, include_overdue: bool = True) -> List[Dose]:
+        """Doses due (and, optionally, overdue but still allowed) at an age in days"""
+        started = bisect_right(self.starts, age_days)
+        statuses = ("due", "overdue") if include_overdue else ("due",)
+        return [dose for dose in self.doses[:started] if dose.status(age_days) in statuses]
+
+    def upcoming(self, age_days: float, limit: Optional[int] = None) -> List[Dose]:
+        """Doses not yet due, soonest first"""
+        started = bisect_right(self.starts, age_days)
+        return self.doses[started:started + limit if limit else None]
+
+    def cohort_due_dates(self, birth_dates: Union[Sequence, np.ndarray], today: Optional[date] = None,
+                         horizon_days: Optional[int] = None, include_overdue: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Due dates of every dose for a cohort, vectorized over children x doses
+
+        Args:
+            birth_dates: Array-like of dates (anything np.datetime64 accepts)
+            today: Reference date (default: today)
+            horizon_days: Only doses falling due within this many days of today
+            include_overdue: Also return doses past their window that may still be given
+
+        Returns:
+            Parallel arrays: "child" (index into birth_dates), "dose" (index into
+            self.doses), "vaccine", "due_date" (datetime64[D]) and "overdue" (bool),
+            ordered by child then due date
+        """
+        births = np.asarray(birth_dates, dtype="datetime64[D]")
+        today = np.datetime64(today or date.today(), "D")
+        due = births[:, None] + self._start_days[None, :]
+        due_by = births[:, None] + self._due_by_days[None, :]
+        last = births[:, None] + self._max_age_days[None, :]
+
+        upcoming_or_due = due_by >= today
+        if horizon_days is not None:
+            upcoming_or_due &= due <= today + np.timedelta64(horizon_days, "D")
+        overdue = (due_by < today) & (last >= today)
+        selected = upcoming_or_due | overdue if include_overdue else upcoming_or_due
+
+        child, dose = np.nonzero(selected)
+        return {
+            "child": child,
+            "dose": dose,
+            "vaccine": self._names[dose],
+            "due_date": due[child, dose],
+            "overdue": overdue[child, dose],
+        }
+
+    def reminder_rows(self, user_ids: Sequence[int], birth_dates: Union[Sequence, np.ndarray],
+                      today: Optional[date] = None, horizon_days: Optional[int] = None,
+                      include_overdue: bool = False) -> Iterator[dict]:
+        """Reminder rows for crud.create_vaccination_reminders; overdue doses are due today"""
+        user_ids = np.asarray(user_ids)
+        births = np.asarray(birth_dates, dtype="datetime64[D]")
+        today = np.datetime64(today or date.today(), "D")
+        result = self.cohort_due_dates(births, today, horizon_days, include_overdue)
+        due_dates = np.where(result["overdue"], today, result["due_date"])
+        ages = (due_dates - births[result["child"]]).astype(int) / DAYS["months"]
+        for user_id, age, vaccine, due_date in zip(user_ids[result["child"]].tolist(), ages.tolist(),
+                                                   result["vaccine"].tolist(), due_dates.tolist()):
+            yield {
+                "user_id": user_id,
+                "child_age": round(age, 1),  # months at the due date
+                "vaccine_name": vaccine,
+                "due_date": datetime.combine(due_date, datetime.min.time())
+            }
+
+
+# Global instance
+schedule_index = ScheduleIndex(NATIONAL_SCHEDULE)
+
+
+def get_schedule(age: float, unit: str = "weeks", include_overdue: bool = False) -> List[str]:
+    """Get vaccination schedule for given age: vaccines due (or overdue) at that age"""
+    return [dose.vaccine for dose in schedule_index.at_age(age * DAYS[unit], include_overdue)]
+
+
+def get_schedule_details(age: float, unit: str = "weeks") -> Dict[str, List[dict]]:
+    """Due, overdue and next upcoming doses at an age, with descriptions"""
+    age_days = age * DAYS[unit]
+    result = {"due": [], "overdue": [], "upcoming": []}
+    for dose in schedule_index.at_age(age_days):
+        result[dose.status(age_days)].append({"name": dose.vaccine, "description": dose.description})
+    upcoming = schedule_index.upcoming(age_days)
+    if upcoming:
+        next_start = upcoming[0].start
+        result["upcoming"] = [
+            {"name": dose.vaccine, "description": dose.description, "in_days": round(dose.start - age_days)}
+            for dose in upcoming if dose.start == next_start
+        ]
+    return result
+
+
+def cohort_reminders(user_ids: Iterable[int], birth_dates: Iterable, horizon_days: Optional[int] = None,
+                     today: Optional[date] = None, include_overdue: bool = False) -> Iterator[dict]:
+    """Reminder rows for a cohort of children (one user per child), ready for bulk insert"""
+    return schedule_index.reminder_rows(list(user_ids), list(birth_dates), today, horizon_days, include_overdue)
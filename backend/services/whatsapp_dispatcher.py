@@ -0,0 +1,238 @@
+"""
+Outbound WhatsApp dispatcher
+
+Queues messages for the Graph API and sends them over one pooled HTTP client,
+paced to the account's throughput limit, its messaging-tier limit on
+business-initiated recipients, and a per-recipient rate. Transient failures
+(429, 5xx, and connection failures before the request went out) are retried
+with exponential backoff, and the final outcome is recorded on the related
+Alert row.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from prometheus_client import Counter, Histogram
+
+from ..config import settings
+from ..utils.rate_limit import KeyedTokenBuckets, TokenBucket
+from . import background
+from .delivery_status import delivery_status_buffer
+from .worker_pool import Priority, WorkerPool
+
+logger = logging.getLogger(__name__)
+
+SENDS = Counter(
+    "health_chatbot_whatsapp_sends_total",
+    "Outbound WhatsApp messages by final outcome",
+    ["outcome"],
+)
+RETRIES = Counter(
+    "health_chatbot_whatsapp_send_retries_total",
+    "Outbound WhatsApp send attempts that were retried",
+    ["reason"],
+)
+SEND_SECONDS = Histogram(
+    "health_chatbot_whatsapp_send_seconds",
+    "Time from enqueue to final outcome of an outbound WhatsApp message",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Transport errors raised before the request was sent; anything later (read timeouts, dropped
+# connections) may follow a message the API already accepted, so retrying could send it twice
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+TIER_WINDOW_SECONDS = 24 * 3600
+
+
+class TierLimitExceeded(Exception):
+    """The account's 24h business-initiated recipient limit has been reached"""
+
+
+class WhatsAppDispatcher:
+    """Paced, retrying sender for the WhatsApp Business (Graph) API"""
+
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+        self.account_bucket = TokenBucket(settings.whatsapp_messages_per_second, burst=settings.whatsapp_messages_per_second)
+        self.recipient_buckets = KeyedTokenBuckets(settings.whatsapp_per_recipient_rate, burst=settings.whatsapp_per_recipient_burst)
+        # Business-initiated recipients in the rolling 24h window (recipient -> first send time)
+        self._tier_recipients: Dict[str, float] = {}
+        self.pool = WorkerPool(
+            "whatsapp_outbound",
+            self._deliver,
+            concurrency=settings.whatsapp_send_concurrency,
+            max_queue=settings.whatsapp_send_queue_size,
+            reserved_high=settings.whatsapp_reserved_emergency_workers
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.whatsapp_phone_number_id and settings.whatsapp_token)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            self.client = httpx.AsyncClient(
+                base_url=settings.whatsapp_api_base_url,
+                headers={"Authorization": f"Bearer {settings.whatsapp_token}"},
+                timeout=settings.whatsapp_send_timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.whatsapp_send_concurrency,
+                    max_keepalive_connections=settings.whatsapp_send_concurrency
+                )
+            )
+        return self.client
+
+    def enqueue(self, to_number: str, message: str, alert_id: Optional[int] = None,
+                business_initiated: bool = False, priority: Optional[Priority] = None) -> "asyncio.Future[bool]":
+        """
+        Queue a message for delivery
+
+        Args:
+            to_number: Recipient in international format
+            message: Text body
+            alert_id: Alert row to update with the final status, if any
+            business_initiated: True for alerts/campaigns (counted against the messaging tier),
+                False for replies inside a user-initiated conversation
+            priority: Lane; defaults to LOW for business-initiated sends and NORMAL for replies
+
+        Returns:
+            Future resolving to True once sent, False if it finally failed or was dropped
+        """
+        if priority is None:
+            priority = Priority.LOW if business_initiated else Priority.NORMAL
+        future = asyncio.get_running_loop().create_future()
+        job = {
+            "to": to_number,
+            "message": message,
+            "alert_id": alert_id,
+            "business_initiated": business_initiated,
+            "priority": priority,
+            "future": future,
+            "enqueued_at": time.perf_counter()
+        }
+        # Keyed by recipient so one person's messages arrive in order
+        if not self.pool.submit(job, key=to_number, priority=priority):
+            self._finish_and_record(job, "dropped")
+        return future
+
+    async def send(self, to_number: str, message: str, alert_id: Optional[int] = None,
+                   business_initiated: bool = False, priority: Optional[Priority] = None) -> bool:
+        """Queue a message and wait for its final outcome"""
+        if not self.configured:
+            logger.warning("WhatsApp credentials not configured")
+            return False
+        return await self.enqueue(to_number, message, alert_id, business_initiated, priority)
+
+    def _reserve_tier_slot(self, to_number: str):
+        """Count a business-initiated recipient against the rolling 24h tier limit"""
+        if settings.whatsapp_tier_limit <= 0:
+            return
+        now = time.time()
+        if to_number in self._tier_recipients and now - self._tier_recipients[to_number] < TIER_WINDOW_SECONDS:
+            return
+        # Dicts keep insertion order, so expired recipients are at the front
+        for recipient, first_sent in list(self._tier_recipients.items()):
+            if now - first_sent < TIER_WINDOW_SECONDS:
+                break
+            del self._tier_recipients[recipient]
+        if len(self._tier_recipients) >= settings.whatsapp_tier_limit:
+            raise TierLimitExceeded(f"{settings.whatsapp_tier_limit} business-initiated recipients in 24h")
+        self._tier_recipients.pop(to_number, None)
+        self._tier_recipients[to_number] = now
+
+    async def _deliver(self, job: Dict[str, Any]):
+        """Worker-side send; always resolves the job's future"""
+        try:
+            await self._send_with_retries(job)
+        except Exception as e:
+            logger.error(f"Error sending WhatsApp message: {e}")
+            self._finish_and_record(job, "failed")
+
+    async def _send_with_retries(self, job: Dict[str, Any]):
+        """Paced send with exponential backoff on transient failures"""
+        try:
+            if job["business_initiated"]:
+                self._reserve_tier_slot(job["to"])
+        except TierLimitExceeded as e:
+            logger.warning(f"WhatsApp message to {job['to']} not sent: {e}")
+            self._finish_and_record(job, "tier_limited")
+            return
+
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": job["to"],
+            "text": {"body": job["message"]}
+        }
+        url = f"/{settings.whatsapp_phone_number_id}/messages"
+
+        for attempt in range(1, settings.whatsapp_send_max_attempts + 1):
+            await self.recipient_buckets.acquire(job["to"])
+            if job["priority"] == Priority.HIGH:
+                # Emergencies don't queue behind bulk sends for account throughput; bulk repays the debt
+                self.account_bucket.force_acquire()
+            else:
+                await self.account_bucket.acquire()
+
+            retry_after = None
+            try:
+                response = await self._get_client().post(url, json=payload)
+            except UNSENT_ERRORS as e:
+                reason = type(e).__name__
+                logger.warning(f"WhatsApp send to {job['to']} failed (attempt {attempt}): {e}")
+            except httpx.TransportError as e:
+                logger.error(f"WhatsApp send to {job['to']} failed after the request went out, not retrying: {e}")
+                self._finish_and_record(job, "failed")
+                return
+            else:
+                if response.status_code == 200:
+                    messages = response.json().get("messages") or [{}]
+                    logger.info(f"WhatsApp message sent successfully to {job['to']}")
+                    self._finish_and_record(job, "sent", messages[0].get("id"))
+                    return
+                if response.status_code not in RETRYABLE_STATUS:
+                    logger.error(f"Failed to send WhatsApp message: {response.status_code} - {response.text}")
+                    self._finish_and_record(job, "failed")
+                    return
+                reason = str(response.status_code)
+                retry_after = response.headers.get("Retry-After")
+                logger.warning(f"WhatsApp send to {job['to']} got {response.status_code} (attempt {attempt})")
+
+            if attempt == settings.whatsapp_send_max_attempts:
+                break
+            RETRIES.labels(reason=reason).inc()
+            delay = settings.whatsapp_send_backoff * (2 ** (attempt - 1))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(min(delay, 60.0) * random.uniform(0.8, 1.2))
+
+        self._finish_and_record(job, "failed")
+
+    def _finish(self, job: Dict[str, Any], outcome: str):
+        SENDS.labels(outcome=outcome).inc()
+        SEND_SECONDS.observe(time.perf_counter() - job["enqueued_at"])
+        if not job["future"].done():
+            job["future"].set_result(outcome == "sent")
+
+    def _finish_and_record(self, job: Dict[str, Any], outcome: str, provider_message_id: Optional[str] = None):
+        self._finish(job, outcome)
+        if job["alert_id"] is not None:
+            status = "sent" if outcome == "sent" else "failed"
+            delivery_status_buffer.record_alert(job["alert_id"], status, provider_message_id)
+
+    def start(self):
+        self.pool.start()
+
+    async def stop(self):
+        await self.pool.stop()
+        if self.client is not None:
+            await self.client.aclose()
+
+
+# Global instance
+whatsapp_dispatcher = WhatsAppDispatcher()
+background.register("whatsapp dispatcher", start=whatsapp_dispatcher.start, stop=whatsapp_dispatcher.stop)
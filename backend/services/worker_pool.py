@@ -0,0 +1,192 @@
+"""
+In-process worker pool with bounded priority lanes
+
+Used to acknowledge webhooks immediately and do the slow work (intent
+detection, Rasa, provider sends) in the background with capped concurrency.
+Items submitted with a key (e.g. the sender's number) are handled strictly in
+submission order for that key, while different keys run concurrently.
+
+Each item goes to a priority lane. Shared workers always take the highest
+non-empty lane, and a pool can reserve extra workers that only serve the high
+lane, so emergency traffic never waits behind a bulk campaign.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lanes in descending priority; lower value is served first"""
+    HIGH = 0    # emergencies
+    NORMAL = 1  # conversational replies
+    LOW = 2     # campaigns and other bulk sends
+
+
+QUEUE_DEPTH = Gauge(
+    "health_chatbot_worker_queue_depth",
+    "Items waiting in a worker pool lane",
+    ["pool", "lane"],
+)
+QUEUE_WAIT = Histogram(
+    "health_chatbot_worker_queue_wait_seconds",
+    "Time items spend queued before a worker picks them up",
+    ["pool", "lane"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+PROCESSING_SECONDS = Histogram(
+    "health_chatbot_worker_processing_seconds",
+    "Time spent handling one item",
+    ["pool", "lane"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+PROCESSED = Counter(
+    "health_chatbot_worker_processed_total",
+    "Items handled by a worker pool",
+    ["pool", "lane", "outcome"],
+)
+DROPPED = Counter(
+    "health_chatbot_worker_dropped_total",
+    "Items rejected because the pool lane was full",
+    ["pool", "lane"],
+)
+
+# (enqueued_at, lane, key, item)
+_Entry = Tuple[float, Priority, Optional[Hashable], Any]
+
+
+class WorkerPool:
+    """Fixed number of asyncio workers draining bounded priority lanes"""
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[None]], concurrency: int = 4,
+                 max_queue: int = 1000, reserved_high: int = 0):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.reserved_high = reserved_high
+        self.max_queue = max_queue  # per lane
+        self._lanes: Dict[Priority, Deque[_Entry]] = {lane: deque() for lane in Priority}
+        self._work_available = asyncio.Event()
+        self._high_available = asyncio.Event()
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+        self._unfinished = 0
+        self._workers: List[asyncio.Task] = []
+        # key -> items waiting behind the one a worker is currently handling for that key
+        self._active: Dict[Hashable, Deque[_Entry]] = {}
+        self._backlogged: Dict[Priority, int] = {lane: 0 for lane in Priority}
+        for lane in Priority:
+            QUEUE_DEPTH.labels(pool=name, lane=lane.name.lower()).set_function(lambda lane=lane: self.depth(lane))
+
+    def depth(self, lane: Optional[Priority] = None) -> int:
+        """Items not yet started in a lane (or all lanes), including those waiting behind a busy key"""
+        lanes = list(Priority) if lane is None else [lane]
+        return sum(len(self._lanes[item]) + self._backlogged[item] for item in lanes)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def submit(self, item: Any, key: Optional[Hashable] = None, priority: Priority = Priority.NORMAL) -> bool:
+        """Enqueue an item without waiting; returns False (and counts a drop) when its lane is full.
+
+        Items sharing a key are never handled concurrently and keep their order.
+        """
+        if self.depth(priority) >= self.max_queue:
+            DROPPED.labels(pool=self.name, lane=priority.name.lower()).inc()
+            logger.warning(f"Worker pool {self.name} {priority.name} lane full ({self.max_queue}), dropping item")
+            return False
+        self._lanes[priority].append((time.perf_counter(), priority, key, item))
+        self._unfinished += 1
+        self._all_done.clear()
+        self._work_available.set()
+        if priority == Priority.HIGH:
+            self._high_available.set()
+        return True
+
+    def _take(self, lanes: Sequence[Priority]) -> Optional[_Entry]:
+        for lane in lanes:
+            if self._lanes[lane]:
+                return self._lanes[lane].popleft()
+        return None
+
+    async def _run(self, entry: _Entry):
+        enqueued_at, lane, _, item = entry
+        lane_name = lane.name.lower()
+        started = time.perf_counter()
+        QUEUE_WAIT.labels(pool=self.name, lane=lane_name).observe(started - enqueued_at)
+        try:
+            await self.handler(item)
+            PROCESSED.labels(pool=self.name, lane=lane_name, outcome="ok").inc()
+        except Exception as e:
+            PROCESSED.labels(pool=self.name, lane=lane_name, outcome="error").inc()
+            logger.error(f"Worker pool {self.name} failed to handle item: {e}")
+        finally:
+            PROCESSING_SECONDS.labels(pool=self.name, lane=lane_name).observe(time.perf_counter() - started)
+            self._unfinished -= 1
+            if self._unfinished == 0:
+                self._all_done.set()
+
+    async def _worker(self, lanes: Sequence[Priority], available: asyncio.Event):
+        while True:
+            entry = self._take(lanes)
+            if entry is None:
+                # No await between the empty check and clear(), so no wakeup can be lost
+                available.clear()
+                await available.wait()
+                continue
+
+            key = entry[2]
+            if key is not None:
+                backlog = self._active.get(key)
+                if backlog is not None:
+                    # Another worker holds this key; it runs this item next, in order
+                    backlog.append(entry)
+                    self._backlogged[entry[1]] += 1
+                    continue
+                backlog = self._active[key] = deque()
+            try:
+                await self._run(entry)
+                while key is not None and backlog:
+                    queued = backlog.popleft()
+                    self._backlogged[queued[1]] -= 1
+                    await self._run(queued)
+            finally:
+                if key is not None:
+                    del self._active[key]
+
+    def start(self):
+        """Spawn the shared and reserved high-priority workers (idempotent)"""
+        if self.running:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(list(Priority), self._work_available))
+            for _ in range(self.concurrency)
+        ] + [
+            asyncio.create_task(self._worker([Priority.HIGH], self._high_available))
+            for _ in range(self.reserved_high)
+        ]
+
+    async def join(self):
+        """Wait until every submitted item, including per-key backlogs, has been handled"""
+        await self._all_done.wait()
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Let queued items finish (up to drain_timeout seconds), then cancel the workers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Worker pool {self.name} stopped with {self.depth()} items still queued")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
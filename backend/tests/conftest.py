@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# A throwaway SQLite database, set before any backend module reads the settings
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("DELIVERY_CHECKPOINT_DIR", os.path.join(tempfile.mkdtemp(), "scheduled_deliveries"))
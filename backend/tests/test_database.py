@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_url_without_an_async_driver_falls_back_to_sync_sessions(tmp_path):
+    # pysqlite has no async counterpart mapped; importing the module must not fail
+    env = dict(os.environ, DATABASE_URL=f"sqlite+pysqlite:///{tmp_path / 'sync.db'}")
+    result = subprocess.run(
+        [sys.executable, "-c", "from backend.db import database; print(database.async_engine is None)"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().endswith("True")
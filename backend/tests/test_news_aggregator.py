@@ -0,0 +1,22 @@
+from backend.services.news_aggregator import HealthNewsAggregator
+
+TITLE = "Kerala reports rising dengue cases across Ernakulam Kozhikode Thrissur districts monsoon health officials warn"
+
+
+def article(title, url, published_at="2026-10-01T08:00:00Z"):
+    return {"title": title, "description": "", "url": url, "published_at": published_at}
+
+
+def test_near_duplicate_with_words_never_seen_before_is_rejected():
+    news = HealthNewsAggregator()
+    assert news.add(article(TITLE, "https://example.com/a"), "in")
+    # Two new words on a 14-word title: Jaccard 14/16 = 0.875, above the threshold
+    assert not news.add(article(TITLE + " hospitals overwhelmed", "https://example.org/b"), "in")
+    assert len(news) == 1
+
+
+def test_different_story_is_kept():
+    news = HealthNewsAggregator()
+    assert news.add(article(TITLE, "https://example.com/a"), "in")
+    assert news.add(article("Delhi air quality worsens ahead of winter, doctors advise masks", "https://example.com/c"), "in")
+    assert len(news) == 2
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from backend.db import crud, models
+from backend.db.database import SessionLocal
+from backend.db.migrations import upgrade_database
+from backend.services.delivery_scheduler import delivery_scheduler
+from backend.services.reminder_scheduler import ReminderScheduler
+
+
+@pytest.fixture
+def db(monkeypatch):
+    upgrade_database()
+    # Send whatever the time of day
+    monkeypatch.setattr(delivery_scheduler, "quiet_start", delivery_scheduler.quiet_end)
+    session = SessionLocal()
+    for model in (models.VaccinationReminder, models.Alert, models.User):
+        session.execute(delete(model))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_reminder(db, phone, opt_in=True) -> int:
+    user = crud.create_user(db, phone=phone, language="en", location="Delhi")
+    user.opt_in = opt_in
+    db.commit()
+    crud.create_vaccination_reminders(db, [{
+        "user_id": user.id, "child_age": 9.0, "vaccine_name": "MR-1", "due_date": datetime.utcnow() - timedelta(days=1)
+    }])
+    return db.scalar(select(models.VaccinationReminder.id).where(models.VaccinationReminder.user_id == user.id))
+
+
+def run_once(outcome: bool) -> int:
+    async def sender(phone, text, alert_id):
+        return outcome
+
+    # A zero lease makes a failed reminder claimable again straight away
+    return asyncio.run(ReminderScheduler(worker_id="test", lease_seconds=0, sender=sender).run_once())
+
+
+def test_retried_reminder_reuses_its_alert(db):
+    reminder_id = add_reminder(db, "+919000000001")
+    assert run_once(False) == 1
+    assert run_once(False) == 1
+    assert run_once(True) == 1
+
+    reminder = db.get(models.VaccinationReminder, reminder_id)
+    assert reminder.reminded_at is not None
+    assert db.scalar(select(func.count()).select_from(models.Alert)) == 1
+    assert reminder.alert_id == db.scalar(select(models.Alert.id))
+    assert run_once(True) == 0
+
+
+def test_opted_out_reminder_is_skipped_not_sent(db):
+    reminder_id = add_reminder(db, "+919000000002", opt_in=False)
+    assert run_once(True) == 1
+
+    reminder = db.get(models.VaccinationReminder, reminder_id)
+    assert reminder.skipped_at is not None
+    assert reminder.reminded_at is None
+    assert db.scalar(select(func.count()).select_from(models.Alert)) == 0
+    # Closed for good: never claimed again
+    assert run_once(True) == 0
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.routers import sms
+from backend.services.delivery_scheduler import delivery_scheduler
+from backend.services.sms_dispatcher import SMSDispatchError
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "twilio_account_sid", "AC123")
+    monkeypatch.setattr(settings, "twilio_auth_token", "token")
+    monkeypatch.setattr(settings, "sms_max_segments", 2)
+    sent = []
+
+    async def send(to, message, priority=None, alert_id=None):
+        sent.append(message)
+        return "SM123"
+
+    monkeypatch.setattr(sms.sms_dispatcher, "send", send)
+    app = FastAPI()
+    app.include_router(sms.router, prefix="/api/sms")
+    test_client = TestClient(app)
+    test_client.sent = sent
+    return test_client
+
+
+def test_admin_body_is_sent_as_written(client):
+    body = "**Clinic closed** tomorrow 🙏"
+    response = client.post("/api/sms/send-sms", json={"to": "+919000000001", "message": body})
+    assert response.status_code == 200
+    assert client.sent == [body]
+    assert response.json()["segments"] == 1
+
+
+def test_admin_body_over_the_segment_budget_is_rejected(client):
+    response = client.post("/api/sms/send-sms", json={"to": "+919000000001", "message": "x" * 400})
+    assert response.status_code == 400
+    assert client.sent == []
+
+
+def test_held_alert_failure_is_logged_and_recorded(monkeypatch, caplog):
+    recorded = []
+    monkeypatch.setattr(type(sms.sms_dispatcher), "configured", property(lambda self: True))
+    monkeypatch.setattr(delivery_scheduler, "in_quiet_hours", lambda local: True)
+    monkeypatch.setattr(sms, "_create_alert", lambda user_id, alert_type, message: 42)
+    monkeypatch.setattr(sms.delivery_status_buffer, "record_alert", lambda *args: recorded.append(args))
+
+    async def get_profile(phone):
+        return SimpleNamespace(id=7, timezone="Asia/Kolkata")
+
+    monkeypatch.setattr(sms.user_cache, "get", get_profile)
+
+    async def scenario():
+        result = await sms.send_health_alert("+919000000001", alert_type="general")
+        # The held delivery comes due and the dispatcher fails it
+        key, waiter = next(iter(delivery_scheduler._waiters.items()))
+        delivery_scheduler.wheel.cancel(key)
+        waiter.set_exception(SMSDispatchError("Twilio rejected the number"))
+        await asyncio.sleep(0)
+        delivery_scheduler._waiters.clear()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "held" and result["alert_sent"] is False
+    assert result["scheduled_for"]
+    assert recorded == [(42, "failed")]
+    assert "Held health alert to +919000000001 failed" in caplog.text
@@ -0,0 +1,51 @@
+import hashlib
+import hmac
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.config import settings
+from backend.routers import whatsapp
+
+SECRET = "test-app-secret"
+STATUS_CALLBACK = json.dumps({
+    "object": "whatsapp_business_account",
+    "entry": [{"id": "WABA", "changes": [{"field": "messages", "value": {
+        "statuses": [{"id": "wamid.out1", "status": "failed", "recipient_id": "919000000000"}]
+    }}]}]
+}).encode()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "whatsapp_app_secret", SECRET)
+    recorded = []
+    monkeypatch.setattr(whatsapp.delivery_status_buffer, "record_callback",
+                        lambda provider, message_id, status: recorded.append((provider, message_id, status)))
+    app = FastAPI()
+    app.include_router(whatsapp.router, prefix="/api/whatsapp")
+    test_client = TestClient(app)
+    test_client.recorded = recorded
+    return test_client
+
+
+def post(client, body, signature):
+    headers = {"Content-Type": "application/json"}
+    if signature is not None:
+        headers["X-Hub-Signature-256"] = signature
+    return client.post("/api/whatsapp/webhook", content=body, headers=headers)
+
+
+def test_forged_status_callback_is_rejected(client):
+    forged = "sha256=" + hmac.new(b"not-the-secret", STATUS_CALLBACK, hashlib.sha256).hexdigest()
+    assert post(client, STATUS_CALLBACK, forged).status_code == 403
+    assert post(client, STATUS_CALLBACK, None).status_code == 403
+    assert client.recorded == []
+
+
+def test_signed_status_callback_is_recorded(client):
+    signature = "sha256=" + hmac.new(SECRET.encode(), STATUS_CALLBACK, hashlib.sha256).hexdigest()
+    assert post(client, STATUS_CALLBACK, signature).status_code == 200
+    assert client.recorded == [("whatsapp", "wamid.out1", "failed")]
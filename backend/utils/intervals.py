@@ -0,0 +1,61 @@
+"""
+Static interval index: which closed intervals overlap a query range
+
+Intervals are sorted by start and laid out as an implicit balanced binary
+tree (the middle of each slice is its root), each node keeping the largest
+end in its subtree. A query descends only into subtrees that start no later
+than the range ends and end no earlier than it starts, so it costs
+O(log n + matches) instead of a scan.
+"""
+
+from bisect import bisect_left
+from typing import Any, Generic, Iterable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class IntervalIndex(Generic[T]):
+    """Immutable set of (start, end, item) intervals, ends inclusive; build a new one to change it"""
+
+    def __init__(self, intervals: Iterable[Tuple[Any, Any, T]]):
+        rows = sorted(intervals, key=lambda row: row[0])
+        self.starts = [start for start, _, _ in rows]
+        self.ends = [end for _, end, _ in rows]
+        self.items: List[T] = [item for _, _, item in rows]
+        self._max_end = list(self.ends)
+        self._build(0, len(rows))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _build(self, lo: int, hi: int):
+        """Fill in the largest end of the subtree over [lo, hi) and return it"""
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > self._max_end[mid]:
+                self._max_end[mid] = child
+        return self._max_end[mid]
+
+    def overlapping(self, start: Any, end: Any) -> List[T]:
+        """Items whose interval overlaps [start, end], in start order"""
+        found = []
+        stack = [(0, len(self.items))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] < start:
+                continue  # everything below here ended before the range
+            stack.append((lo, mid))
+            if self.starts[mid] <= end:
+                if self.ends[mid] >= start:
+                    found.append(mid)
+                stack.append((mid + 1, hi))
+        return [self.items[i] for i in sorted(found)]
+
+    def starting_from(self, start: Any) -> List[T]:
+        """Items whose interval starts on or after start, in start order"""
+        return self.items[bisect_left(self.starts, start):]
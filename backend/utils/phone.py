@@ -0,0 +1,42 @@
+"""
+Phone number normalisation to E.164 (+<country code><number>)
+
+WhatsApp webhooks send "919876543210", Twilio sends "+919876543210" (or
+"whatsapp:+919876543210") and people type "098765 43210"; all of them
+normalise to "+919876543210", which is how users.phone is stored.
+"""
+
+import re
+from typing import List, Optional
+
+
+def normalise_phone(number: Optional[str], default_country_code: str = "91") -> Optional[str]:
+    """E.164 form of a phone number; ten-digit national numbers get default_country_code"""
+    if not number:
+        return None
+    number = str(number).strip()
+    if number.lower().startswith("whatsapp:"):
+        number = number[len("whatsapp:"):].strip()
+    digits = re.sub(r"\D", "", number)
+    if not digits:
+        return None
+    if number.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if len(digits) == 11 and digits.startswith("0"):
+        digits = digits[1:]  # national trunk prefix
+    if len(digits) == 10:
+        return f"+{default_country_code}{digits}"
+    return f"+{digits}"
+
+
+def phone_variants(number: Optional[str], default_country_code: str = "91") -> List[str]:
+    """The E.164 form plus the formats rows written before normalisation may use"""
+    normalised = normalise_phone(number, default_country_code)
+    if normalised is None:
+        return []
+    variants = [normalised, normalised[1:]]
+    if normalised.startswith(f"+{default_country_code}") and len(normalised) == len(default_country_code) + 11:
+        variants.append(normalised[len(default_country_code) + 1:])
+    return variants
@@ -0,0 +1,73 @@
+"""
+Asyncio token buckets for pacing outbound provider traffic
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class TokenBucket:
+    """Allows `rate` operations per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available right now, without waiting"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def force_acquire(self, tokens: float = 1.0):
+        """Take tokens immediately, going into debt if needed; later waiters repay it"""
+        self._refill(time.monotonic())
+        self.tokens -= tokens
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until tokens are available, then take them (FIFO among waiters)"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class KeyedTokenBuckets:
+    """One TokenBucket per key (e.g. recipient), keeping at most `max_keys` recently used buckets"""
+
+    def __init__(self, rate: float, burst: float = 1.0, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def get(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                # The evicted bucket was idle longest and has most likely refilled anyway
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, key: Hashable, tokens: float = 1.0):
+        await self.get(key).acquire(tokens)
@@ -0,0 +1,158 @@
+"""
+GSM 03.38 / UCS-2 SMS encoding helpers
+
+A message is sent as GSM-7 only if every character is in the GSM default
+alphabet or its extension table (extension characters cost two septets);
+anything else forces UCS-2 for the whole message. Concatenated messages
+lose room to the user data header: 160 -> 153 septets per segment for
+GSM-7 and 70 -> 67 UTF-16 code units for UCS-2. Escape sequences and
+surrogate pairs are never split across segments.
+"""
+
+import re
+import unicodedata
+from typing import List, NamedTuple
+
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM7_EXTENSION = frozenset("\f^{}\\[~]|€")
+
+GSM7_SINGLE, GSM7_MULTI = 160, 153
+UCS2_SINGLE, UCS2_MULTI = 70, 67
+
+# Typography that forces UCS-2 but has a GSM-7 equivalent
+_REPLACEMENTS = {
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"',
+    "\u2013": "-", "\u2014": "-", "\u2212": "-",
+    "\u2026": "...", "\u2022": "-", "\u00b7": "-",
+    "\u00a0": " ", "\u202f": " ", "\u200b": "", "\u20b9": "Rs.",
+    "\t": " ",
+}
+
+# Emoji with a meaningful text equivalent; other emoji are dropped
+_EMOJI_TEXT = {
+    "\U0001f6a8": "!",  # police light, used for alerts
+    "\u26a0": "!",      # warning sign
+}
+
+_MARKDOWN = [
+    (re.compile(r"\*\*(.+?)\*\*", re.S), r"\1"),
+    (re.compile(r"__(.+?)__", re.S), r"\1"),
+    (re.compile(r"(?<![\w*])\*(?!\s)([^*\n]+?)\*(?![\w*])"), r"\1"),
+    (re.compile(r"(?<!\w)_(?!\s)([^_\n]+?)_(?!\w)"), r"\1"),
+    (re.compile(r"`([^`\n]+)`"), r"\1"),
+    (re.compile(r"\[([^\]\n]+)\]\((\S+?)\)"), r"\1 \2"),
+    (re.compile(r"^#{1,6}\s+", re.M), ""),
+]
+
+
+class SegmentInfo(NamedTuple):
+    encoding: str  # "GSM-7" or "UCS-2"
+    units: int     # septets (GSM-7) or UTF-16 code units (UCS-2)
+    segments: int
+
+
+def is_gsm7(text: str) -> bool:
+    return all(char in GSM7_BASIC or char in GSM7_EXTENSION for char in text)
+
+
+def _is_emoji(char: str) -> bool:
+    code = ord(char)
+    return (
+        0x1F000 <= code <= 0x1FAFF
+        or 0x2600 <= code <= 0x27BF
+        or code in (0xFE0F, 0x200D, 0x20E3)
+        or (code > 0x2000 and unicodedata.category(char) == "So")
+    )
+
+
+def segment_info(text: str) -> SegmentInfo:
+    """Exact encoding, length and segment count of a message"""
+    if is_gsm7(text):
+        encoding, single, multi = "GSM-7", GSM7_SINGLE, GSM7_MULTI
+        costs = [2 if char in GSM7_EXTENSION else 1 for char in text]
+    else:
+        encoding, single, multi = "UCS-2", UCS2_SINGLE, UCS2_MULTI
+        costs = [2 if ord(char) > 0xFFFF else 1 for char in text]
+
+    units = sum(costs)
+    if units <= single:
+        return SegmentInfo(encoding, units, 1)
+    segments, used = 1, 0
+    for cost in costs:
+        if used + cost > multi:
+            segments += 1
+            used = 0
+        used += cost
+    return SegmentInfo(encoding, units, segments)
+
+
+def strip_markdown(text: str) -> str:
+    """Remove Markdown emphasis, code, headings and link syntax, keeping the text"""
+    for pattern, replacement in _MARKDOWN:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def replace_emoji(text: str, mode: str = "transliterate") -> str:
+    """
+    Handle emoji according to mode:
+        keep          - leave them (the message will be UCS-2)
+        drop          - remove them
+        transliterate - alert emoji become "!", leading bullet emoji become "- ", the rest are removed
+    """
+    if mode == "keep":
+        return text
+    lines = []
+    for line in text.split("\n"):
+        stripped = line.lstrip()
+        indent = line[:len(line) - len(stripped)]
+        lead = ""
+        if mode == "transliterate" and stripped and _is_emoji(stripped[0]) and stripped[0] not in _EMOJI_TEXT:
+            # Emoji used as a list marker
+            lead = "- "
+        chars: List[str] = []
+        for char in stripped:
+            if _is_emoji(char):
+                if mode == "transliterate" and char in _EMOJI_TEXT:
+                    chars.append(_EMOJI_TEXT[char])
+            else:
+                chars.append(char)
+        body = "".join(chars).strip()
+        lines.append(indent + lead + body if body else "")
+    return "\n".join(lines)
+
+
+def compact(text: str) -> str:
+    """GSM-7 friendly typography and tight whitespace: no blank lines, no trailing or repeated spaces"""
+    text = "".join(_REPLACEMENTS.get(char, char) for char in text)
+    text = unicodedata.normalize("NFC", text)
+    lines = [re.sub(r" {2,}", " ", line).rstrip() for line in text.split("\n")]
+    return "\n".join(line for line in lines if line.strip()).strip()
+
+
+def fit_to_segments(body: str, footer: str = "", max_segments: int = 3, ellipsis: str = "...") -> str:
+    """
+    Append the footer, cutting the body at a word boundary if needed so that
+    the whole message fits in max_segments. The footer is always kept.
+    """
+    text = body + footer
+    if max_segments <= 0 or segment_info(text).segments <= max_segments:
+        return text
+
+    # Longest prefix that still fits, found by bisection over the body length
+    low, high = 0, len(body)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if segment_info(body[:middle].rstrip() + ellipsis + footer).segments <= max_segments:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = body[:low]
+    cut = max(prefix.rfind(" "), prefix.rfind("\n"))
+    if cut > low // 2:
+        prefix = prefix[:cut]
+    return prefix.rstrip() + ellipsis + footer
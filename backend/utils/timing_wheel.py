@@ -0,0 +1,120 @@
+"""
+Hierarchical timing wheel: O(1) insert and cancel for very many timers
+
+Level 0 has one slot per tick; each higher level's slot spans a whole
+revolution of the level below (with the default sizes: seconds, minutes,
+hours, days). A timer sits in the lowest level whose range covers it and
+cascades down one level each time the wheel reaches its slot, so advancing
+touches only the slots that come due. Timers beyond the top level's range
+wait in an overflow set that is re-examined once per top-level revolution.
+"""
+
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+class TimingWheel:
+    """Timers keyed by a hashable key, each carrying an item returned when it expires"""
+
+    def __init__(self, start: float, tick: float = 1.0, sizes: Sequence[int] = (60, 60, 24, 64)):
+        self.tick = tick
+        self.sizes = tuple(sizes)
+        # Ticks covered by one slot of each level, and by a whole level
+        self.spans = [1]
+        for size in self.sizes[:-1]:
+            self.spans.append(self.spans[-1] * size)
+        self.ranges = [span * size for span, size in zip(self.spans, self.sizes)]
+        self.now = int(start // tick)
+        self._slots: List[List[Set[Hashable]]] = [[set() for _ in range(size)] for size in self.sizes]
+        self._levels = list(enumerate(zip(self.ranges, self.spans, self.sizes, self._slots)))
+        self._overflow: Set[Hashable] = set()
+        self._ready: List[Hashable] = []
+        # key -> (due tick, item, level, slot); level -1 = overflow, -2 = ready
+        self._timers: Dict[Hashable, Tuple[int, Any, int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def _place(self, key: Hashable, due_tick: int, item: Any):
+        delta = due_tick - self.now
+        if delta <= 0:
+            self._ready.append(key)
+            self._timers[key] = (due_tick, item, -2, 0)
+            return
+        for level, (limit, span, size, slots) in self._levels:
+            if delta < limit:
+                slot = (due_tick // span) % size
+                slots[slot].add(key)
+                self._timers[key] = (due_tick, item, level, slot)
+                return
+        self._overflow.add(key)
+        self._timers[key] = (due_tick, item, -1, 0)
+
+    def due(self, key: Hashable) -> Optional[float]:
+        """When a pending timer expires (rounded up to its tick), or None if there is no such timer"""
+        timer = self._timers.get(key)
+        return timer[0] * self.tick if timer is not None else None
+
+    def insert(self, key: Hashable, due: float, item: Any = None):
+        """Add a timer (replacing any timer with the same key) that expires at time `due`"""
+        if key in self._timers:
+            self.cancel(key)
+        self._place(key, -int(-due // self.tick), item)
+
+    def cancel(self, key: Hashable) -> Optional[Any]:
+        """Remove a timer; returns its item, or None if there was no such timer"""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return None
+        _, item, level, slot = timer
+        if level >= 0:
+            self._slots[level][slot].discard(key)
+        elif level == -1:
+            self._overflow.discard(key)
+        # Keys in _ready are skipped on advance once they are no longer in _timers
+        return item
+
+    def _cascade(self, level: int):
+        slot = (self.now // self.spans[level]) % self.sizes[level]
+        keys, self._slots[level][slot] = self._slots[level][slot], set()
+        for key in keys:
+            due_tick, item, _, _ = self._timers[key]
+            self._place(key, due_tick, item)
+
+    def advance(self, until: float) -> List[Tuple[Hashable, Any]]:
+        """Move the wheel forward to time `until`; returns the (key, item) pairs that expired, in order"""
+        expired = self._drain_ready()
+        target = int(until // self.tick)
+        while self.now < target:
+            self.now += 1
+            if self._overflow and self.now % self.ranges[-1] == 0:
+                keys, self._overflow = self._overflow, set()
+                for key in keys:
+                    due_tick, item, _, _ = self._timers[key]
+                    self._place(key, due_tick, item)
+            # Cascade from the top so timers fall through every level due at this tick
+            for level in range(len(self.sizes) - 1, 0, -1):
+                if self.now % self.spans[level] == 0:
+                    self._cascade(level)
+            slot = self.now % self.sizes[0]
+            keys, self._slots[0][slot] = self._slots[0][slot], set()
+            for key in keys:
+                expired.append((key, self._timers.pop(key)[1]))
+            expired.extend(self._drain_ready())
+        return expired
+
+    def _drain_ready(self) -> List[Tuple[Hashable, Any]]:
+        expired = []
+        ready, self._ready = self._ready, []
+        for key in ready:
+            timer = self._timers.get(key)
+            if timer is not None and timer[2] == -2:
+                expired.append((key, self._timers.pop(key)[1]))
+        return expired
+
+    def items(self) -> Iterator[Tuple[Hashable, float, Any]]:
+        """Every pending (key, due time, item), in no particular order"""
+        for key, (due_tick, item, _, _) in self._timers.items():
+            yield key, due_tick * self.tick, item